@@ -0,0 +1,102 @@
+# So sánh cách filter chunk cũ (embed_query từng chunk + dot/norm từng cặp) với bản batch + numpy
+# Chạy: python -m benchmarks.chunk_filtering --chunks 100,300,1000
+#       python -m benchmarks.chunk_filtering --math-only   (chỉ đo phần tính similarity, vector ngẫu nhiên)
+from typing import Callable, List
+import argparse
+import time
+
+import numpy as np
+from numpy import dot
+from numpy.linalg import norm
+
+from functions.similarity import cosine_similarities, select_indices
+
+MODEL_NAME = "sentence-transformers/all-mpnet-base-v2"
+THRESHOLD = 0.5
+
+
+def make_chunks(n: int) -> List[str]:
+    topics = ["AI regulation", "chip exports", "electric vehicles", "central bank rates", "football transfers"]
+    return [
+        f"Chunk {i}: latest report on {topics[i % len(topics)]} with figures {i * 7} and {i * 13} "
+        f"from analysts, officials and companies describing the market in detail."
+        for i in range(n)
+    ]
+
+
+def legacy_filter(query_embedding: List[float], chunk_embeddings: List[List[float]]) -> List[int]:
+    selected = []
+    for i, chunk_embedding in enumerate(chunk_embeddings):
+        similarity = dot(query_embedding, chunk_embedding) / (norm(query_embedding) * norm(chunk_embedding))
+        if similarity > THRESHOLD:
+            selected.append(i)
+    return selected
+
+
+def vectorized_filter(query_embedding: np.ndarray, chunk_embeddings: np.ndarray) -> List[int]:
+    return select_indices(cosine_similarities(query_embedding, chunk_embeddings), threshold=THRESHOLD).tolist()
+
+
+def timed(fn: Callable[[], object], repeat: int = 1) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def bench_math_only(sizes: List[int], dim: int = 768) -> None:
+    rng = np.random.default_rng(0)
+    print(f"{'chunks':>8} {'legacy ms':>12} {'numpy ms':>12} {'speedup':>10}")
+    for n in sizes:
+        query = rng.standard_normal(dim).tolist()
+        chunks = rng.standard_normal((n, dim))
+        chunks_list = chunks.tolist()
+        query_arr = np.asarray(query, dtype=np.float32)
+        chunks_arr = chunks.astype(np.float32)
+
+        assert legacy_filter(query, chunks_list) == vectorized_filter(query_arr, chunks_arr)
+        legacy = timed(lambda: legacy_filter(query, chunks_list), repeat=10)
+        vectorized = timed(lambda: vectorized_filter(query_arr, chunks_arr), repeat=10)
+        print(f"{n:>8} {legacy * 1000:>12.2f} {vectorized * 1000:>12.2f} {legacy / vectorized:>9.1f}x")
+
+
+def bench_end_to_end(sizes: List[int]) -> None:
+    # đo cả phần embed, dùng model thật và không qua cache
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    embeddings = HuggingFaceEmbeddings(model_name=MODEL_NAME)
+    query = "AI regulation market report"
+    embeddings.embed_query(query)  # warm up
+
+    print(f"{'chunks':>8} {'legacy s':>10} {'batched s':>10} {'speedup':>10}")
+    for n in sizes:
+        chunks = make_chunks(n)
+
+        def legacy() -> None:
+            query_embedding = embeddings.embed_query(query)
+            legacy_filter(query_embedding, [embeddings.embed_query(chunk) for chunk in chunks])
+
+        def batched() -> None:
+            query_embedding = np.asarray(embeddings.embed_query(query), dtype=np.float32)
+            vectorized_filter(query_embedding, np.asarray(embeddings.embed_documents(chunks), dtype=np.float32))
+
+        legacy_s = timed(legacy)
+        batched_s = timed(batched)
+        print(f"{n:>8} {legacy_s:>10.2f} {batched_s:>10.2f} {legacy_s / batched_s:>9.1f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark filter_chunks_by_similarity")
+    parser.add_argument("--chunks", type=str, default="100,300,1000")
+    parser.add_argument("--math-only", action="store_true", help="Bỏ qua embedding model, chỉ đo phần tính similarity")
+    args = parser.parse_args()
+
+    sizes = [int(n) for n in args.chunks.split(",")]
+    if args.math_only:
+        bench_math_only(sizes)
+    else:
+        bench_end_to_end(sizes)
+
+
+if __name__ == "__main__":
+    main()
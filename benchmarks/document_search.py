@@ -0,0 +1,89 @@
+# So sánh cách tra database cũ (quét mọi tài liệu, doc.lower() cho từng cặp từ khoá - tài liệu)
+# với DocumentStore (inverted index + BM25, build một lần)
+# Chạy: python -m benchmarks.document_search --docs 1000,10000,50000
+from typing import Callable, List
+import argparse
+import time
+
+import numpy as np
+
+from functions.document_store import DocumentStore
+
+# âm tiết tiếng Việt giả lập (có dấu), tần suất theo phân phối Zipf như văn bản thật
+ONSETS = ["", "b", "c", "ch", "d", "đ", "g", "gi", "h", "kh", "l", "m", "n", "ng", "nh", "ph", "qu", "s", "t", "th", "tr", "v", "x"]
+NUCLEI = ["a", "à", "á", "ả", "ã", "ạ", "ă", "â", "ấ", "e", "ê", "ế", "i", "í", "o", "ô", "ố", "ơ", "ớ", "u", "ư", "ừ", "y"]
+CODAS = ["", "c", "m", "n", "ng", "nh", "p", "t"]
+# cụm từ của các query, chèn vào tài liệu với tần suất vừa phải
+TOPIC_PHRASES = [
+    "trí tuệ nhân tạo", "việc làm", "thị trường lao động", "kỹ năng", "đào tạo", "tăng trưởng",
+    "báo cáo", "an ninh mạng", "điện toán đám mây", "Python", "kế toán", "tự động hóa"
+]
+QUERIES = [
+    ["việc làm", "AI"],
+    ["thi truong lao dong"],
+    ["đào tạo", "kỹ năng", "Python"],
+    ["tăng trưởng", "báo cáo", "2025"],
+    ["an ninh mạng"]
+]
+
+
+def make_documents(n: int, words_per_doc: int = 120, vocabulary_size: int = 20000, seed: int = 0) -> List[str]:
+    rng = np.random.default_rng(seed)
+    syllables = sorted({onset + nucleus + coda for onset in ONSETS for nucleus in NUCLEI for coda in CODAS})
+    vocabulary = np.array(rng.permutation(syllables)[:vocabulary_size])
+    # Zipf: từ thứ r xuất hiện với xác suất ~ 1 / r
+    probabilities = 1.0 / np.arange(1, len(vocabulary) + 1)
+    probabilities /= probabilities.sum()
+
+    documents = []
+    for _ in range(n):
+        words = list(rng.choice(vocabulary, size=words_per_doc, p=probabilities))
+        for phrase in TOPIC_PHRASES:
+            if rng.random() < 0.03:
+                words.insert(int(rng.integers(len(words))), phrase)
+        if rng.random() < 0.3:
+            words.append("AI 2025")
+        documents.append(" ".join(words))
+    return documents
+
+
+def legacy_search(documents: List[str], keywords: List[str]) -> List[str]:
+    # đúng như mock_database_query cũ: không xếp hạng, lower() lại cho từng từ khoá
+    return [doc for doc in documents if any(keyword.lower() in doc.lower() for keyword in keywords)]
+
+
+def timed(fn: Callable[[], object], repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", default="1000,10000,50000")
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'docs':>8} {'build s':>9} {'legacy ms':>11} {'bm25 ms':>9} {'speedup':>9}")
+    for n in [int(size) for size in args.docs.split(",")]:
+        documents = make_documents(n)
+
+        store = DocumentStore()
+        for i, doc in enumerate(documents):
+            store.add(doc, id=str(i))
+        build = timed(store.build, repeat=1)
+
+        # search có cắt tỉa term phổ biến phải cho cùng top-k với chấm điểm đầy đủ
+        for q in QUERIES:
+            scores = store.score(q)
+            expected = sorted(scores[scores > 0], reverse=True)[:args.k]
+            assert np.allclose([score for _, score in store.search(q, k=args.k)], expected, rtol=1e-5), q
+
+        legacy = sum(timed(lambda: legacy_search(documents, q), repeat=3) for q in QUERIES) / len(QUERIES)
+        bm25 = sum(timed(lambda: store.search(q, k=args.k), repeat=50) for q in QUERIES) / len(QUERIES)
+        print(f"{n:>8} {build:>9.2f} {legacy * 1000:>11.3f} {bm25 * 1000:>9.3f} {legacy / bm25:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# So sánh các backend trích xuất HTML: pages/sec và độ khớp text với cách cũ (BeautifulSoup + html.parser)
+# Chạy: python -m benchmarks.html_extraction --fixtures benchmarks/fixtures/html --repeat 20
+from difflib import SequenceMatcher
+from typing import Dict, List, Tuple
+import argparse
+import glob
+import os
+import time
+
+from tools.html_extractors import EXTRACTORS, BeautifulSoupExtractor, ExtractedPage, HtmlExtractor
+
+BASE_URL = "https://news.example.com/article"
+
+
+def load_fixtures(directory: str) -> List[Tuple[str, str]]:
+    pages = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.html"))):
+        with open(path, encoding="utf-8") as f:
+            pages.append((os.path.basename(path), f.read()))
+    return pages
+
+
+def throughput(extractor: HtmlExtractor, pages: List[Tuple[str, str]], repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for _, html in pages:
+            extractor.extract(html, BASE_URL)
+    return repeat * len(pages) / (time.perf_counter() - start)
+
+
+def parity(reference: ExtractedPage, candidate: ExtractedPage) -> Dict[str, float]:
+    return {
+        "text": SequenceMatcher(None, reference.content, candidate.content, autojunk=False).ratio() if reference.content or candidate.content else 1.0,
+        "title": float(reference.title.strip() == candidate.title.strip()),
+        "links": float(reference.links == candidate.links)
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark HTML extraction backends")
+    parser.add_argument("--fixtures", default=os.path.join(os.path.dirname(__file__), "fixtures", "html"))
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    pages = load_fixtures(args.fixtures)
+    if not pages:
+        raise SystemExit(f"No .html fixtures in {args.fixtures}")
+
+    reference = BeautifulSoupExtractor()
+    reference_pages = {name: reference.extract(html, BASE_URL) for name, html in pages}
+
+    print(f"{len(pages)} fixture pages, {args.repeat} rounds\n")
+    print(f"{'backend':>8} {'pages/s':>10} {'speedup':>8} {'text':>7} {'title':>7} {'links':>7}")
+    baseline = None
+    for name, extractor_cls in EXTRACTORS.items():
+        try:
+            extractor = extractor_cls()
+            rate = throughput(extractor, pages, args.repeat)
+        except Exception as e:
+            print(f"{name:>8} unavailable: {str(e)}")
+            continue
+        baseline = baseline or rate
+
+        scores = [parity(reference_pages[page], extractor.extract(html, BASE_URL)) for page, html in pages]
+        avg = {key: sum(s[key] for s in scores) / len(scores) for key in scores[0]}
+        print(f"{name:>8} {rate:>10.1f} {rate / baseline:>7.1f}x {avg['text']:>7.3f} {avg['title']:>7.3f} {avg['links']:>7.3f}")
+
+    # chi tiết từng trang với backend lxml
+    print("\nPer-page text parity (lxml vs bs4):")
+    try:
+        fast = EXTRACTORS["lxml"]()
+    except Exception as e:
+        print(f"  unavailable: {str(e)}")
+        return
+    for page, html in pages:
+        score = parity(reference_pages[page], fast.extract(html, BASE_URL))
+        print(f"  {page:<28} {score['text']:.3f}")
+
+
+if __name__ == "__main__":
+    main()
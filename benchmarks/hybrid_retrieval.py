@@ -0,0 +1,103 @@
+# Đánh giá offline cách tìm lại chunk của ArticleIndex: dense / sparse (BM25) / hybrid (RRF)
+# Báo cáo recall@k và độ trễ mỗi query của từng mode trên một bộ chunk + query đã gán nhãn
+# Chạy: python -m benchmarks.hybrid_retrieval --k 1,3,5
+#       python -m benchmarks.hybrid_retrieval --corpus my_corpus.jsonl --queries my_queries.jsonl --sparse-weight 0.5
+# corpus.jsonl: {"id", "url", "text"} mỗi dòng; queries.jsonl: {"query", "relevant": [id của chunk trong corpus]}
+from typing import Dict, List, Tuple
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from functions.article_index import ArticleIndex, chunk_id
+from functions.embedding_cache import get_cached_huggingface_embeddings
+
+MODEL_NAME = "sentence-transformers/all-mpnet-base-v2"
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "retrieval")
+MODES = ["dense", "sparse", "hybrid"]
+
+
+def read_jsonl(path: str) -> List[Dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def build_index(corpus: List[Dict], persist_dir: str) -> Tuple[ArticleIndex, Dict[str, str]]:
+    """Index tạm từ corpus, trả về kèm map chunk_id -> id trong corpus"""
+    index = ArticleIndex(embeddings=get_cached_huggingface_embeddings(MODEL_NAME), persist_dir=persist_dir)
+    by_url: Dict[str, List[str]] = {}
+    for record in corpus:
+        by_url.setdefault(record["url"], []).append(record["text"])
+    for url, texts in by_url.items():
+        index.upsert_chunks(url=url, query="eval", chunks=texts, original_chunks=texts)
+    return index, {chunk_id(record["url"], record["text"]): record["id"] for record in corpus}
+
+
+def evaluate(
+    index: ArticleIndex,
+    ids: Dict[str, str],
+    queries: List[Dict],
+    mode: str,
+    ks: List[int],
+    **retrieve_kwargs
+) -> Dict:
+    recalls: Dict[int, List[float]] = {k: [] for k in ks}
+    latencies: List[float] = []
+    for item in queries:
+        relevant = set(item["relevant"])
+        start = time.perf_counter()
+        results = index.retrieve(item["query"], k=max(ks), mode=mode, **retrieve_kwargs)
+        latencies.append(time.perf_counter() - start)
+
+        found = [ids.get(chunk_id(doc.metadata.get("url", ""), doc.page_content)) for doc, _ in results]
+        for k in ks:
+            recalls[k].append(len(relevant & set(found[:k])) / len(relevant))
+
+    return {
+        "recall": {k: float(np.mean(values)) for k, values in recalls.items()},
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p95_ms": float(np.percentile(latencies, 95) * 1000)
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Recall@k và độ trễ của dense / sparse / hybrid retrieval")
+    parser.add_argument("--corpus", default=os.path.join(FIXTURES, "corpus.jsonl"))
+    parser.add_argument("--queries", default=os.path.join(FIXTURES, "queries.jsonl"))
+    parser.add_argument("--k", default="1,3,5")
+    parser.add_argument("--fetch-k", type=int, default=20)
+    parser.add_argument("--dense-weight", type=float, default=1.0)
+    parser.add_argument("--sparse-weight", type=float, default=1.0)
+    parser.add_argument("--rrf-k", type=int, default=60)
+    args = parser.parse_args()
+
+    ks = [int(k) for k in args.k.split(",")]
+    corpus = read_jsonl(args.corpus)
+    queries = read_jsonl(args.queries)
+
+    with tempfile.TemporaryDirectory() as persist_dir:
+        index, ids = build_index(corpus, persist_dir)
+        # warm up: model embedding, index BM25
+        for mode in MODES:
+            index.retrieve(queries[0]["query"], k=1, mode=mode)
+
+        print(f"{len(corpus)} chunks, {len(queries)} queries")
+        header = f"{'mode':<8}" + "".join(f"{f'recall@{k}':>11}" for k in ks) + f"{'p50 ms':>9}{'p95 ms':>9}"
+        print(header)
+        for mode in MODES:
+            report = evaluate(
+                index, ids, queries, mode, ks,
+                fetch_k=args.fetch_k,
+                dense_weight=args.dense_weight,
+                sparse_weight=args.sparse_weight,
+                rrf_k=args.rrf_k
+            )
+            recalls = "".join(f"{report['recall'][k]:>11.3f}" for k in ks)
+            print(f"{mode:<8}{recalls}{report['p50_ms']:>9.2f}{report['p95_ms']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# Bộ nhớ và độ chính xác của embedding lưu float32 / float16 / int8 (scale theo vector) so với list float Python
+# - bộ nhớ cho mỗi 10k chunk
+# - recall@k và độ khớp của tập chunk vượt threshold so với float32
+# - thời gian tính similarity của một query trên cả tập
+# Chạy: python -m benchmarks.quantized_similarity --chunks 10000
+#       python -m benchmarks.quantized_similarity --model   (vector thật từ all-mpnet-base-v2, chậm hơn)
+from typing import Callable, Dict, List
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from functions.similarity import QUANTIZED_DTYPES, QuantizedVectors, cosine_similarities, select_indices
+
+MODEL_NAME = "sentence-transformers/all-mpnet-base-v2"
+
+
+def synthetic_vectors(n: int, num_queries: int, dim: int = 768, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    # chunk cùng chủ đề nằm gần nhau
+    centers = rng.standard_normal((max(n // 50, 1), dim))
+    vectors = centers[rng.integers(len(centers), size=n)] + 0.8 * rng.standard_normal((n, dim))
+    queries = vectors[rng.integers(n, size=num_queries)] + 0.5 * rng.standard_normal((num_queries, dim))
+    return vectors, queries
+
+
+def model_vectors(n: int, num_queries: int):
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    from benchmarks.chunk_filtering import make_chunks
+
+    embeddings = HuggingFaceEmbeddings(model_name=MODEL_NAME)
+    chunks = make_chunks(n)
+    vectors = np.asarray(embeddings.embed_documents(chunks))
+    queries = np.asarray(embeddings.embed_documents([f"report on {chunk.split(' on ')[1][:40]}" for chunk in chunks[:num_queries]]))
+    return vectors, queries
+
+
+def list_memory(vectors: np.ndarray) -> int:
+    """Bộ nhớ thực của List[List[float]] (như kết quả embed_documents của langchain)"""
+    tracemalloc.start()
+    as_lists = vectors.tolist()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del as_lists
+    return size
+
+
+def timed(fn: Callable[[], object], repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bộ nhớ / recall của embedding lượng tử hoá")
+    parser.add_argument("--chunks", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--model", action="store_true", help="Dùng embedding model thật thay vì vector giả lập")
+    args = parser.parse_args()
+
+    vectors, queries = model_vectors(args.chunks, args.queries) if args.model else synthetic_vectors(args.chunks, args.queries)
+    n, dim = vectors.shape
+    per_10k = 10000 / n
+    full = QuantizedVectors.from_float(vectors, "float32")
+    reference = [cosine_similarities(query, full) for query in queries]
+
+    print(f"{n} chunks x {dim} dims, {len(queries)} queries ({'model' if args.model else 'synthetic'})")
+    print(
+        f"{'storage':<14}{'MB / 10k':>10}{'sim ms':>9}{f'recall@{args.k}':>11}"
+        f"{'thr recall':>12}{'thr prec':>10}{'max |err|':>11}"
+    )
+
+    as_lists = vectors.tolist()
+    # cách cũ: embed_documents trả về list, đổi sang numpy ở mỗi lần tính
+    list_ms = timed(lambda: cosine_similarities(queries[0], np.asarray(as_lists, dtype=np.float32)), repeat=5) * 1000
+    print(f"{'list[float]':<14}{list_memory(vectors) * per_10k / 2 ** 20:>10.1f}{list_ms:>9.2f}{'1.000':>11}{'1.000':>12}{'1.000':>10}{'0':>11}")
+    del as_lists
+    print(f"{'float64':<14}{vectors.nbytes * per_10k / 2 ** 20:>10.1f}{'':>9}{'1.000':>11}{'1.000':>12}{'1.000':>10}{'0':>11}")
+
+    for dtype in QUANTIZED_DTYPES:
+        stored = QuantizedVectors.from_float(vectors, dtype)
+        recalls: List[float] = []
+        threshold_recalls: List[float] = []
+        threshold_precisions: List[float] = []
+        max_error = 0.0
+        for query, expected in zip(queries, reference):
+            scores = cosine_similarities(query, stored)
+            max_error = max(max_error, float(np.abs(scores - expected).max()))
+            top = set(np.argpartition(-scores, args.k)[:args.k].tolist())
+            true_top = set(np.argpartition(-expected, args.k)[:args.k].tolist())
+            recalls.append(len(top & true_top) / args.k)
+
+            # như filter_chunks_by_similarity: threshold chọn ~5% chunk liên quan nhất
+            threshold = float(np.quantile(expected, 0.95))
+            selected = set(select_indices(scores, threshold=threshold).tolist())
+            true_selected = set(select_indices(expected, threshold=threshold).tolist())
+            threshold_recalls.append(len(selected & true_selected) / max(len(true_selected), 1))
+            threshold_precisions.append(len(selected & true_selected) / max(len(selected), 1))
+
+        sim_ms = timed(lambda: cosine_similarities(queries[0], stored), repeat=5) * 1000
+        label = f"{dtype}+scale" if stored.scales is not None else dtype
+        print(
+            f"{label:<14}{stored.nbytes * per_10k / 2 ** 20:>10.1f}{sim_ms:>9.2f}{np.mean(recalls):>11.3f}"
+            f"{np.mean(threshold_recalls):>12.3f}{np.mean(threshold_precisions):>10.3f}{max_error:>11.2e}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# Benchmark throughput của TranslationBatcher theo max_batch_size
+# Chạy: python -m benchmarks.translation_batching --requests 64 --batch-sizes 1,2,4,8,16,32
+# Mỗi request một câu khác nhau và translation memory nằm trong thư mục tạm: đo thời gian generate,
+# không phải thời gian tra memory (TranslationTool mặc định nhớ câu đã dịch và gộp câu trùng)
+from typing import List
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from tools.translation_batcher import TranslationBatcher
+from tools.translation_memory import TranslationMemory
+from tools.translation_tool import TranslationTool
+
+SAMPLE_SENTENCES: List[str] = [
+    "Hello, how are you?",
+    "The weather is nice today.",
+    "Artificial intelligence is changing the way we work.",
+    "Please send me the report before Friday.",
+    "Machine translation models run faster when requests are batched together.",
+    "Where is the nearest train station?",
+    "Our team released a new version of the product last week.",
+    "Thank you very much for your help."
+]
+
+
+def distinct_texts(num_requests: int, offset: int) -> List[str]:
+    """Câu mẫu kèm số thứ tự: không câu nào trùng, kể cả giữa các batch size"""
+    return [
+        f"{SAMPLE_SENTENCES[i % len(SAMPLE_SENTENCES)]} Ticket {offset + i}."
+        for i in range(num_requests)
+    ]
+
+
+async def run_once(tool: TranslationTool, batch_size: int, texts: List[str], max_wait_ms: float) -> float:
+    batcher = TranslationBatcher(tool, max_batch_size=batch_size, max_wait_ms=max_wait_ms)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[batcher.translate(text, "en", "vi") for text in texts])
+    return time.perf_counter() - start
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Throughput của dịch theo batch size")
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--batch-sizes", type=str, default="1,2,4,8,16,32")
+    parser.add_argument("--max-wait-ms", type=float, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as memory_dir:
+        # memory trống, chỉ sống trong lần chạy này: không dùng lại bản dịch của lần chạy trước
+        tool = TranslationTool(memory=TranslationMemory(path=os.path.join(memory_dir, "translation_memory.sqlite3")))
+        # warm up: load model trước để không tính thời gian load vào benchmark
+        tool.translate_batch(["Warm up."], "en", "vi")
+
+        print(f"{'batch_size':>10} {'seconds':>10} {'req/s':>10}")
+        for run, batch_size in enumerate(int(b) for b in args.batch_sizes.split(",")):
+            texts = distinct_texts(args.requests, offset=run * args.requests)
+            elapsed = await run_once(tool, batch_size, texts, args.max_wait_ms)
+            print(f"{batch_size:>10} {elapsed:>10.2f} {args.requests / elapsed:>10.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,145 @@
+# So sánh Chroma và FAISS (flat / ivf / hnsw) qua cùng VectorStoreBackend: thời gian build, dung lượng đĩa,
+# RAM khi mở index (process mới, đo RSS), độ trễ query và recall@k so với tìm chính xác
+# Vector giả lập theo cụm (không cần embedding model), mặc định 100k chunk x 768 chiều (như all-mpnet-base-v2)
+# Chạy: python -m benchmarks.vector_store --chunks 100000 --backends chroma,flat,ivf,hnsw
+from langchain_core.embeddings import Embeddings
+
+from typing import Dict, List
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from functions.vector_store import create_vector_store
+
+
+class ArrayEmbeddings(Embeddings):
+    """"chunk {i}" -> vectors[i], "query {j}" -> queries[j] (đọc mmap từ file .npy)"""
+
+    def __init__(self, data_dir: str):
+        self.vectors = np.load(os.path.join(data_dir, "vectors.npy"), mmap_mode="r")
+        self.queries = np.load(os.path.join(data_dir, "queries.npy"), mmap_mode="r")
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.vectors[[int(text.split()[1]) for text in texts]].tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.queries[int(text.split()[1])].tolist()
+
+
+def make_data(data_dir: str, n: int, dim: int, num_queries: int, k: int, seed: int = 0) -> None:
+    rng = np.random.default_rng(seed)
+    # chunk của cùng một bài / chủ đề nằm gần nhau: 1 tâm cụm cho mỗi ~100 chunk
+    centers = rng.standard_normal((max(n // 100, 1), dim)).astype(np.float32)
+    vectors = centers[rng.integers(len(centers), size=n)] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = vectors[rng.integers(n, size=num_queries)] + 0.3 * rng.standard_normal((num_queries, dim)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    np.save(os.path.join(data_dir, "vectors.npy"), vectors)
+    np.save(os.path.join(data_dir, "queries.npy"), queries)
+    # kết quả đúng (cosine) để tính recall
+    truth = np.argsort(-(queries @ vectors.T), axis=1)[:, :k]
+    np.save(os.path.join(data_dir, "truth.npy"), truth)
+
+
+def open_store(backend: str, data_dir: str, **kwargs):
+    store_dir = os.path.join(data_dir, "stores", backend)
+    if backend == "chroma":
+        return create_vector_store(ArrayEmbeddings(data_dir), store_dir, "bench", backend="chroma")
+    return create_vector_store(ArrayEmbeddings(data_dir), store_dir, "bench", backend="faiss", index_type=backend, **kwargs)
+
+
+def build(backend: str, data_dir: str, n: int, batch_size: int = 5000) -> float:
+    start = time.perf_counter()
+    # nạp hết rồi build main index một lần (không compact giữa chừng)
+    store = open_store(backend, data_dir) if backend == "chroma" else open_store(backend, data_dir, delta_max_rows=n + 1)
+    for offset in range(0, n, batch_size):
+        ids = [str(i) for i in range(offset, min(offset + batch_size, n))]
+        store.add_texts([f"chunk {i}" for i in ids], metadatas=[{"i": int(i)} for i in ids], ids=ids)
+    if backend != "chroma":
+        store.compact()
+    return time.perf_counter() - start
+
+
+def rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+
+def probe(backend: str, data_dir: str, k: int) -> Dict:
+    """Chạy trong process mới: đo RAM lúc mở index, độ trễ và recall"""
+    truth = np.load(os.path.join(data_dir, "truth.npy"))
+    embeddings_rss = rss_mb()
+    start = time.perf_counter()
+    store = open_store(backend, data_dir)
+    open_seconds = time.perf_counter() - start
+    open_rss = rss_mb() - embeddings_rss
+
+    latencies: List[float] = []
+    recalls: List[float] = []
+    for j in range(len(truth)):
+        start = time.perf_counter()
+        results = store.similarity_search(f"query {j}", k=k)
+        latencies.append(time.perf_counter() - start)
+        recalls.append(len({int(doc.metadata["i"]) for doc in results} & set(truth[j].tolist())) / k)
+
+    return {
+        "open_s": open_seconds,
+        "open_rss_mb": open_rss,
+        "query_rss_mb": rss_mb() - embeddings_rss,
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p95_ms": float(np.percentile(latencies, 95) * 1000),
+        "recall": float(np.mean(recalls))
+    }
+
+
+def disk_mb(path: str) -> float:
+    return sum(
+        os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names
+    ) / 2 ** 20
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark Chroma vs FAISS vector store")
+    parser.add_argument("--chunks", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--backends", default="chroma,flat,ivf,hnsw")
+    parser.add_argument("--probe", help=argparse.SUPPRESS)
+    parser.add_argument("--data-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.probe:
+        print(json.dumps(probe(args.probe, args.data_dir, args.k)))
+        return
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        make_data(data_dir, args.chunks, args.dim, args.queries, args.k)
+        print(f"{args.chunks} chunks x {args.dim} dims, {args.queries} queries, recall@{args.k}")
+        print(
+            f"{'backend':<8}{'build s':>9}{'disk MB':>9}{'open s':>8}{'open MB':>9}"
+            f"{'query MB':>10}{'p50 ms':>8}{'p95 ms':>8}{'recall':>8}"
+        )
+        for backend in args.backends.split(","):
+            build_seconds = build(backend, data_dir, args.chunks)
+            # process mới: RAM đo được không lẫn dữ liệu lúc build
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.vector_store", "--probe", backend, "--data-dir", data_dir, "--k", str(args.k)],
+                check=True, capture_output=True, text=True
+            ).stdout
+            report = json.loads(output.strip().splitlines()[-1])
+            print(
+                f"{backend:<8}{build_seconds:>9.1f}{disk_mb(os.path.join(data_dir, 'stores', backend)):>9.0f}"
+                f"{report['open_s']:>8.2f}{report['open_rss_mb']:>9.0f}{report['query_rss_mb']:>10.0f}"
+                f"{report['p50_ms']:>8.2f}{report['p95_ms']:>8.2f}{report['recall']:>8.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+# Collection vector (Chroma hoặc FAISS) dùng chung, lưu lâu dài cho tất cả bài viết đã xử lý
+from langchain_core.documents.base import Document
+from langchain_core.embeddings import Embeddings
+
+from functions.document_store import DocumentStore
+from functions.rank_fusion import DEFAULT_RRF_K, reciprocal_rank_fusion
+from functions.vector_store import VectorStoreBackend, create_vector_store
+
+from typing import Dict, List, Literal, Optional, Tuple
+import argparse
+import hashlib
+import os
+import threading
+import time
+import uuid
+
+
+def chunk_id(url: str, content: str) -> str:
+    """ID ổn định theo url + nội dung chunk: cùng nội dung thì cùng ID, upsert không bị trùng"""
+    return hashlib.sha256(f"{url}\x1f{content}".encode("utf-8")).hexdigest()
+
+
+RetrievalMode = Literal["dense", "sparse", "hybrid"]
+
+
+class ArticleIndex:
+    """
+    Một collection "articles" dùng chung cho mọi request:
+    - upsert theo ID = hash(url + nội dung), chunk không đổi thì bỏ qua, không embed lại
+    - gc() xoá các chunk cũ của cùng (url, query) đã bị thay bằng lần xử lý mới hơn
+    - search() tìm trên toàn bộ các bài viết đã tích luỹ
+    - bên cạnh collection là một index từ khoá (BM25, cùng ID chunk) để bắt tên riêng / con số mà
+      embedding hay bỏ sót; retrieve() tìm dense, sparse hoặc gộp cả hai bằng reciprocal rank fusion
+    """
+
+    def __init__(
+        self,
+        embeddings: Optional[Embeddings] = None,
+        persist_dir: Optional[str] = None,
+        collection_name: str = "articles"
+    ):
+        self.persist_dir = persist_dir or os.getenv("ARTICLE_DB_DIR", "./db/articles")
+        # backend theo VECTOR_STORE_BACKEND (chroma | faiss)
+        self.vectordb: VectorStoreBackend = create_vector_store(
+            embeddings,
+            persist_dir=self.persist_dir,
+            collection_name=collection_name
+        )
+        self._lock = threading.Lock()
+        # index BM25 của các chunk trong collection, đọc từ vector store ở lần dùng đầu tiên;
+        # upsert / gc chỉ nối vào delta của nó, build lại index chính chạy ngoài _lock (_compact_lexical)
+        self._lexical: Optional[DocumentStore] = None
+        self._compact_lock = threading.Lock()
+        # process khác (job worker) cùng ghi vào collection: mỗi lần thêm / xoá chunk ghi một marker mới vào file này,
+        # marker + count() khác lần đối chiếu trước thì index BM25 của process này được bổ sung cho khớp
+        self._marker_path = os.path.join(self.persist_dir, "lexical.marker")
+        self._lexical_marker: Optional[Tuple[str, int]] = None
+
+    def _read_marker(self) -> Tuple[str, int]:
+        try:
+            with open(self._marker_path) as f:
+                marker = f.read()
+        except FileNotFoundError:
+            marker = ""
+        return marker, self.vectordb.count()
+
+    def _bump_marker(self) -> None:
+        """Gọi sau khi thêm / xoá chunk trong vector store"""
+        tmp_path = f"{self._marker_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(uuid.uuid4().hex)
+        os.replace(tmp_path, self._marker_path)
+
+    def _lexical_store(self) -> DocumentStore:
+        """Gọi khi đang giữ _lock"""
+        if self._lexical is None:
+            store = DocumentStore(auto_compact=False)
+            # đọc marker trước: chunk ghi sau thời điểm này sẽ làm marker khác đi và được bổ sung ở lần sau
+            self._lexical_marker = self._read_marker()
+            data = self.vectordb.get(include=["documents", "metadatas"])
+            for id_, text, metadata in zip(data["ids"], data["documents"], data["metadatas"]):
+                store.add(text, id=id_, metadata=metadata or {})
+            self._lexical = store
+        return self._lexical
+
+    def _sync_lexical(self) -> DocumentStore:
+        """
+        Gọi khi đang giữ _lock, trước khi tìm BM25: marker đổi (process khác hoặc chính process này vừa ghi)
+        thì so ID với vector store, thêm chunk còn thiếu và bỏ chunk đã bị xoá
+        """
+        if self._lexical is None:
+            return self._lexical_store()
+        marker = self._read_marker()
+        if marker != self._lexical_marker:
+            store = self._lexical
+            stored = set(self.vectordb.get(include=[])["ids"])
+            indexed = {document.id for document in store.documents}
+            missing = list(stored - indexed)
+            if missing:
+                data = self.vectordb.get(ids=missing, include=["documents", "metadatas"])
+                for id_, text, metadata in zip(data["ids"], data["documents"], data["metadatas"]):
+                    store.add(text, id=id_, metadata=metadata or {})
+            store.remove(indexed - stored)
+            self._lexical_marker = marker
+        return self._lexical
+
+    def _compact_lexical(self) -> None:
+        """
+        Build lại index BM25 chính: chỉ chụp danh sách chunk và cài index mới khi giữ _lock, phần build
+        (tokenize + posting list) chạy ngoài _lock nên upsert / search không phải chờ; chunk thêm / xoá
+        trong lúc build được DocumentStore.install đưa vào delta
+        """
+        with self._compact_lock:
+            with self._lock:
+                store = self._lexical_store()
+                if not store.needs_compaction():
+                    return
+                snapshot = store.compaction()
+            snapshot.build()
+            with self._lock:
+                store.install(snapshot)
+
+    def _schedule_lexical_compaction(self) -> None:
+        """Delta đã lớn: build lại ở thread nền, không nằm trên đường đi của request"""
+        with self._lock:
+            store = self._lexical
+            due = store is not None and store.built and store.needs_compaction()
+        if due and not self._compact_lock.locked():
+            threading.Thread(target=self._compact_lexical, name="article-bm25-compact", daemon=True).start()
+
+    def upsert_chunks(
+        self,
+        url: str,
+        query: str,
+        chunks: List[str],
+        original_chunks: List[str]
+    ) -> Dict[str, int]:
+        """Thêm các chunk mới của một bài viết, trả về số chunk đã thêm / bỏ qua"""
+        now = time.time()
+        ids = [chunk_id(url, chunk) for chunk in chunks]
+        metadatas = [
+            {
+                "url": url,
+                "query": query,
+                "chunk_id": i,
+                "total_chunks": len(chunks),
+                "original_chunk": original,  # Lưu luôn text gốc
+                "indexed_at": now
+            } for i, original in enumerate(original_chunks)
+        ]
+        # chunk trùng nội dung trong cùng bài chỉ lưu một lần
+        first_seen: Dict[str, int] = {}
+        for i, chunk_id_ in enumerate(ids):
+            first_seen.setdefault(chunk_id_, i)
+        unique_idx = list(first_seen.values())
+
+        with self._lock:
+            unique_ids = [ids[i] for i in unique_idx]
+            existing = set(self.vectordb.get(ids=unique_ids, include=[])["ids"]) if unique_ids else set()
+
+            new_idx = [i for i in unique_idx if ids[i] not in existing]
+            if new_idx:
+                self.vectordb.add_texts(
+                    texts=[chunks[i] for i in new_idx],
+                    metadatas=[metadatas[i] for i in new_idx],
+                    ids=[ids[i] for i in new_idx]
+                )
+                if self._lexical is not None:
+                    for i in new_idx:
+                        self._lexical.add(chunks[i], id=ids[i], metadata=metadatas[i])
+                self._bump_marker()
+
+            old_idx = [i for i in unique_idx if ids[i] in existing]
+            if old_idx:
+                # chỉ cập nhật metadata (indexed_at), không embed lại
+                self.vectordb.update_metadatas(
+                    ids=[ids[i] for i in old_idx],
+                    metadatas=[metadatas[i] for i in old_idx]
+                )
+
+        self._schedule_lexical_compaction()
+        return {"added": len(new_idx), "skipped": len(old_idx)}
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[Document, float]]:
+        return self.vectordb.similarity_search_with_score(query=query, k=k)
+
+    def lexical_search(self, query: str, k: int = 5) -> List[Tuple[Document, float]]:
+        """Top-k chunk theo BM25 (điểm càng cao càng liên quan)"""
+        with self._lock:
+            built = self._sync_lexical().built
+        if not built:
+            # lần đầu: chờ build xong (ngoài _lock, upsert vẫn chạy được)
+            self._compact_lexical()
+        with self._lock:
+            # index chính + delta, không build lại ở đây
+            results = self._lexical_store().search(query, k=k)
+        self._schedule_lexical_compaction()
+        return [
+            (Document(page_content=doc.text, metadata=doc.metadata), score)
+            for doc, score in results
+        ]
+
+    def retrieve(
+        self,
+        query: str,
+        k: int = 5,
+        mode: RetrievalMode = "hybrid",
+        dense_weight: float = 1.0,
+        sparse_weight: float = 1.0,
+        fetch_k: int = 20,
+        rrf_k: int = DEFAULT_RRF_K
+    ) -> List[Tuple[Document, float]]:
+        """
+        mode="dense": như search() (điểm là distance), "sparse": BM25,
+        "hybrid": lấy fetch_k kết quả từ mỗi bên rồi gộp bằng RRF (điểm RRF, càng cao càng tốt)
+        """
+        if mode == "dense":
+            return self.search(query, k=k)
+        if mode == "sparse":
+            return self.lexical_search(query, k=k)
+        if mode != "hybrid":
+            raise ValueError(f"Unknown retrieval mode: {mode}")
+
+        fetch_k = max(fetch_k, k)
+        dense = [doc for doc, _ in self.search(query, k=fetch_k)]
+        sparse = [doc for doc, _ in self.lexical_search(query, k=fetch_k)]
+        # cùng ID với lúc upsert nên một chunk xuất hiện ở cả hai danh sách được cộng điểm
+        documents: Dict[str, Document] = {}
+        rankings: List[List[str]] = []
+        for ranked in (dense, sparse):
+            ids = [chunk_id(doc.metadata.get("url", ""), doc.page_content) for doc in ranked]
+            for id_, doc in zip(ids, ranked):
+                documents.setdefault(id_, doc)
+            rankings.append(ids)
+
+        fused = reciprocal_rank_fusion(rankings, weights=[dense_weight, sparse_weight], k=rrf_k)
+        return [(documents[id_], score) for id_, score in fused[:k]]
+
+    def gc(self, max_age_days: Optional[float] = None) -> int:
+        """
+        Xoá chunk cũ:
+        - chunk của một (url, query) không còn xuất hiện trong lần xử lý gần nhất
+        - nếu có max_age_days: chunk không được cập nhật trong max_age_days ngày
+        """
+        with self._lock:
+            data = self.vectordb.get(include=["metadatas"])
+            latest: Dict[Tuple[str, str], float] = {}
+            for metadata in data["metadatas"]:
+                group = (metadata.get("url", ""), metadata.get("query", ""))
+                latest[group] = max(latest.get(group, 0.0), metadata.get("indexed_at", 0.0))
+
+            cutoff = time.time() - max_age_days * 24 * 3600 if max_age_days is not None else None
+            stale: List[str] = []
+            for id_, metadata in zip(data["ids"], data["metadatas"]):
+                indexed_at = metadata.get("indexed_at", 0.0)
+                group = (metadata.get("url", ""), metadata.get("query", ""))
+                if indexed_at < latest[group] or (cutoff is not None and indexed_at < cutoff):
+                    stale.append(id_)
+
+            if stale:
+                self.vectordb.delete(ids=stale)
+                if self._lexical is not None:
+                    self._lexical.remove(stale)
+                self._bump_marker()
+        self._schedule_lexical_compaction()
+        return len(stale)
+
+    def count(self) -> int:
+        return self.vectordb.count()
+
+
+_article_index: Optional[ArticleIndex] = None
+_article_index_lock = threading.Lock()
+
+
+def get_article_index(embeddings: Embeddings) -> ArticleIndex:
+    """Index dùng chung cho cả process"""
+    global _article_index
+    with _article_index_lock:
+        if _article_index is None:
+            _article_index = ArticleIndex(embeddings=embeddings)
+        return _article_index
+
+
+__all__ = ["ArticleIndex", "get_article_index", "chunk_id"]
+
+
+def main() -> None:
+    # python -m functions.article_index gc --max-age-days 30
+    parser = argparse.ArgumentParser(description="Quản lý article index")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    gc_parser = subparsers.add_parser("gc", help="Xoá các chunk cũ / đã bị thay thế")
+    gc_parser.add_argument("--max-age-days", type=float, default=None)
+    subparsers.add_parser("stats", help="Số chunk trong index")
+    args = parser.parse_args()
+
+    index = ArticleIndex()
+    if args.command == "gc":
+        removed = index.gc(max_age_days=args.max_age_days)
+        print(f"Removed {removed} stale chunks, {index.count()} chunks left in {index.persist_dir}")
+    else:
+        print(f"{index.count()} chunks in {index.persist_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# Vector index lưu lâu dài cho một tập tài liệu: mỗi phiên bản tài liệu chỉ được chia chunk và embed một lần
+from langchain_core.documents.base import Document
+from langchain_core.embeddings import Embeddings
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from functions.vector_store import VectorStoreBackend, create_vector_store
+
+from typing import Dict, List, Optional, Sequence
+import hashlib
+import os
+import threading
+
+
+def document_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class DocumentIndex:
+    """
+    Collection vector theo tài liệu (doc_id -> các chunk), dùng chung cho mọi query;
+    backend Chroma hoặc FAISS theo VECTOR_STORE_BACKEND:
+    - sync() chỉ chia chunk + embed tài liệu mới hoặc đã đổi nội dung (so hash), chunk của phiên bản cũ bị xoá
+    - search() chỉ embed câu query rồi tra trên index có sẵn, lọc theo doc_ids nếu cần
+    - lưu trên đĩa nên chạy lại chương trình không phải embed lại
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        persist_dir: Optional[str] = None,
+        collection_name: str = "documents",
+        chunk_size: int = 1000,
+        chunk_overlap: int = 200
+    ):
+        self.persist_dir = persist_dir or os.getenv("DOCUMENT_INDEX_DIR", "./db/documents")
+        self.vectordb: VectorStoreBackend = create_vector_store(
+            embeddings,
+            persist_dir=self.persist_dir,
+            collection_name=collection_name
+        )
+        self.text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap
+        )
+        # doc_id -> hash nội dung đang nằm trong index, đọc từ metadata ở lần sync đầu tiên
+        self._versions: Optional[Dict[str, str]] = None
+        self._lock = threading.Lock()
+
+    def _load_versions(self) -> Dict[str, str]:
+        if self._versions is None:
+            data = self.vectordb.get(include=["metadatas"])
+            self._versions = {
+                metadata["doc_id"]: metadata["doc_hash"]
+                for metadata in data["metadatas"]
+                if metadata and "doc_id" in metadata
+            }
+        return self._versions
+
+    def sync(self, documents: Dict[str, str], prune: bool = False) -> Dict[str, int]:
+        """
+        documents: doc_id -> nội dung. Trả về số tài liệu đã thêm / cập nhật / giữ nguyên / xoá.
+        prune=True: xoá khỏi index các tài liệu không có trong documents
+        """
+        stats = {"added": 0, "updated": 0, "unchanged": 0, "removed": 0}
+        with self._lock:
+            versions = self._load_versions()
+            for doc_id, text in documents.items():
+                doc_hash = document_hash(text)
+                current = versions.get(doc_id)
+                if current == doc_hash:
+                    stats["unchanged"] += 1
+                    continue
+                if current is not None:
+                    # nội dung đổi: bỏ chunk của phiên bản cũ
+                    self.vectordb.delete(where={"doc_id": doc_id})
+                    stats["updated"] += 1
+                else:
+                    stats["added"] += 1
+
+                chunks = self.text_splitter.split_text(text)
+                if chunks:
+                    self.vectordb.add_texts(
+                        texts=chunks,
+                        metadatas=[
+                            {"doc_id": doc_id, "doc_hash": doc_hash, "chunk_id": i}
+                            for i in range(len(chunks))
+                        ],
+                        ids=[f"{doc_id}#{doc_hash[:16]}#{i}" for i in range(len(chunks))]
+                    )
+                versions[doc_id] = doc_hash
+
+            if prune:
+                for doc_id in [doc_id for doc_id in versions if doc_id not in documents]:
+                    self.vectordb.delete(where={"doc_id": doc_id})
+                    del versions[doc_id]
+                    stats["removed"] += 1
+        return stats
+
+    def sync_texts(self, texts: Sequence[str]) -> List[str]:
+        """Tài liệu không có id: id theo nội dung, trả về doc_ids để search lọc"""
+        documents = {f"text/{document_hash(text)[:32]}": text for text in texts}
+        self.sync(documents)
+        return list(documents.keys())
+
+    def search(self, query: str, k: int = 5, doc_ids: Optional[Sequence[str]] = None) -> List[Document]:
+        """doc_ids: chỉ tìm trong chunk của các tài liệu này (None = toàn bộ index)"""
+        if doc_ids is not None:
+            if not doc_ids:
+                return []
+            return self.vectordb.similarity_search(query, k=k, filter={"doc_id": {"$in": list(doc_ids)}})
+        return self.vectordb.similarity_search(query, k=k)
+
+    def count(self) -> int:
+        return self.vectordb.count()
+
+
+__all__ = ["DocumentIndex", "document_hash"]
@@ -0,0 +1,504 @@
+# Kho tài liệu có inverted index + BM25, tìm được cả khi gõ không dấu (tiếng Việt)
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+import glob
+import json
+import math
+import os
+import re
+import unicodedata
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+# term có mặt trong hơn tỉ lệ này số tài liệu là term phổ biến: chỉ cộng điểm cho ứng viên (xem DocumentStore.search)
+COMMON_TERM_FRACTION = 0.05
+
+
+def fold_accents(text: str) -> str:
+    """"Việc làm" -> "viec lam": bỏ dấu (combining mark sau NFD), đ -> d"""
+    decomposed = unicodedata.normalize("NFD", text.lower())
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return stripped.replace("đ", "d")
+
+
+def tokenize(text: str) -> List[str]:
+    """Token thường (giữ dấu, NFC)"""
+    return TOKEN_PATTERN.findall(unicodedata.normalize("NFC", text.lower()))
+
+
+@dataclass
+class StoredDocument:
+    id: str
+    text: str
+    metadata: Dict = field(default_factory=dict)
+
+
+def bm25_idf(num_docs: int, doc_freq: int) -> float:
+    # idf của BM25+ (luôn dương)
+    return math.log(1 + (num_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+
+
+def bm25_weights(tf: np.ndarray, lengths: np.ndarray, idf: float, k1: float, b: float, avgdl: float) -> np.ndarray:
+    norm = k1 * (1 - b + b * lengths / max(avgdl, 1e-9))
+    return (idf * tf * (k1 + 1) / (tf + norm)).astype(np.float32)
+
+
+def count_terms(tokens: List[str]) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for token in tokens:
+        counts[token] = counts.get(token, 0) + 1
+    return counts
+
+
+def document_tokens(text: str, folded_cache: Dict[str, str]) -> Tuple[List[str], List[str]]:
+    """(token giữ dấu, token bỏ dấu); bỏ dấu theo từng token khác nhau, không theo từng lần xuất hiện"""
+    tokens = tokenize(text)
+    for token in tokens:
+        if token not in folded_cache:
+            folded_cache[token] = fold_accents(token)
+    return tokens, [folded_cache[token] for token in tokens]
+
+
+class BM25Index:
+    """
+    Inverted index BM25 trên một trường token: term -> (mảng doc, mảng trọng số BM25 đã tính sẵn).
+    Trọng số idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * dl / avgdl)) được tính lúc build
+    nên lúc query chỉ cộng các posting list vào một mảng điểm rồi lấy top-k.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.num_docs = 0
+        self.avgdl = 0.0
+        self.postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        # trọng số lớn nhất của mỗi term (cận trên điểm term đó đóng góp cho một tài liệu)
+        self.max_weights: Dict[str, float] = {}
+        # idf lúc build, để đổi trọng số sang idf khác (idf của cả kho khi có DeltaIndex)
+        self.idf: Dict[str, float] = {}
+
+    def build(self, token_lists: Sequence[List[str]]) -> None:
+        self.num_docs = len(token_lists)
+        lengths = np.fromiter((len(tokens) for tokens in token_lists), dtype=np.float32, count=self.num_docs)
+        self.avgdl = float(lengths.mean()) if self.num_docs else 0.0
+
+        raw: Dict[str, Tuple[List[int], List[int]]] = {}
+        for doc_id, tokens in enumerate(token_lists):
+            for term, tf in count_terms(tokens).items():
+                docs, tfs = raw.setdefault(term, ([], []))
+                docs.append(doc_id)
+                tfs.append(tf)
+
+        self.postings = {}
+        self.max_weights = {}
+        self.idf = {}
+        for term, (docs, tfs) in raw.items():
+            doc_ids = np.asarray(docs, dtype=np.int32)
+            idf = bm25_idf(self.num_docs, len(docs))
+            weights = bm25_weights(np.asarray(tfs, dtype=np.float32), lengths[doc_ids], idf, self.k1, self.b, self.avgdl)
+            # doc_ids tăng dần (thứ tự duyệt tài liệu), searchsorted dùng được
+            self.postings[term] = (doc_ids, weights)
+            self.max_weights[term] = float(weights.max())
+            self.idf[term] = idf
+
+    def scores(self, terms: Iterable[str], weight: float = 1.0, out: Optional[np.ndarray] = None) -> np.ndarray:
+        scores = out if out is not None else np.zeros(self.num_docs, dtype=np.float32)
+        for term in terms:
+            posting = self.postings.get(term)
+            if posting is not None:
+                doc_ids, weights = posting
+                # doc_ids trong một posting list không trùng nhau nên += theo chỉ số là đúng
+                scores[doc_ids] += weights * weight
+        return scores
+
+
+class DeltaIndex:
+    """
+    Posting list nối thêm được cho tài liệu thêm sau lần build BM25Index gần nhất: thêm một tài liệu chỉ
+    đếm term của nó, không build lại gì; trọng số BM25 tính lúc query theo idf / avgdl của cả kho
+    (delta nhỏ nên rẻ)
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        self._lengths: List[int] = []
+        self._lengths_array: Optional[np.ndarray] = None
+
+    @property
+    def num_docs(self) -> int:
+        return len(self._lengths)
+
+    @property
+    def avgdl(self) -> float:
+        return sum(self._lengths) / len(self._lengths) if self._lengths else 0.0
+
+    def add(self, tokens: List[str]) -> int:
+        doc_id = len(self._lengths)
+        self._lengths.append(len(tokens))
+        self._lengths_array = None
+        for term, tf in count_terms(tokens).items():
+            docs, tfs = self.postings.setdefault(term, ([], []))
+            docs.append(doc_id)
+            tfs.append(tf)
+        return doc_id
+
+    def weights(self, term: str, idf: float, avgdl: float) -> Tuple[np.ndarray, np.ndarray]:
+        if self._lengths_array is None:
+            self._lengths_array = np.asarray(self._lengths, dtype=np.float32)
+        docs, tfs = self.postings[term]
+        doc_ids = np.asarray(docs, dtype=np.int32)
+        tf = np.asarray(tfs, dtype=np.float32)
+        return doc_ids, bm25_weights(tf, self._lengths_array[doc_ids], idf, self.k1, self.b, avgdl)
+
+
+class IndexSnapshot:
+    """
+    Tài liệu của một DocumentStore tại một thời điểm; build() tạo index chính (BM25Index bỏ dấu + giữ dấu).
+    build() không đụng tới DocumentStore nên chạy được ngoài lock của caller, xong thì DocumentStore.install()
+    """
+
+    def __init__(
+        self,
+        documents: List[StoredDocument],
+        tokens: List[Optional[Tuple[List[str], List[str]]]],
+        k1: float = 1.5,
+        b: float = 0.75
+    ):
+        self.documents = documents
+        # token đã có sẵn của từng tài liệu (None: chưa tokenize)
+        self.tokens = tokens
+        self.folded = BM25Index(k1, b)
+        self.exact = BM25Index(k1, b)
+
+    def build(self) -> "IndexSnapshot":
+        folded_cache: Dict[str, str] = {}
+        for i, doc in enumerate(self.documents):
+            if self.tokens[i] is None:
+                self.tokens[i] = document_tokens(doc.text, folded_cache)
+        self.exact.build([tokens[0] for tokens in self.tokens])
+        self.folded.build([tokens[1] for tokens in self.tokens])
+        return self
+
+
+# (doc_ids, trọng số, hệ số nhân, cận trên điểm) của một term trong một phần index
+Posting = Tuple[np.ndarray, np.ndarray, float, float]
+
+
+class DocumentStore:
+    """
+    - index trên token đã bỏ dấu: "viec lam" tìm được "việc làm" và ngược lại
+    - index thứ hai trên token giữ dấu: query có dấu thì tài liệu khớp đúng dấu được cộng thêm
+      (accent_boost), tránh "mà" / "má" / "mã" bị coi như nhau hoàn toàn
+    - index chính build một lần trên mọi tài liệu; tài liệu thêm / thay sau đó được nối ngay vào delta
+      (DeltaIndex), tài liệu bị xoá / thay chỉ bị đánh dấu. Search tìm trên cả hai với idf của cả kho
+    - delta + số tài liệu đã xoá vượt delta_max_docs hoặc delta_max_ratio * số tài liệu của index chính
+      thì build lại index chính: ở lần search kế tiếp, hoặc (auto_compact=False) do caller tự gọi
+      compaction() -> IndexSnapshot.build() -> install() để phần build chạy ngoài lock của mình.
+      Token của tài liệu không đổi được giữ lại nên build lại không phải tokenize lại
+    """
+
+    def __init__(
+        self,
+        k1: float = 1.5,
+        b: float = 0.75,
+        accent_boost: float = 0.5,
+        delta_max_docs: Optional[int] = None,
+        delta_max_ratio: Optional[float] = None,
+        auto_compact: bool = True
+    ):
+        self.k1 = k1
+        self.b = b
+        self.accent_boost = accent_boost
+        self.delta_max_docs = delta_max_docs or int(os.getenv("DOCUMENT_STORE_DELTA_MAX_DOCS", "2000"))
+        self.delta_max_ratio = delta_max_ratio or float(os.getenv("DOCUMENT_STORE_DELTA_MAX_RATIO", "0.1"))
+        self.auto_compact = auto_compact
+        self.documents: List[StoredDocument] = []
+        self._positions: Dict[str, int] = {}
+        # doc id -> (token giữ dấu, token bỏ dấu)
+        self._tokens: Dict[str, Tuple[List[str], List[str]]] = {}
+        self._folded_cache: Dict[str, str] = {}
+
+        # index chính: tài liệu tới lần build gần nhất, tài liệu bị xoá / thay sau đó đánh dấu trong _main_deleted
+        self._main = IndexSnapshot([], [], k1, b).build()
+        self._main_positions: Dict[str, int] = {}
+        self._main_deleted = np.zeros(0, dtype=bool)
+        # delta: tài liệu thêm / thay sau lần build gần nhất
+        self._delta_folded = DeltaIndex(k1, b)
+        self._delta_exact = DeltaIndex(k1, b)
+        self._delta_documents: List[StoredDocument] = []
+        self._delta_positions: Dict[str, int] = {}
+        self._delta_deleted: List[bool] = []
+        # chưa build lần nào: add chỉ lưu tài liệu, lần search đầu build một lần cho cả kho
+        self._built = False
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    @property
+    def built(self) -> bool:
+        return self._built
+
+    def _tokens_of(self, document: StoredDocument) -> Tuple[List[str], List[str]]:
+        tokens = self._tokens.get(document.id)
+        if tokens is None:
+            tokens = document_tokens(document.text, self._folded_cache)
+            self._tokens[document.id] = tokens
+        return tokens
+
+    def _index_delta(self, document: StoredDocument) -> None:
+        exact, folded = self._tokens_of(document)
+        self._delta_exact.add(exact)
+        self._delta_folded.add(folded)
+        self._delta_positions[document.id] = len(self._delta_documents)
+        self._delta_documents.append(document)
+        self._delta_deleted.append(False)
+
+    def _discard(self, doc_id: str) -> None:
+        """Đánh dấu bản đang nằm trong index (chính hoặc delta) của doc_id là đã xoá"""
+        position = self._main_positions.pop(doc_id, None)
+        if position is not None:
+            self._main_deleted[position] = True
+        position = self._delta_positions.pop(doc_id, None)
+        if position is not None:
+            self._delta_deleted[position] = True
+
+    def add(self, text: str, id: Optional[str] = None, metadata: Optional[Dict] = None) -> str:
+        """Thêm hoặc thay tài liệu cùng id"""
+        doc_id = id if id is not None else str(len(self.documents))
+        document = StoredDocument(id=doc_id, text=text, metadata=metadata or {})
+        self._tokens.pop(doc_id, None)
+        if doc_id in self._positions:
+            self.documents[self._positions[doc_id]] = document
+        else:
+            self._positions[doc_id] = len(self.documents)
+            self.documents.append(document)
+        if self._built:
+            self._discard(doc_id)
+            self._index_delta(document)
+        return doc_id
+
+    def add_many(self, documents: Iterable[StoredDocument]) -> None:
+        for document in documents:
+            self.add(document.text, id=document.id, metadata=document.metadata)
+
+    def remove(self, ids: Iterable[str]) -> int:
+        removed = {doc_id for doc_id in ids if doc_id in self._positions}
+        if removed:
+            self.documents = [doc for doc in self.documents if doc.id not in removed]
+            for doc_id in removed:
+                self._tokens.pop(doc_id, None)
+                if self._built:
+                    self._discard(doc_id)
+            self._positions = {doc.id: i for i, doc in enumerate(self.documents)}
+        return len(removed)
+
+    def needs_compaction(self) -> bool:
+        if not self._built:
+            return True
+        changes = len(self._delta_documents) + int(self._main_deleted.sum())
+        return changes > self.delta_max_docs or changes > self.delta_max_ratio * len(self._main.documents)
+
+    def compaction(self) -> IndexSnapshot:
+        """Ảnh chụp tài liệu hiện tại để build index chính (rẻ, gọi khi đang giữ lock của caller)"""
+        return IndexSnapshot(
+            list(self.documents),
+            [self._tokens.get(doc.id) for doc in self.documents],
+            self.k1,
+            self.b
+        )
+
+    def install(self, snapshot: IndexSnapshot) -> None:
+        """
+        Dùng snapshot đã build làm index chính; tài liệu bị thêm / thay / xoá trong lúc build
+        (sau compaction()) được đưa vào delta hoặc đánh dấu xoá
+        """
+        main_positions: Dict[str, int] = {}
+        deleted = np.zeros(len(snapshot.documents), dtype=bool)
+        for i, (doc, tokens) in enumerate(zip(snapshot.documents, snapshot.tokens)):
+            position = self._positions.get(doc.id)
+            if position is not None and self.documents[position] is doc:
+                main_positions[doc.id] = i
+                self._tokens.setdefault(doc.id, tokens)
+            else:
+                deleted[i] = True
+
+        self._main = snapshot
+        self._main_positions = main_positions
+        self._main_deleted = deleted
+        self._delta_folded = DeltaIndex(self.k1, self.b)
+        self._delta_exact = DeltaIndex(self.k1, self.b)
+        self._delta_documents = []
+        self._delta_positions = {}
+        self._delta_deleted = []
+        for doc in self.documents:
+            if doc.id not in main_positions:
+                self._index_delta(doc)
+        self._built = True
+
+    def build(self) -> None:
+        """Build lại index chính trên mọi tài liệu (delta rỗng)"""
+        self.install(self.compaction().build())
+
+    def _ensure_index(self) -> None:
+        if not self._built or (self.auto_compact and self.needs_compaction()):
+            self.build()
+
+    def _query_terms(self, query: Union[str, Sequence[str]]) -> List[Tuple[int, str, float]]:
+        """(index, term, hệ số) với index 0 = bỏ dấu, 1 = giữ dấu: token có dấu được tính thêm một lần trên index giữ dấu"""
+        text = query if isinstance(query, str) else " ".join(query)
+        terms: Dict[Tuple[int, str], float] = {}
+        for token in tokenize(text):
+            folded = fold_accents(token)
+            terms[(0, folded)] = terms.get((0, folded), 0.0) + 1.0
+            # chỉ token có dấu mới cần phân biệt
+            if folded != token and self.accent_boost:
+                terms[(1, token)] = terms.get((1, token), 0.0) + self.accent_boost
+        return [(which, term, weight) for (which, term), weight in terms.items()]
+
+    def _postings(self, query: Union[str, Sequence[str]]) -> Tuple[List[Posting], List[Posting]]:
+        """
+        Posting của các term trong query trên index chính và trên delta, cùng idf tính theo cả kho
+        (delta rỗng thì đúng bằng trọng số đã tính sẵn của index chính)
+        """
+        main_indexes = (self._main.folded, self._main.exact)
+        delta_indexes = (self._delta_folded, self._delta_exact)
+        num_docs = self._main.folded.num_docs + self._delta_folded.num_docs
+        # delta chuẩn hoá độ dài theo avgdl của index chính để điểm hai bên so được với nhau
+        avgdl = self._main.folded.avgdl if self._main.folded.num_docs else self._delta_folded.avgdl
+
+        main: List[Posting] = []
+        delta: List[Posting] = []
+        for which, term, weight in self._query_terms(query):
+            main_posting = main_indexes[which].postings.get(term)
+            delta_posting = delta_indexes[which].postings.get(term)
+            doc_freq = (len(main_posting[0]) if main_posting else 0) + (len(delta_posting[0]) if delta_posting else 0)
+            if not doc_freq:
+                continue
+            idf = bm25_idf(num_docs, doc_freq)
+            if main_posting is not None:
+                scale = weight * idf / main_indexes[which].idf[term]
+                main.append((main_posting[0], main_posting[1], scale, main_indexes[which].max_weights[term] * scale))
+            if delta_posting is not None:
+                doc_ids, weights = delta_indexes[which].weights(term, idf, avgdl)
+                delta.append((doc_ids, weights, weight, float(weights.max()) * weight))
+        return main, delta
+
+    def score(self, query: Union[str, Sequence[str]]) -> np.ndarray:
+        """Điểm BM25 của mọi tài liệu (theo thứ tự self.documents); query là câu hoặc danh sách từ khoá / cụm từ"""
+        self._ensure_index()
+        main, delta = self._postings(query)
+        scores = np.zeros(len(self.documents), dtype=np.float32)
+        segments = (
+            (main, self._main.documents, self._main_deleted),
+            (delta, self._delta_documents, np.asarray(self._delta_deleted, dtype=bool))
+        )
+        for postings, documents, deleted in segments:
+            segment_scores = np.zeros(len(documents), dtype=np.float32)
+            for doc_ids, weights, scale, _ in postings:
+                segment_scores[doc_ids] += weights * scale
+            live = np.flatnonzero(~deleted)
+            positions = np.fromiter((self._positions[documents[i].id] for i in live), dtype=np.int64, count=len(live))
+            scores[positions] = segment_scores[live]
+        return scores
+
+    @staticmethod
+    def _best(candidates: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """k ứng viên điểm cao nhất, giữ thứ tự tăng dần của candidates"""
+        if len(candidates) > k:
+            order = np.argpartition(scores, -k)[-k:]
+            order.sort()
+            return candidates[order], scores[order]
+        return candidates, scores
+
+    @staticmethod
+    def _top_k(postings: List[Posting], num_docs: int, k: int, deleted: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k của một phần index (chỉ tài liệu khớp ít nhất một từ, bỏ tài liệu đã xoá).
+        Term hiếm được cộng vào mảng điểm đầy đủ; term phổ biến (idf thấp, posting list dài) chỉ được
+        cộng cho các ứng viên khi tổng cận trên của chúng không đủ đưa tài liệu khác vào top-k
+        (cùng kết quả với chấm điểm đầy đủ, ít việc hơn nhiều).
+        """
+        rare = [p for p in postings if len(p[0]) <= num_docs * COMMON_TERM_FRACTION]
+        common = [p for p in postings if len(p[0]) > num_docs * COMMON_TERM_FRACTION]
+
+        scores = np.zeros(num_docs, dtype=np.float32)
+        for doc_ids, weights, scale, _ in rare:
+            # doc_ids trong một posting list không trùng nhau nên += theo chỉ số là đúng
+            scores[doc_ids] += weights * scale
+        scores[deleted] = 0
+
+        if rare and common:
+            candidates = np.flatnonzero(scores)
+            if len(candidates) >= k:
+                partial = scores[candidates]
+                threshold = float(np.partition(partial, -k)[-k])
+                upper_bound = sum(bound for _, _, _, bound in common)
+                # tài liệu không chứa term hiếm nào có điểm <= upper_bound < threshold: không vào được top-k
+                if upper_bound < threshold:
+                    keep = partial + upper_bound >= threshold
+                    candidates, partial = candidates[keep], partial[keep]
+                    for doc_ids, weights, scale, _ in common:
+                        positions = np.minimum(np.searchsorted(doc_ids, candidates), len(doc_ids) - 1)
+                        hit = doc_ids[positions] == candidates
+                        partial[hit] += weights[positions[hit]] * scale
+                    return DocumentStore._best(candidates, partial, k)
+
+        for doc_ids, weights, scale, _ in common:
+            scores[doc_ids] += weights * scale
+        scores[deleted] = 0
+        candidates = np.flatnonzero(scores)
+        return DocumentStore._best(candidates, scores[candidates], k)
+
+    def search(self, query: Union[str, Sequence[str]], k: int = 5) -> List[Tuple[StoredDocument, float]]:
+        """Top-k tài liệu theo BM25 (chỉ tài liệu khớp ít nhất một từ), điểm giảm dần; tìm trên index chính và delta rồi gộp"""
+        self._ensure_index()
+        main, delta = self._postings(query)
+        main_candidates, main_scores = self._top_k(main, len(self._main.documents), k, self._main_deleted)
+        delta_candidates, delta_scores = self._top_k(
+            delta, len(self._delta_documents), k, np.asarray(self._delta_deleted, dtype=bool)
+        )
+        documents = [self._main.documents[i] for i in main_candidates] + [self._delta_documents[i] for i in delta_candidates]
+        scores = np.concatenate([main_scores, delta_scores])
+        ranked = np.argsort(-scores, kind="stable")[:k]
+        return [(documents[i], float(scores[i])) for i in ranked]
+
+    @classmethod
+    def from_directory(cls, directory: str, patterns: Sequence[str] = ("*.txt", "*.md"), **kwargs) -> "DocumentStore":
+        """Mỗi file một tài liệu, id = đường dẫn tương đối"""
+        store = cls(**kwargs)
+        paths = sorted({
+            path for pattern in patterns
+            for path in glob.glob(os.path.join(directory, "**", pattern), recursive=True)
+        })
+        for path in paths:
+            with open(path, encoding="utf-8") as f:
+                store.add(f.read(), id=os.path.relpath(path, directory), metadata={"source": path})
+        return store
+
+    @classmethod
+    def from_jsonl(cls, path: str, text_field: str = "text", id_field: str = "id", **kwargs) -> "DocumentStore":
+        """Mỗi dòng một JSON object: text_field là nội dung, các field khác (trừ id) vào metadata"""
+        store = cls(**kwargs)
+        with open(path, encoding="utf-8") as f:
+            for line_number, line in enumerate(f):
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                text = record.pop(text_field)
+                doc_id = str(record.pop(id_field, line_number))
+                store.add(text, id=doc_id, metadata=record)
+        return store
+
+    @classmethod
+    def load(cls, path: str, **kwargs) -> "DocumentStore":
+        """Thư mục hoặc file .jsonl"""
+        if os.path.isdir(path):
+            return cls.from_directory(path, **kwargs)
+        return cls.from_jsonl(path, **kwargs)
+
+
+__all__ = ["DocumentStore", "StoredDocument", "BM25Index", "DeltaIndex", "IndexSnapshot", "fold_accents", "tokenize"]
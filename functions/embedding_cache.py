@@ -0,0 +1,322 @@
+# Cache embedding trên đĩa: text đã vector hoá rồi thì không chạy lại model
+from langchain_core.embeddings import Embeddings
+
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+
+import numpy as np
+
+from functions.file_lock import file_lock
+from functions.similarity import QuantizedVectors
+
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    slot INTEGER NOT NULL UNIQUE,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries (last_access);
+"""
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def content_key(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Lưu vector của một embedding model trên đĩa.
+    - vectors: mảng numpy memory-mapped (capacity x dim), float32, float16 hoặc int8
+      (int8: thêm scales.bin, mỗi vector một scale, vector ~ codes * scale)
+    - index: SQLite map sha256(text đã chuẩn hoá) -> slot trong mảng
+    - đầy thì slot của entry lâu không dùng nhất (LRU) được tái sử dụng
+    - dùng chung được giữa nhiều process (server + job worker): file vector được tạo một lần dưới file lock
+      (meta.json ghi sau cùng, bằng os.replace), process khác chỉ mở lại r+; cấp slot, ghi vector và
+      đọc vector đều nằm trong một transaction BEGIN IMMEDIATE
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        cache_dir: Optional[str] = None,
+        capacity: Optional[int] = None,
+        dtype: Optional[str] = None
+    ):
+        root = cache_dir or os.getenv("EMBEDDING_CACHE_DIR", "./db/embedding_cache")
+        self.directory = os.path.join(root, model_name.replace("/", "__"))
+        self.capacity = capacity or int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "50000"))
+        self.dtype = np.dtype(dtype or os.getenv("EMBEDDING_CACHE_DTYPE", "float16"))
+
+        self.hits = 0
+        self.misses = 0
+        self._vectors: Optional[np.memmap] = None
+        self._scales: Optional[np.memmap] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._meta_path = os.path.join(self.directory, "meta.json")
+        self._vectors_path = os.path.join(self.directory, "vectors.bin")
+        self._scales_path = os.path.join(self.directory, "scales.bin")
+        self._lock_path = os.path.join(self.directory, "create.lock")
+        # isolation_level=None: tự quản lý transaction (BEGIN IMMEDIATE khi đọc / ghi slot)
+        self._conn = sqlite3.connect(
+            os.path.join(self.directory, "index.sqlite3"),
+            check_same_thread=False,
+            isolation_level=None,
+            timeout=30
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(INDEX_SCHEMA)
+        self._open_existing()
+
+    def _open_existing(self) -> bool:
+        """Mở file vector đã có (do process này hoặc process khác tạo); False nếu chưa có"""
+        if self._vectors is not None:
+            return True
+        if not os.path.exists(self._meta_path):
+            return False
+        with open(self._meta_path) as f:
+            meta = json.load(f)
+        # dùng lại cấu hình của file đã có trên đĩa
+        self.capacity = meta["capacity"]
+        self.dtype = np.dtype(meta["dtype"])
+        self._vectors = np.memmap(self._vectors_path, dtype=self.dtype, mode="r+", shape=(self.capacity, meta["dim"]))
+        if self.dtype == np.int8:
+            self._scales = np.memmap(self._scales_path, dtype=np.float32, mode="r+", shape=(self.capacity,))
+        return True
+
+    def _create_vectors(self, dim: int) -> None:
+        """Tạo file vector nếu chưa process nào tạo; mode w+ chỉ dùng cho file tạm nên không xoá dữ liệu có sẵn"""
+        with file_lock(self._lock_path):
+            # process khác có thể đã tạo xong trong lúc chờ lock
+            if self._open_existing():
+                return
+            files = [(self._vectors_path, self.dtype, (self.capacity, dim))]
+            if self.dtype == np.int8:
+                files.append((self._scales_path, np.dtype(np.float32), (self.capacity,)))
+            for path, dtype, shape in files:
+                tmp = f"{path}.tmp"
+                np.memmap(tmp, dtype=dtype, mode="w+", shape=shape).flush()
+                os.replace(tmp, path)
+            # meta.json xuất hiện sau cùng: thấy meta là file vector đã đủ kích thước
+            tmp = f"{self._meta_path}.tmp"
+            with open(tmp, "w") as f:
+                json.dump({"dim": dim, "dtype": self.dtype.name, "capacity": self.capacity}, f)
+            os.replace(tmp, self._meta_path)
+            self._open_existing()
+
+    def _slots(self, keys: Sequence[str]) -> Dict[str, int]:
+        """key -> slot của các key đã có (gọi trong transaction, cache đã có vectors)"""
+        unique_keys = list(set(keys))
+        slots: Dict[str, int] = {}
+        for start in range(0, len(unique_keys), 500):
+            batch = unique_keys[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            slots.update(self._conn.execute(
+                f"SELECT key, slot FROM entries WHERE key IN ({placeholders})", batch
+            ).fetchall())
+
+        if slots:
+            self._conn.executemany(
+                "UPDATE entries SET last_access = ? WHERE key = ?",
+                [(time.time(), key) for key in slots]
+            )
+
+        hits = sum(1 for key in keys if key in slots)
+        self.hits += hits
+        self.misses += len(keys) - hits
+        return slots
+
+    def get_quantized(self, keys: Sequence[str]) -> Tuple[List[str], Optional[QuantizedVectors]]:
+        """(các key đã có, vector của chúng theo đúng thứ tự, giữ nguyên dtype lưu trên đĩa)"""
+        with self._lock:
+            if not self._open_existing():
+                self.misses += len(keys)
+                return [], None
+            # đọc slot và copy vector trong cùng transaction: process khác không tái sử dụng slot giữa chừng
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                slots = self._slots(keys)
+                found = list(slots)
+                rows = np.fromiter((slots[key] for key in found), dtype=np.int64, count=len(found))
+                # fancy index trên memmap: một lần đọc, ra mảng liền khối
+                vectors = QuantizedVectors(
+                    codes=self._vectors[rows],
+                    scales=self._scales[rows] if self._scales is not None else None
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            return found, vectors
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Trả về vector (float32) của các key đã có trong cache"""
+        found, vectors = self.get_quantized(keys)
+        if not found:
+            return {}
+        return dict(zip(found, vectors.to_float()))
+
+    def put_many(self, items: Dict[str, Sequence[float]]) -> None:
+        if not items:
+            return
+        with self._lock:
+            if not self._open_existing():
+                self._create_vectors(len(next(iter(items.values()))))
+
+            quantized = QuantizedVectors.from_float(
+                np.stack([np.asarray(vector, dtype=np.float32) for vector in items.values()]),
+                self.dtype.name
+            )
+            now = time.time()
+            # BEGIN IMMEDIATE: cấp slot (COUNT / LRU) và ghi vector không chồng lên process khác;
+            # vector được flush trước COMMIT nên entry nhìn thấy được luôn có dữ liệu
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                count: int = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+                for i, key in enumerate(items):
+                    row = self._conn.execute("SELECT slot FROM entries WHERE key = ?", (key,)).fetchone()
+                    if row is not None:
+                        slot = row[0]
+                    elif count < self.capacity:
+                        slot = count
+                        count += 1
+                    else:
+                        # cache đầy: lấy slot của entry lâu không dùng nhất
+                        old_key, slot = self._conn.execute(
+                            "SELECT key, slot FROM entries ORDER BY last_access ASC LIMIT 1"
+                        ).fetchone()
+                        self._conn.execute("DELETE FROM entries WHERE key = ?", (old_key,))
+
+                    self._vectors[slot] = quantized.codes[i]
+                    if self._scales is not None:
+                        self._scales[slot] = quantized.scales[i]
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO entries (key, slot, last_access) VALUES (?, ?, ?)",
+                        (key, slot, now)
+                    )
+
+                self._vectors.flush()
+                if self._scales is not None:
+                    self._scales.flush()
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def stats(self) -> Dict:
+        with self._lock:
+            entries: int = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            return {
+                "entries": entries,
+                "capacity": self.capacity,
+                "dtype": self.dtype.name,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Bọc một Embeddings của langchain, tra cache trước khi chạy model.
+    Model chỉ được khởi tạo khi có text chưa nằm trong cache.
+    """
+
+    def __init__(self, model_name: str, factory: Callable[[], Embeddings], cache: Optional[EmbeddingCache] = None):
+        self.model_name = model_name
+        self.cache = cache or EmbeddingCache(model_name)
+        self._factory = factory
+        self._model: Optional[Embeddings] = None
+        self._model_lock = threading.Lock()
+
+    @property
+    def model(self) -> Embeddings:
+        with self._model_lock:
+            if self._model is None:
+                self._model = self._factory()
+            return self._model
+
+    def _missing(self, keys: List[str], texts: List[str], found: set) -> Dict[str, str]:
+        # text trùng nhau trong cùng một lần gọi chỉ embed một lần
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        return missing
+
+    def _compute(self, missing: Dict[str, str], embed_fn: Callable[[List[str]], List[List[float]]]) -> np.ndarray:
+        vectors = np.asarray(embed_fn(list(missing.values())), dtype=np.float32)
+        self.cache.put_many(dict(zip(missing.keys(), vectors)))
+        return vectors
+
+    def _embed_quantized(self, texts: List[str], embed_fn: Callable[[List[str]], List[List[float]]]) -> QuantizedVectors:
+        """Vector theo dtype của cache (int8 / float16 / float32), thứ tự như texts"""
+        if not texts:
+            # như _embed: mảng rỗng (0, 0), cùng dtype (và scales nếu int8) với cache
+            return QuantizedVectors(
+                codes=np.zeros((0, 0), dtype=self.cache.dtype),
+                scales=np.zeros(0, dtype=np.float32) if self.cache.dtype == np.int8 else None
+            )
+        keys = [content_key(text) for text in texts]
+        found_keys, found = self.cache.get_quantized(keys)
+        missing = self._missing(keys, texts, set(found_keys))
+
+        parts: List[QuantizedVectors] = [found] if found_keys else []
+        part_keys = list(found_keys)
+        if missing:
+            # lượng tử hoá giống hệt lúc ghi vào cache nên lần sau đọc lại ra cùng codes
+            parts.append(QuantizedVectors.from_float(self._compute(missing, embed_fn), self.cache.dtype.name))
+            part_keys.extend(missing)
+
+        position = {key: i for i, key in enumerate(part_keys)}
+        order = np.fromiter((position[key] for key in keys), dtype=np.int64, count=len(keys))
+        codes = np.concatenate([part.codes for part in parts])[order]
+        scales = np.concatenate([part.scales for part in parts])[order] if parts[0].scales is not None else None
+        return QuantizedVectors(codes=codes, scales=scales)
+
+    def _embed(self, texts: List[str], embed_fn: Callable[[List[str]], List[List[float]]]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        return self._embed_quantized(texts, embed_fn).to_float()
+
+    def embed_documents_array(self, texts: List[str]) -> np.ndarray:
+        """(len(texts), dim) float32 liền khối, không qua list Python"""
+        return self._embed(texts, lambda missing: self.model.embed_documents(missing))
+
+    def embed_documents_quantized(self, texts: List[str]) -> QuantizedVectors:
+        """Giữ nguyên dtype của cache (vd int8 + scale), tính similarity thẳng trên đó"""
+        return self._embed_quantized(texts, lambda missing: self.model.embed_documents(missing))
+
+    def embed_query_array(self, text: str) -> np.ndarray:
+        return self._embed([text], lambda missing: [self.model.embed_query(missing[0])])[0]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        # interface của langchain (Chroma, ...) cần list
+        return self.embed_documents_array(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_query_array(text).tolist()
+
+
+@lru_cache(maxsize=None)
+def get_cached_huggingface_embeddings(model_name: str) -> CachedEmbeddings:
+    """Một instance dùng chung cho mỗi model trong process"""
+    def load_model() -> Embeddings:
+        # import khi dùng: đọc cache (và process chỉ dùng cache) không cần langchain_huggingface
+        from langchain_huggingface import HuggingFaceEmbeddings
+
+        return HuggingFaceEmbeddings(model_name=model_name)
+
+    return CachedEmbeddings(model_name=model_name, factory=load_model)
@@ -0,0 +1,20 @@
+# Lock giữa các process (server và job worker dùng chung ./db): flock độc quyền trên một file lock
+from contextlib import contextmanager
+from typing import Iterator
+import fcntl
+import os
+
+
+@contextmanager
+def file_lock(path: str) -> Iterator[None]:
+    """Giữ flock độc quyền trên path (tạo file nếu chưa có) trong khối with; process khác chờ tới khi nhả"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "a") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+__all__ = ["file_lock"]
@@ -0,0 +1,210 @@
+# Cache HTTP trên đĩa, dùng chung cho scraper và web summary
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    url TEXT PRIMARY KEY,
+    body_file TEXT NOT NULL,
+    final_url TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    encoding TEXT NOT NULL,
+    headers TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    stored_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses (last_access);
+"""
+
+
+@dataclass
+class CachedResponse:
+    url: str
+    status: int
+    body: bytes
+    encoding: str
+    headers: Dict[str, str]
+    etag: Optional[str]
+    last_modified: Optional[str]
+    expires_at: float
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+
+def parse_cache_control(value: str) -> Dict[str, Optional[str]]:
+    directives: Dict[str, Optional[str]] = {}
+    for part in value.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, arg = part.partition("=")
+        directives[name.strip().lower()] = arg.strip().strip('"') or None
+    return directives
+
+
+class HttpCache:
+    """
+    Cache response GET theo url:
+    - thời gian tươi theo Cache-Control max-age / Expires, không có thì dùng ttl mặc định
+    - hết hạn thì revalidate bằng If-None-Match / If-Modified-Since (304 = dùng lại body cũ)
+    - no-store thì không lưu, no-cache thì lưu nhưng luôn revalidate
+    - tổng dung lượng vượt max_bytes thì xoá response lâu không dùng nhất (LRU)
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        default_ttl: Optional[float] = None,
+        max_bytes: Optional[int] = None
+    ):
+        self.cache_dir = cache_dir or os.getenv("HTTP_CACHE_DIR", "./db/http_cache")
+        self.default_ttl = default_ttl if default_ttl is not None else float(os.getenv("HTTP_CACHE_TTL", "300"))
+        self.max_bytes = max_bytes or int(os.getenv("HTTP_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._conn = sqlite3.connect(os.path.join(self.cache_dir, "index.sqlite3"), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def _expires_at(self, headers: Dict[str, str], now: float) -> Optional[float]:
+        """None = không được lưu"""
+        lowered = {k.lower(): v for k, v in headers.items()}
+        directives = parse_cache_control(lowered.get("cache-control", ""))
+        if "no-store" in directives:
+            return None
+        if "no-cache" in directives:
+            return now
+        max_age = directives.get("max-age")
+        if max_age is not None and max_age.isdigit():
+            return now + int(max_age)
+        if "expires" in lowered:
+            try:
+                return parsedate_to_datetime(lowered["expires"]).timestamp()
+            except (TypeError, ValueError):
+                return now
+        return now + self.default_ttl
+
+    def get(self, url: str) -> Optional[CachedResponse]:
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT body_file, final_url, status, encoding, headers, etag, last_modified, expires_at "
+                "FROM responses WHERE url = ?",
+                (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            body_file, final_url, status, encoding, headers, etag, last_modified, expires_at = row
+            try:
+                with open(os.path.join(self.cache_dir, body_file), "rb") as f:
+                    body = f.read()
+            except FileNotFoundError:
+                conn.execute("DELETE FROM responses WHERE url = ?", (url,))
+                conn.commit()
+                return None
+            conn.execute("UPDATE responses SET last_access = ? WHERE url = ?", (time.time(), url))
+            conn.commit()
+
+        return CachedResponse(
+            url=final_url,
+            status=status,
+            body=body,
+            encoding=encoding,
+            headers=json.loads(headers),
+            etag=etag,
+            last_modified=last_modified,
+            expires_at=expires_at
+        )
+
+    def put(self, url: str, final_url: str, status: int, body: bytes, encoding: str, headers: Dict[str, str]) -> None:
+        now = time.time()
+        expires_at = self._expires_at(headers, now)
+        if expires_at is None or status != 200 or len(body) > self.max_bytes:
+            return
+
+        lowered = {k.lower(): v for k, v in headers.items()}
+        body_file = hashlib.sha256(url.encode("utf-8")).hexdigest() + ".body"
+        with self._lock:
+            conn = self._connection()
+            with open(os.path.join(self.cache_dir, body_file), "wb") as f:
+                f.write(body)
+            conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, body_file, final_url, status, encoding, json.dumps(headers),
+                 lowered.get("etag"), lowered.get("last-modified"), now, expires_at, len(body), now)
+            )
+            self._evict(conn)
+            conn.commit()
+
+    def refresh(self, url: str, headers: Dict[str, str]) -> None:
+        """Server trả 304: body cũ vẫn đúng, chỉ gia hạn thời gian tươi"""
+        now = time.time()
+        expires_at = self._expires_at(headers, now)
+        with self._lock:
+            conn = self._connection()
+            if expires_at is None:
+                conn.execute("DELETE FROM responses WHERE url = ?", (url,))
+            else:
+                conn.execute(
+                    "UPDATE responses SET expires_at = ?, last_access = ? WHERE url = ?",
+                    (expires_at, now, url)
+                )
+            conn.commit()
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        total: int = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for url, body_file, size in conn.execute(
+            "SELECT url, body_file, size FROM responses ORDER BY last_access ASC"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM responses WHERE url = ?", (url,))
+            try:
+                os.remove(os.path.join(self.cache_dir, body_file))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def stats(self) -> Dict:
+        with self._lock:
+            entries, size = self._connection().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "misses": self.misses
+        }
+
+
+# cache dùng chung cho cả process
+http_cache = HttpCache()
+
+__all__ = ["HttpCache", "CachedResponse", "http_cache"]
@@ -0,0 +1,207 @@
+# HTTP client async dùng chung: connection pool (keep-alive), timeout, retry, giới hạn dung lượng body
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+import asyncio
+import json
+import os
+import threading
+
+import aiohttp
+
+from functions.http_cache import HttpCache, http_cache
+
+DEFAULT_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.36"
+
+# lỗi tạm thời, thử lại được
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class FetchError(Exception):
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+@dataclass
+class FetchResponse:
+    url: str  # url cuối cùng sau redirect
+    status: int
+    body: bytes
+    encoding: str = "utf-8"
+    headers: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def text(self) -> str:
+        return self.body.decode(self.encoding, errors="replace")
+
+    def json(self) -> Any:
+        return json.loads(self.text)
+
+
+class HttpClient:
+    """
+    Một aiohttp.ClientSession dùng chung cho cả process (mỗi event loop một session):
+    - connection pool có giới hạn tổng và theo từng host, giữ kết nối keep-alive
+    - cache DNS
+    - timeout connect/read, retry có backoff cho lỗi mạng và status 429/5xx
+    - từ chối body lớn hơn max_body_bytes
+    """
+
+    def __init__(
+        self,
+        limit: Optional[int] = None,
+        limit_per_host: Optional[int] = None,
+        dns_ttl: Optional[int] = None,
+        connect_timeout: Optional[float] = None,
+        read_timeout: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        backoff: float = 0.5,
+        max_body_bytes: Optional[int] = None,
+        cache: Optional[HttpCache] = None
+    ):
+        self.limit = limit or int(os.getenv("HTTP_POOL_LIMIT", "100"))
+        self.limit_per_host = limit_per_host or int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "8"))
+        self.dns_ttl = dns_ttl or int(os.getenv("HTTP_DNS_TTL", "300"))
+        self.connect_timeout = connect_timeout or float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+        self.read_timeout = read_timeout or float(os.getenv("HTTP_READ_TIMEOUT", "20"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("HTTP_MAX_RETRIES", "2"))
+        self.backoff = backoff
+        self.max_body_bytes = max_body_bytes or int(os.getenv("HTTP_MAX_BODY_BYTES", str(5 * 1024 * 1024)))
+        self.cache: HttpCache = cache or http_cache
+
+        # session gắn với event loop tạo ra nó: mỗi loop (loop của FastAPI, loop nền của news_search, ...)
+        # giữ session riêng của mình suốt đời loop, không tạo lại khi các lời gọi xen kẽ giữa các loop
+        self._sessions: Dict[asyncio.AbstractEventLoop, aiohttp.ClientSession] = {}
+        self._sessions_lock = threading.Lock()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        with self._sessions_lock:
+            # loop đã đóng thì kết nối của session cũng đã mất theo, chỉ cần bỏ khỏi dict
+            for old_loop in [old_loop for old_loop in self._sessions if old_loop.is_closed()]:
+                del self._sessions[old_loop]
+            session = self._sessions.get(loop)
+            if session is None or session.closed:
+                session = self._new_session()
+                self._sessions[loop] = session
+            return session
+
+    def _new_session(self) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            ttl_dns_cache=self.dns_ttl
+        )
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(
+                sock_connect=self.connect_timeout,
+                sock_read=self.read_timeout
+            ),
+            headers={"User-Agent": DEFAULT_USER_AGENT}
+        )
+
+    async def _read_body(self, response: aiohttp.ClientResponse) -> bytes:
+        declared = response.content_length
+        if declared is not None and declared > self.max_body_bytes:
+            raise FetchError(f"Response too large: {declared} bytes", status=response.status)
+
+        body = bytearray()
+        async for chunk in response.content.iter_chunked(64 * 1024):
+            body.extend(chunk)
+            if len(body) > self.max_body_bytes:
+                raise FetchError(f"Response larger than {self.max_body_bytes} bytes", status=response.status)
+        return bytes(body)
+
+    async def fetch(
+        self,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        params: Optional[Dict[str, Any]] = None,
+        allowed_statuses: Optional[set] = None
+    ) -> FetchResponse:
+        """GET url; status >= 400 (trừ allowed_statuses) sẽ raise FetchError"""
+        session = self._get_session()
+        last_error: Optional[Exception] = None
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with session.get(url, headers=headers, params=params) as response:
+                    if response.status in RETRY_STATUSES and attempt < self.max_retries:
+                        last_error = FetchError(f"HTTP {response.status} for {url}", status=response.status)
+                    else:
+                        if response.status >= 400 and response.status not in (allowed_statuses or set()):
+                            raise FetchError(f"HTTP {response.status} for {url}", status=response.status)
+                        body = await self._read_body(response)
+                        try:
+                            encoding = response.get_encoding()
+                        except RuntimeError:
+                            encoding = "utf-8"
+                        return FetchResponse(
+                            url=str(response.url),
+                            status=response.status,
+                            body=body,
+                            encoding=encoding,
+                            headers=dict(response.headers)
+                        )
+            except FetchError:
+                raise
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                last_error = e
+
+            if attempt < self.max_retries:
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+
+        raise FetchError(f"Failed to fetch {url}: {str(last_error) or type(last_error).__name__}")
+
+    async def fetch_cached(self, url: str, headers: Optional[Dict[str, str]] = None) -> FetchResponse:
+        """
+        GET qua cache trên đĩa: còn tươi thì không gọi mạng,
+        hết hạn thì gửi conditional GET (ETag / Last-Modified), 304 thì dùng lại body đã lưu
+        """
+        cached = self.cache.get(url)
+        if cached is not None and cached.fresh:
+            self.cache.hits += 1
+            return FetchResponse(url=cached.url, status=cached.status, body=cached.body,
+                                 encoding=cached.encoding, headers=cached.headers)
+
+        request_headers = dict(headers or {})
+        if cached is not None:
+            if cached.etag:
+                request_headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                request_headers["If-Modified-Since"] = cached.last_modified
+
+        response = await self.fetch(url, headers=request_headers)
+        if response.status == 304 and cached is not None:
+            self.cache.revalidated += 1
+            self.cache.refresh(url, response.headers)
+            return FetchResponse(url=cached.url, status=cached.status, body=cached.body,
+                                 encoding=cached.encoding, headers=cached.headers)
+
+        self.cache.misses += 1
+        self.cache.put(url, response.url, response.status, response.body, response.encoding, response.headers)
+        return response
+
+    async def get_json(self, url: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        response = await self.fetch(url, params=params)
+        return response.json()
+
+    async def close(self) -> None:
+        """Đóng session của mọi loop; session của loop khác (đang chạy ở thread khác) được đóng trên chính loop đó"""
+        current = asyncio.get_running_loop()
+        with self._sessions_lock:
+            sessions, self._sessions = self._sessions, {}
+        for loop, session in sessions.items():
+            if session.closed or loop.is_closed():
+                continue
+            if loop is current:
+                await session.close()
+            elif loop.is_running():
+                await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(session.close(), loop))
+
+
+# client dùng chung cho cả process
+http_client = HttpClient()
+
+__all__ = ["HttpClient", "FetchResponse", "FetchError", "http_client"]
@@ -0,0 +1,220 @@
+# Hàng đợi job bền vững trên SQLite: HTTP process ghi job, worker process nhận và chạy
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress TEXT,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    heartbeat_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at);
+"""
+
+# trạng thái job
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+FINISHED_STATUSES = {JOB_SUCCEEDED, JOB_FAILED}
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    payload: Dict[str, Any]
+    status: str
+    progress: Optional[Any]
+    result: Optional[Any]
+    error: Optional[str]
+    attempts: int
+    worker: Optional[str]
+    created_at: float
+    started_at: Optional[float]
+    heartbeat_at: Optional[float]
+    finished_at: Optional[float]
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+COLUMNS = "id, kind, payload, status, progress, result, error, attempts, worker, created_at, started_at, heartbeat_at, finished_at"
+
+
+def _row_to_job(row: tuple) -> Job:
+    (id_, kind, payload, status, progress, result, error, attempts, worker,
+     created_at, started_at, heartbeat_at, finished_at) = row
+    return Job(
+        id=id_,
+        kind=kind,
+        payload=json.loads(payload),
+        status=status,
+        progress=json.loads(progress) if progress is not None else None,
+        result=json.loads(result) if result is not None else None,
+        error=error,
+        attempts=attempts,
+        worker=worker,
+        created_at=created_at,
+        started_at=started_at,
+        heartbeat_at=heartbeat_at,
+        finished_at=finished_at
+    )
+
+
+class JobStore:
+    """
+    - enqueue: lưu job "queued", trả về id ngay
+    - claim: worker nhận job cũ nhất một cách nguyên tử (nhiều process cùng claim không trùng job)
+    - job "running" của worker đã chết (không heartbeat quá stale_seconds) được đưa lại hàng đợi,
+      quá max_attempts lần thì đánh dấu "failed"
+    - job queued / running còn nguyên sau khi restart server vì nằm trong SQLite
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        stale_seconds: Optional[float] = None,
+        max_attempts: Optional[int] = None
+    ):
+        self.path = path or os.getenv("JOB_DB_PATH", "./db/jobs.sqlite3")
+        self.stale_seconds = stale_seconds or float(os.getenv("JOB_STALE_SECONDS", "60"))
+        self.max_attempts = max_attempts or int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            # isolation_level=None: tự quản lý transaction (BEGIN IMMEDIATE khi claim)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def enqueue(self, kind: str, payload: Dict[str, Any]) -> Job:
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._connection().execute(
+                "INSERT INTO jobs (id, kind, payload, status, created_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(payload, ensure_ascii=False, default=str), JOB_QUEUED, time.time())
+            )
+        job = self.get(job_id)
+        assert job is not None
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self._connection().execute(f"SELECT {COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _row_to_job(row) if row is not None else None
+
+    def _recover_stale(self, conn: sqlite3.Connection, now: float) -> None:
+        """Job running không heartbeat quá stale_seconds (worker chết / server restart): chạy lại hoặc fail"""
+        stale_before = now - self.stale_seconds
+        conn.execute(
+            "UPDATE jobs SET status = ?, error = ?, finished_at = ? "
+            "WHERE status = ? AND heartbeat_at < ? AND attempts >= ?",
+            (JOB_FAILED, "Worker stopped while running the job", now, JOB_RUNNING, stale_before, self.max_attempts)
+        )
+        conn.execute(
+            "UPDATE jobs SET status = ?, worker = NULL WHERE status = ? AND heartbeat_at < ?",
+            (JOB_QUEUED, JOB_RUNNING, stale_before)
+        )
+
+    def claim(self, worker: str) -> Optional[Job]:
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            # BEGIN IMMEDIATE giữ write lock, process khác không claim cùng job được
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._recover_stale(conn, now)
+                row = conn.execute(
+                    "SELECT id FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1",
+                    (JOB_QUEUED,)
+                ).fetchone()
+                if row is not None:
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, worker = ?, attempts = attempts + 1, "
+                        "started_at = ?, heartbeat_at = ?, progress = NULL WHERE id = ?",
+                        (JOB_RUNNING, worker, now, now, row[0])
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return self.get(row[0]) if row is not None else None
+
+    def heartbeat(self, job_id: str, progress: Optional[Any] = None) -> None:
+        with self._lock:
+            if progress is None:
+                self._connection().execute(
+                    "UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND status = ?",
+                    (time.time(), job_id, JOB_RUNNING)
+                )
+            else:
+                self._connection().execute(
+                    "UPDATE jobs SET heartbeat_at = ?, progress = ? WHERE id = ? AND status = ?",
+                    (time.time(), json.dumps(progress, ensure_ascii=False, default=str), job_id, JOB_RUNNING)
+                )
+
+    def complete(self, job_id: str, result: Any) -> None:
+        with self._lock:
+            self._connection().execute(
+                "UPDATE jobs SET status = ?, result = ?, finished_at = ? WHERE id = ?",
+                (JOB_SUCCEEDED, json.dumps(result, ensure_ascii=False, default=str), time.time(), job_id)
+            )
+
+    def fail(self, job_id: str, error: str) -> None:
+        with self._lock:
+            self._connection().execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+                (JOB_FAILED, error, time.time(), job_id)
+            )
+
+    def purge(self, max_age_days: float) -> int:
+        """Xoá job đã xong lâu hơn max_age_days"""
+        with self._lock:
+            cursor = self._connection().execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+                (JOB_SUCCEEDED, JOB_FAILED, time.time() - max_age_days * 86400)
+            )
+        return cursor.rowcount
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            rows: List[tuple] = self._connection().execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+            ).fetchall()
+        counts = {JOB_QUEUED: 0, JOB_RUNNING: 0, JOB_SUCCEEDED: 0, JOB_FAILED: 0}
+        counts.update(dict(rows))
+        return counts
+
+
+# store dùng chung trong một process (HTTP server hoặc worker)
+job_store = JobStore()
+
+__all__ = [
+    "JobStore", "Job", "job_store",
+    "JOB_QUEUED", "JOB_RUNNING", "JOB_SUCCEEDED", "JOB_FAILED", "FINISHED_STATUSES"
+]
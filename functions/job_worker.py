@@ -0,0 +1,124 @@
+# Worker process chạy job từ JobStore: nhận job, gọi service tương ứng, lưu kết quả / lỗi
+# Chạy riêng (scale thêm worker): python -m functions.job_worker --workers 4
+from multiprocessing.process import BaseProcess
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import argparse
+import asyncio
+import importlib
+import multiprocessing
+import os
+import socket
+
+from functions.job_store import Job, JobStore, job_store
+
+# kind -> (hàm service, request model), import lúc chạy job đầu tiên để worker không load model không dùng tới
+JOB_HANDLERS: Dict[str, Tuple[str, str]] = {
+    "news-analysis": ("langchain_examples.services.news_analysis:analyze_news", "types_api.types_api:NewsRequest"),
+    "web-summary": ("langchain_examples.services.web_summary:web_summary", "types_api.types_api:SummarizeRequest"),
+    "run-task-smolagents": (
+        "smolagents_examples.services.run_task_smolagents:run_task_smolagents",
+        "types_api.types_api:RunTaskRequest"
+    )
+}
+
+# event của service được lưu làm progress của job (token thì bỏ qua, quá nhiều lần ghi)
+PROGRESS_EVENTS = {"progress", "step"}
+
+
+def _load(path: str) -> Any:
+    module, _, name = path.partition(":")
+    return getattr(importlib.import_module(module), name)
+
+
+def resolve_handler(kind: str) -> Tuple[Callable[..., Awaitable[Any]], Any]:
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    handler_path, request_path = JOB_HANDLERS[kind]
+    return _load(handler_path), _load(request_path)
+
+
+async def run_job(job: Job, store: JobStore, heartbeat_interval: float) -> None:
+    def on_event(event: str, data: Any) -> None:
+        # có thể được gọi từ thread (agent), JobStore tự khoá
+        if event in PROGRESS_EVENTS:
+            store.heartbeat(job.id, progress={"event": event, "data": data})
+
+    async def keep_alive() -> None:
+        # job chạy lâu vẫn báo còn sống, không bị worker khác coi là bỏ dở
+        while True:
+            await asyncio.sleep(heartbeat_interval)
+            store.heartbeat(job.id)
+
+    heartbeat = asyncio.ensure_future(keep_alive())
+    try:
+        handler, request_model = resolve_handler(job.kind)
+        result = await handler(request_model(**job.payload), on_event=on_event)
+        store.complete(job.id, result.model_dump() if hasattr(result, "model_dump") else result)
+    except Exception as e:
+        # lỗi của service là lỗi thật, không chạy lại; chỉ job của worker chết mới được chạy lại
+        store.fail(job.id, str(getattr(e, "detail", e)))
+    finally:
+        heartbeat.cancel()
+
+
+async def worker_loop(worker_id: str, store: JobStore, poll_interval: float) -> None:
+    heartbeat_interval = max(1.0, store.stale_seconds / 4)
+    print(f"Job worker {worker_id} started")
+    while True:
+        job: Optional[Job] = store.claim(worker_id)
+        if job is None:
+            await asyncio.sleep(poll_interval)
+            continue
+        print(f"Job worker {worker_id} running {job.kind} job {job.id} (attempt {job.attempts})")
+        await run_job(job, store, heartbeat_interval)
+
+
+def worker_main(worker_id: str) -> None:
+    """Entry point của một worker process"""
+    from dotenv import load_dotenv
+    load_dotenv()
+    poll_interval = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+    try:
+        asyncio.run(worker_loop(worker_id, job_store, poll_interval))
+    except KeyboardInterrupt:
+        pass
+
+
+def start_workers(count: int) -> List[BaseProcess]:
+    # spawn: process con không thừa hưởng event loop / thread / model của server
+    context = multiprocessing.get_context("spawn")
+    processes: List[BaseProcess] = []
+    for i in range(count):
+        process = context.Process(
+            target=worker_main,
+            args=(f"{socket.gethostname()}-{os.getpid()}-{i}",),
+            name=f"job-worker-{i}",
+            daemon=True
+        )
+        process.start()
+        processes.append(process)
+    return processes
+
+
+def stop_workers(processes: List[BaseProcess], timeout: float = 5.0) -> None:
+    # job đang chạy dở sẽ được worker khác chạy lại khi hết hạn heartbeat
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.join(timeout)
+
+
+__all__ = ["JOB_HANDLERS", "run_job", "start_workers", "stop_workers"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run background job workers")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("JOB_WORKERS", "2")))
+    args = parser.parse_args()
+
+    workers = start_workers(args.workers)
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        stop_workers(workers)
@@ -0,0 +1,236 @@
+# Lớp tìm kiếm tin tức dùng chung: nhiều provider (SerpAPI, DuckDuckGo, fake offline), cache theo cửa sổ thời gian, gộp request trùng
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import concurrent.futures
+import os
+import re
+import threading
+import unicodedata
+
+from functions.http_client import HttpClient, http_client
+from functions.result_cache import AsyncResultCache
+from types_api.types_api import NewsParams
+
+SERPAPI_URL = "https://serpapi.com/search.json"
+
+# time_period của API -> mã khoảng thời gian của SerpAPI (tbs=qdr:x) và DuckDuckGo (timelimit)
+TIME_PERIOD_CODES = {
+    "day": "d",
+    "week": "w",
+    "month": "m"
+}
+
+# kết quả trong ngày thay đổi nhanh nên cache ngắn, tin của cả tháng thì cache lâu hơn
+DEFAULT_TTLS = {
+    "day": 300.0,
+    "week": 1800.0,
+    "month": 3600.0
+}
+
+
+def normalize_query(query: str) -> str:
+    """"AI  News" và "ai news" là cùng một query"""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", query)).strip().lower()
+
+
+def news_result(title: str, link: str, date: Optional[str], snippet: Optional[str], source: Optional[str]) -> Dict:
+    """Mọi provider trả về cùng một format"""
+    return {"title": title, "link": link, "date": date, "snippet": snippet, "source": source}
+
+
+class SearchProvider:
+    name = "base"
+
+    async def search(self, query: str, time_period: str, max_results: int) -> List[Dict]:
+        raise NotImplementedError
+
+
+class SerpApiProvider(SearchProvider):
+    """Google News qua SerpAPI (cần SERPAPI_API_KEY)"""
+    name = "serpapi"
+
+    def __init__(self, client: Optional[HttpClient] = None):
+        self.client: HttpClient = client or http_client
+
+    async def search(self, query: str, time_period: str, max_results: int) -> List[Dict]:
+        serpapi_key: Optional[str] = os.getenv("SERPAPI_API_KEY")
+        if not serpapi_key:
+            raise ValueError("SERPAPI_API_KEY not found in environment variables")
+
+        search_params = NewsParams(
+            api_key=serpapi_key,
+            q=query,
+            tbm="nws",  # Specify khu vực tìm kiếm là chỉ có news
+            num=max_results,
+            tbs=f"qdr:{TIME_PERIOD_CODES.get(time_period, 'd')}",
+        )
+        params = search_params.model_dump(by_alias=True, exclude_none=True)
+        params["engine"] = "google"
+        results = await self.client.get_json(SERPAPI_URL, params=params)
+
+        return [
+            news_result(
+                title=item.get("title", ""),
+                link=item["link"],
+                date=item.get("date"),
+                snippet=item.get("snippet"),
+                source=item.get("source")
+            )
+            for item in results.get("news_results", [])
+            if item.get("link")
+        ]
+
+
+class DuckDuckGoProvider(SearchProvider):
+    """DuckDuckGo News, không cần API key"""
+    name = "duckduckgo"
+
+    async def search(self, query: str, time_period: str, max_results: int) -> List[Dict]:
+        # import khi dùng: chạy offline / chỉ dùng SerpAPI thì không cần duckduckgo_search
+        from duckduckgo_search import DDGS
+
+        def run() -> List[Dict]:
+            return list(DDGS().news(
+                query,
+                max_results=max_results,
+                timelimit=TIME_PERIOD_CODES.get(time_period, "d")
+            ) or [])
+
+        # DDGS blocking
+        items = await asyncio.to_thread(run)
+        return [
+            news_result(
+                title=item.get("title", ""),
+                link=item.get("url") or item.get("link"),
+                date=item.get("date"),
+                snippet=item.get("body") or item.get("excerpt"),
+                source=item.get("source")
+            )
+            for item in items
+            if item.get("url") or item.get("link")
+        ]
+
+
+class FakeNewsProvider(SearchProvider):
+    """Kết quả giả, cố định theo query, không gọi mạng: dùng để test / chạy offline"""
+    name = "fake"
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = 0
+
+    async def search(self, query: str, time_period: str, max_results: int) -> List[Dict]:
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        slug = re.sub(r"[^a-z0-9]+", "-", query.lower()).strip("-") or "news"
+        return [
+            news_result(
+                title=f"{query} - story {i + 1}",
+                link=f"https://news.example.com/{slug}/{i + 1}",
+                date=f"{i + 1} hours ago",
+                snippet=f"Offline result {i + 1} for '{query}' ({time_period})",
+                source="Example News"
+            )
+            for i in range(max_results)
+        ]
+
+
+class NewsSearch:
+    """
+    - cache kết quả theo (provider, query đã chuẩn hoá, time_period, max_results), TTL theo time_period
+    - nhiều request giống hệt cùng lúc chỉ gọi provider một lần (single-flight)
+    - mọi lần tìm chạy trên một event loop riêng (thread nền) nên cache và single-flight dùng chung
+      cho cả caller async (FastAPI) lẫn caller sync (tool của smolagents chạy trong thread)
+    """
+
+    def __init__(
+        self,
+        providers: Optional[Dict[str, SearchProvider]] = None,
+        default_provider: Optional[str] = None,
+        ttls: Optional[Dict[str, float]] = None,
+        max_entries: Optional[int] = None
+    ):
+        providers = providers or {
+            provider.name: provider for provider in (SerpApiProvider(), DuckDuckGoProvider(), FakeNewsProvider())
+        }
+        self.providers: Dict[str, SearchProvider] = providers
+        self.default_provider = default_provider or os.getenv("NEWS_SEARCH_PROVIDER", "serpapi")
+        self.ttls = ttls or {
+            period: float(os.getenv(f"NEWS_SEARCH_TTL_{period.upper()}", str(ttl)))
+            for period, ttl in DEFAULT_TTLS.items()
+        }
+        max_entries = max_entries or int(os.getenv("NEWS_SEARCH_MAX_ENTRIES", "512"))
+        # một cache cho mỗi cửa sổ thời gian (mỗi cache một TTL)
+        self._caches: Dict[str, AsyncResultCache[List[Dict]]] = {
+            period: AsyncResultCache(ttl_seconds=ttl, max_entries=max_entries)
+            for period, ttl in self.ttls.items()
+        }
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+
+    def _background_loop(self) -> asyncio.AbstractEventLoop:
+        with self._loop_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="news-search", daemon=True).start()
+                self._loop = loop
+        return self._loop
+
+    async def _search(self, provider: str, query: str, time_period: str, max_results: int) -> Tuple[List[Dict], str]:
+        if provider not in self.providers:
+            raise ValueError(f"Unknown search provider: {provider}")
+        period = time_period if time_period in self._caches else "day"
+        key = (provider, normalize_query(query), period, max_results)
+        return await self._caches[period].get_or_compute(
+            key,
+            lambda: self.providers[provider].search(query, period, max_results)
+        )
+
+    def _submit(self, provider: Optional[str], query: str, time_period: str, max_results: int) -> concurrent.futures.Future:
+        return asyncio.run_coroutine_threadsafe(
+            self._search(provider or self.default_provider, query, time_period, max_results),
+            self._background_loop()
+        )
+
+    async def search(
+        self,
+        query: str,
+        time_period: str = "day",
+        max_results: int = 5,
+        provider: Optional[str] = None
+    ) -> Tuple[List[Dict], str]:
+        """Trả về (kết quả, trạng thái cache: hit / coalesced / miss)"""
+        results, status = await asyncio.wrap_future(self._submit(provider, query, time_period, max_results))
+        # bản sao: caller sửa kết quả không làm hỏng cache
+        return [dict(result) for result in results], status
+
+    def search_sync(
+        self,
+        query: str,
+        time_period: str = "day",
+        max_results: int = 5,
+        provider: Optional[str] = None
+    ) -> Tuple[List[Dict], str]:
+        """Như search, cho code đồng bộ (không gọi từ trong event loop)"""
+        results, status = self._submit(provider, query, time_period, max_results).result()
+        return [dict(result) for result in results], status
+
+    def stats(self) -> Dict:
+        return {
+            "default_provider": self.default_provider,
+            "caches": {
+                period: {"ttl_seconds": self.ttls[period], **cache.stats()}
+                for period, cache in self._caches.items()
+            }
+        }
+
+
+# lớp tìm kiếm dùng chung cho cả process
+news_search = NewsSearch()
+
+__all__ = [
+    "NewsSearch", "SearchProvider", "SerpApiProvider", "DuckDuckGoProvider", "FakeNewsProvider",
+    "normalize_query", "news_search"
+]
@@ -0,0 +1,106 @@
+# Pipeline async nhiều stage nối bằng queue có giới hạn: các item chạy chồng lấp giữa các stage
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+import asyncio
+import time
+
+from functions.sse import EventCallback
+
+
+@dataclass
+class Stage:
+    name: str
+    fn: Callable[[Any], Awaitable[Any]]
+    # số item stage này xử lý cùng lúc
+    concurrency: int = 1
+    # quá thời gian thì item bị đánh dấu lỗi, các item khác vẫn chạy tiếp
+    timeout: Optional[float] = None
+
+
+@dataclass
+class PipelineItem:
+    index: int
+    value: Any
+    error: Optional[str] = None
+    failed_stage: Optional[str] = None
+    # thời gian từng stage của item: {"fetch": 0.42, ...}
+    timings: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+# đánh dấu hết item trong queue
+_DONE = object()
+
+
+async def run_pipeline(
+    items: Sequence[Any],
+    stages: List[Stage],
+    queue_size: int = 2,
+    on_event: Optional[EventCallback] = None
+) -> List[PipelineItem]:
+    """
+    Chạy mỗi item qua lần lượt các stage. Giữa 2 stage là asyncio.Queue(maxsize=queue_size):
+    stage sau chậm thì stage trước dừng lại chờ (backpressure) thay vì dồn hết vào RAM.
+    Item lỗi ở một stage được chuyển thẳng ra kết quả, không chặn các item khác.
+    Kết quả giữ thứ tự của items.
+    """
+    queues: List[asyncio.Queue] = [asyncio.Queue(maxsize=queue_size) for _ in stages]
+    results: List[PipelineItem] = []
+
+    async def worker(position: int, stage: Stage, remaining: List[int]) -> None:
+        inbox = queues[position]
+        while True:
+            item = await inbox.get()
+            if item is _DONE:
+                break
+            if item.ok:
+                start = time.perf_counter()
+                try:
+                    item.value = await asyncio.wait_for(stage.fn(item.value), stage.timeout)
+                except asyncio.TimeoutError:
+                    item.error, item.failed_stage = f"Timed out after {stage.timeout}s", stage.name
+                except Exception as e:
+                    item.error, item.failed_stage = str(e), stage.name
+                item.timings[stage.name] = round(time.perf_counter() - start, 3)
+                if on_event is not None:
+                    on_event("progress", {
+                        "stage": stage.name,
+                        "item": item.index,
+                        "status": "ok" if item.ok else "failed",
+                        "seconds": item.timings[stage.name]
+                    })
+            if position + 1 < len(stages):
+                await queues[position + 1].put(item)
+            else:
+                results.append(item)
+
+        # worker cuối cùng của stage báo cho stage sau là hết item
+        remaining[0] -= 1
+        if remaining[0] == 0 and position + 1 < len(stages):
+            for _ in range(stages[position + 1].concurrency):
+                await queues[position + 1].put(_DONE)
+
+    workers: List[asyncio.Task] = []
+    for position, stage in enumerate(stages):
+        remaining = [stage.concurrency]
+        workers.extend(
+            asyncio.ensure_future(worker(position, stage, remaining)) for _ in range(stage.concurrency)
+        )
+
+    try:
+        for index, value in enumerate(items):
+            await queues[0].put(PipelineItem(index=index, value=value))
+        for _ in range(stages[0].concurrency):
+            await queues[0].put(_DONE)
+        await asyncio.gather(*workers)
+    finally:
+        for task in workers:
+            task.cancel()
+
+    return sorted(results, key=lambda item: item.index)
+
+
+__all__ = ["Stage", "PipelineItem", "run_pipeline"]
@@ -0,0 +1,32 @@
+# Gộp nhiều danh sách kết quả đã xếp hạng (dense, BM25, ...) bằng reciprocal rank fusion
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+# hằng số k của RRF (Cormack et al. 2009): làm mượt chênh lệch giữa các hạng đầu
+DEFAULT_RRF_K = 60
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[Hashable]],
+    weights: Optional[Sequence[float]] = None,
+    k: int = DEFAULT_RRF_K
+) -> List[Tuple[Hashable, float]]:
+    """
+    rankings: mỗi phần tử là danh sách key đã xếp hạng (tốt nhất trước).
+    Điểm của key = sum(weight_i / (k + hạng trong danh sách i)), hạng tính từ 1; chỉ dùng hạng nên
+    không cần chuẩn hoá điểm giữa cosine distance và BM25. Trả về (key, điểm) giảm dần
+    """
+    weights = weights if weights is not None else [1.0] * len(rankings)
+    if len(weights) != len(rankings):
+        raise ValueError("weights must have one value per ranking")
+
+    scores: Dict[Hashable, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        if not weight:
+            continue
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + weight / (k + rank)
+    # sort ổn định: điểm bằng nhau thì giữ thứ tự lần đầu xuất hiện
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+__all__ = ["reciprocal_rank_fusion", "DEFAULT_RRF_K"]
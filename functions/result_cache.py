@@ -0,0 +1,78 @@
+# Cache kết quả trong RAM có TTL, giới hạn số entry (LRU) và gộp các request trùng đang chạy (single-flight)
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Generic, Optional, Tuple, TypeVar
+import asyncio
+import time
+
+T = TypeVar("T")
+
+# trạng thái trả về cùng kết quả
+CACHE_HIT = "hit"              # có sẵn trong cache
+CACHE_COALESCED = "coalesced"  # request giống hệt đang chạy, dùng chung kết quả
+CACHE_MISS = "miss"            # tự chạy
+
+
+class AsyncResultCache(Generic[T]):
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Any, Tuple[float, T]]" = OrderedDict()
+        self._in_flight: Dict[Any, asyncio.Task] = {}
+        self.hits = 0
+        self.coalesced = 0
+        self.misses = 0
+
+    def get(self, key: Any) -> Optional[T]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: Any, value: T) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_or_compute(self, key: Any, compute: Callable[[], Awaitable[T]]) -> Tuple[T, str]:
+        """Trả về (kết quả, trạng thái cache). Lỗi không được cache, mọi request đang chờ đều nhận lỗi"""
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value, CACHE_HIT
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            # shield: request này bị huỷ (client ngắt) không huỷ công việc chung
+            return await asyncio.shield(task), CACHE_COALESCED
+
+        self.misses += 1
+        task = asyncio.ensure_future(self._run(key, compute))
+        self._in_flight[key] = task
+        return await asyncio.shield(task), CACHE_MISS
+
+    async def _run(self, key: Any, compute: Callable[[], Awaitable[T]]) -> T:
+        try:
+            value = await compute()
+            self.put(key, value)
+            return value
+        finally:
+            self._in_flight.pop(key, None)
+
+    def stats(self) -> Dict:
+        return {
+            "entries": len(self._entries),
+            "in_flight": len(self._in_flight),
+            "hits": self.hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses
+        }
+
+
+__all__ = ["AsyncResultCache", "CACHE_HIT", "CACHE_COALESCED", "CACHE_MISS"]
@@ -0,0 +1,125 @@
+# Tính cosine similarity theo batch bằng numpy thay vì từng cặp vector
+from dataclasses import dataclass, field
+from typing import Optional, Sequence, Union
+
+import numpy as np
+
+VectorLike = Union[np.ndarray, Sequence[float]]
+
+# số dòng đổi sang float32 mỗi lần khi tính trên vector lượng tử hoá (giới hạn bộ nhớ tạm)
+QUANTIZED_BLOCK_ROWS = 4096
+QUANTIZED_DTYPES = ("float32", "float16", "int8")
+
+
+@dataclass
+class QuantizedVectors:
+    """
+    Ma trận vector liền khối, lưu float32 / float16 / int8.
+    int8: mỗi dòng một scale (max |x| / 127), vector gốc ~ codes * scale
+    """
+    codes: np.ndarray
+    scales: Optional[np.ndarray] = None
+    # 1 / |codes| của từng dòng, tính ở lần tính similarity đầu tiên rồi dùng lại cho mọi query
+    _inverse_norms: Optional[np.ndarray] = field(default=None, repr=False, compare=False)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @property
+    def dtype(self) -> str:
+        return self.codes.dtype.name
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    @classmethod
+    def from_float(cls, matrix: "MatrixLike", dtype: str = "int8") -> "QuantizedVectors":
+        matrix = np.asarray(matrix, dtype=np.float32)
+        if matrix.ndim == 1:
+            matrix = matrix[None, :]
+        if dtype == "int8":
+            scales = np.abs(matrix).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            codes = np.rint(matrix / scales[:, None]).astype(np.int8)
+            return cls(codes=codes, scales=scales.astype(np.float32))
+        if dtype in QUANTIZED_DTYPES:
+            return cls(codes=matrix.astype(dtype))
+        raise ValueError(f"Unsupported quantization dtype: {dtype}")
+
+    def _blocks(self):
+        for start in range(0, len(self.codes), QUANTIZED_BLOCK_ROWS):
+            # float32 thì không copy
+            yield start, self.codes[start:start + QUANTIZED_BLOCK_ROWS].astype(np.float32, copy=False)
+
+    def inverse_norms(self) -> np.ndarray:
+        if self._inverse_norms is None:
+            norms = np.empty(len(self.codes), dtype=np.float32)
+            for start, block in self._blocks():
+                norms[start:start + len(block)] = np.linalg.norm(block, axis=1)
+            norms[norms == 0] = 1.0
+            self._inverse_norms = 1.0 / norms
+        return self._inverse_norms
+
+    def to_float(self) -> np.ndarray:
+        matrix = self.codes.astype(np.float32)
+        if self.scales is not None:
+            matrix *= self.scales[:, None]
+        return matrix
+
+
+MatrixLike = Union[np.ndarray, Sequence[Sequence[float]], QuantizedVectors]
+
+
+def normalize_rows(matrix: Union[np.ndarray, Sequence[Sequence[float]], Sequence[float]]) -> np.ndarray:
+    """Chuẩn hoá từng dòng về độ dài 1 (dòng toàn 0 giữ nguyên)"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix[None, :]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def cosine_similarities(query: VectorLike, matrix: MatrixLike) -> np.ndarray:
+    """Cosine similarity giữa query và mọi dòng của matrix, một phép nhân ma trận-vector"""
+    if len(matrix) == 0:
+        return np.zeros(0, dtype=np.float32)
+    if isinstance(matrix, QuantizedVectors):
+        return quantized_cosine_similarities(query, matrix)
+    return normalize_rows(matrix) @ normalize_rows(query)[0]
+
+
+def quantized_cosine_similarities(query: VectorLike, vectors: QuantizedVectors) -> np.ndarray:
+    """
+    Cosine similarity tính thẳng trên codes, từng khối dòng: không dựng lại cả ma trận float32.
+    Scale của mỗi dòng triệt tiêu trong cosine (dot(codes, q) / |codes|) nên không cần nhân
+    """
+    query = normalize_rows(query)[0]
+    scores = np.empty(len(vectors), dtype=np.float32)
+    for start, block in vectors._blocks():
+        scores[start:start + len(block)] = block @ query
+    return scores * vectors.inverse_norms()
+
+
+def select_indices(
+    scores: np.ndarray,
+    threshold: Optional[float] = None,
+    top_k: Optional[int] = None
+) -> np.ndarray:
+    """
+    Chọn vị trí các score vượt threshold, giữ tối đa top_k score cao nhất.
+    Kết quả trả về theo thứ tự ban đầu (thứ tự chunk trong bài viết).
+    """
+    candidates = np.arange(len(scores))
+    if threshold is not None:
+        candidates = candidates[scores > threshold]
+
+    if top_k is not None and len(candidates) > top_k:
+        if top_k <= 0:
+            return candidates[:0]
+        # argpartition O(n) thay vì sort toàn bộ
+        best = np.argpartition(-scores[candidates], top_k - 1)[:top_k]
+        candidates = candidates[best]
+
+    return np.sort(candidates)
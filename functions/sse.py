@@ -0,0 +1,60 @@
+# Helper cho Server-Sent Events (text/event-stream)
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict
+import asyncio
+import json
+
+SSE_MEDIA_TYPE = "text/event-stream"
+
+# tắt buffer của proxy (nginx) để event tới client ngay
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no"
+}
+
+# callback các pipeline gọi để báo tiến độ / token: emit("progress", {...}), emit("token", {...})
+EventCallback = Callable[[str, Any], None]
+
+
+def sse_event(event: str, data: Any) -> str:
+    """Đóng gói một event SSE, data được serialize thành JSON"""
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+async def stream_events(run: Callable[[EventCallback], Awaitable[Any]]) -> AsyncIterator[str]:
+    """
+    Chạy run(emit) trong background, chuyển mọi event nó emit thành SSE ngay khi có.
+    Kết quả của run được gửi trong event "done" (model pydantic được dump ra dict), lỗi trong event "error".
+    emit gọi được từ cả event loop lẫn thread khác (vd: agent chạy trong thread pool).
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+
+    def emit(event: str, data: Any) -> None:
+        loop.call_soon_threadsafe(queue.put_nowait, (event, data))
+
+    async def runner() -> None:
+        try:
+            result = await run(emit)
+            emit("done", result.model_dump() if hasattr(result, "model_dump") else result)
+        except Exception as e:
+            # HTTPException giữ lỗi trong detail, PoolSaturated có thêm retry_after
+            error: Dict[str, Any] = {"detail": getattr(e, "detail", str(e))}
+            if hasattr(e, "retry_after"):
+                error["retry_after"] = e.retry_after
+            emit("error", error)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, None)
+
+    task = asyncio.ensure_future(runner())
+    # event đầu tiên gửi ngay để client nhận byte đầu tiên không phải chờ LLM
+    yield sse_event("progress", {"stage": "started"})
+    try:
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            yield sse_event(*item)
+    finally:
+        # client ngắt kết nối thì dừng pipeline
+        task.cancel()
@@ -0,0 +1,71 @@
+# Chia văn bản dài thành các đoạn (paragraph) và câu để dịch từng phần
+from dataclasses import dataclass
+from typing import List
+import re
+
+# Kết thúc câu: . ! ? … và dấu câu CJK, theo sau là khoảng trắng (hoặc ngay sau dấu câu CJK)
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?…])\s+|(?<=[。！？])")
+PARAGRAPH_BOUNDARY = re.compile(r"\n\s*\n")
+
+# ~100 token Marian, còn xa giới hạn 512 token của model
+DEFAULT_MAX_SEGMENT_CHARS = 400
+
+
+@dataclass
+class TextSegment:
+    paragraph: int  # vị trí paragraph trong văn bản
+    index: int      # vị trí câu trong paragraph
+    text: str
+
+
+def split_paragraphs(text: str) -> List[str]:
+    return [p.strip() for p in PARAGRAPH_BOUNDARY.split(text) if p.strip()]
+
+
+def _split_long(sentence: str, max_chars: int) -> List[str]:
+    """Câu quá dài thì cắt tiếp ở dấu phẩy / chấm phẩy, cuối cùng là khoảng trắng"""
+    if len(sentence) <= max_chars:
+        return [sentence]
+
+    pieces: List[str] = []
+    current = ""
+    for part in re.split(r"(?<=[,;:，；])\s*|\s+", sentence):
+        if not part:
+            continue
+        candidate = f"{current} {part}".strip() if current else part
+        if len(candidate) > max_chars and current:
+            pieces.append(current)
+            current = part
+        else:
+            current = candidate
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_sentences(paragraph: str, max_chars: int = DEFAULT_MAX_SEGMENT_CHARS) -> List[str]:
+    sentences: List[str] = []
+    for sentence in SENTENCE_BOUNDARY.split(paragraph):
+        sentence = " ".join(sentence.split())
+        if sentence:
+            sentences.extend(_split_long(sentence, max_chars))
+    return sentences
+
+
+def segment_document(text: str, max_chars: int = DEFAULT_MAX_SEGMENT_CHARS) -> List[TextSegment]:
+    """Trả về danh sách câu theo thứ tự văn bản, kèm vị trí paragraph để ghép lại"""
+    segments: List[TextSegment] = []
+    for p_idx, paragraph in enumerate(split_paragraphs(text)):
+        for s_idx, sentence in enumerate(split_sentences(paragraph, max_chars)):
+            segments.append(TextSegment(paragraph=p_idx, index=s_idx, text=sentence))
+    return segments
+
+
+def join_segments(segments: List[TextSegment], translations: List[str], separator: str = " ") -> str:
+    """Ghép bản dịch lại, giữ nguyên cấu trúc paragraph của văn bản gốc"""
+    paragraphs: List[List[str]] = []
+    for segment, translation in zip(segments, translations):
+        while len(paragraphs) <= segment.paragraph:
+            paragraphs.append([])
+        paragraphs[segment.paragraph].append(translation)
+    return "\n\n".join(separator.join(p) for p in paragraphs)
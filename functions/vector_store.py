@@ -0,0 +1,635 @@
+# Vector store dùng chung cho các chỗ cần tìm theo embedding: chọn backend Chroma hoặc FAISS (flat / IVF / HNSW)
+from langchain_core.documents.base import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+
+import numpy as np
+
+# filter theo metadata (cùng cú pháp Chroma, phần dùng trong repo): {"key": value}, {"key": {"$eq": v}}, {"key": {"$in": [...]}}
+Filter = Dict[str, Any]
+
+FILTER_KEY = re.compile(r"^\w+$")
+
+ROWS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rows (
+    row INTEGER PRIMARY KEY,
+    id TEXT NOT NULL,
+    text TEXT NOT NULL,
+    metadata TEXT NOT NULL,
+    deleted INTEGER NOT NULL DEFAULT 0,
+    vec INTEGER
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_rows_live_id ON rows (id) WHERE deleted = 0;
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class VectorStoreBackend(VectorStore):
+    """
+    Các thao tác ArticleIndex / DocumentIndex cần, giống nhau giữa các backend.
+    Là VectorStore của langchain nên as_retriever() dùng được cho chain (rag.py)
+    """
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[Dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any
+    ) -> List[str]:
+        raise NotImplementedError
+
+    def get(self, ids: Optional[Sequence[str]] = None, include: Sequence[str] = ("documents", "metadatas")) -> Dict[str, List]:
+        """{"ids", "documents", "metadatas"} của các entry (ids=None: tất cả)"""
+        raise NotImplementedError
+
+    def update_metadatas(self, ids: Sequence[str], metadatas: Sequence[Dict]) -> None:
+        raise NotImplementedError
+
+    def delete(self, ids: Optional[Sequence[str]] = None, where: Optional[Filter] = None, **kwargs: Any) -> None:
+        raise NotImplementedError
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, filter: Optional[Filter] = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        """Điểm là distance: càng nhỏ càng giống"""
+        raise NotImplementedError
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[Filter] = None, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, filter=filter)]
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[Dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any
+    ) -> "VectorStoreBackend":
+        store = cls(embeddings=embedding, **kwargs)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
+
+
+class ChromaVectorStore(VectorStoreBackend):
+    """Collection Chroma lưu trên đĩa (backend mặc định)"""
+
+    def __init__(self, embeddings: Optional[Embeddings], persist_dir: str, collection_name: str):
+        # import khi dùng: chỉ dùng FAISS thì không cần chromadb
+        from langchain_chroma import Chroma
+
+        self.persist_dir = persist_dir
+        self._embeddings = embeddings
+        self.vectordb = Chroma(
+            persist_directory=persist_dir,
+            embedding_function=embeddings,
+            collection_name=collection_name
+        )
+
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        return self._embeddings
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs) -> List[str]:
+        return self.vectordb.add_texts(texts=list(texts), metadatas=metadatas, ids=ids)
+
+    def get(self, ids=None, include=("documents", "metadatas")) -> Dict[str, List]:
+        return self.vectordb.get(ids=list(ids) if ids is not None else None, include=list(include))
+
+    def update_metadatas(self, ids, metadatas) -> None:
+        self.vectordb._collection.update(ids=list(ids), metadatas=list(metadatas))
+
+    def delete(self, ids=None, where=None, **kwargs) -> None:
+        if ids is None and where is None:
+            return
+        self.vectordb._collection.delete(ids=list(ids) if ids is not None else None, where=where)
+
+    def similarity_search_with_score(self, query, k=4, filter=None, **kwargs) -> List[Tuple[Document, float]]:
+        return self.vectordb.similarity_search_with_score(query=query, k=k, filter=filter)
+
+    def count(self) -> int:
+        return self.vectordb._collection.count()
+
+
+class FaissVectorStore(VectorStoreBackend):
+    """
+    FAISS lưu trên đĩa, đọc index bằng mmap nên khởi động không nạp cả index vào RAM:
+    - vectors.f32 (vectors.<generation>.f32 sau lần compact đầu): vector đã chuẩn hoá (cosine = inner product),
+      chỉ ghi nối thêm; compact ghi file mới chỉ gồm các vector còn dùng
+    - main.faiss (main.<generation>.faiss): index flat / ivf / hnsw của các row tới lần compact gần nhất, mở mmap chỉ đọc
+    - delta: row thêm sau lần compact, index flat trong RAM; vượt delta_max_rows thì compact
+    - store.sqlite3: row -> id, text, metadata, vị trí vector trong file (vec), cùng trạng thái của store
+      (dim, generation, ...); xoá / thay thế chỉ đánh dấu deleted, compact mới bỏ hẳn
+    - nhiều process (server + job worker) ghi chung được: cấp row, ghi nối vector (vị trí = kích thước file) và
+      insert nằm trong một transaction BEGIN IMMEDIATE; mỗi lần đọc / ghi nạp vào delta các row process khác mới
+      thêm, generation đổi (process khác vừa compact) thì mở lại index và file vector của generation mới
+    flat và IVF được mmap cả dữ liệu vector; HNSW vẫn phải nạp graph (vài chục MB / 100k vector)
+    """
+
+    INDEX_TYPES = ("flat", "ivf", "hnsw")
+
+    def __init__(
+        self,
+        embeddings: Optional[Embeddings],
+        directory: str,
+        index_type: Optional[str] = None,
+        delta_max_rows: Optional[int] = None,
+        ivf_nlist: Optional[int] = None,
+        ivf_nprobe: Optional[int] = None,
+        hnsw_m: Optional[int] = None,
+        hnsw_ef_construction: Optional[int] = None,
+        hnsw_ef_search: Optional[int] = None,
+        filter_exact_max: Optional[int] = None
+    ):
+        # import khi dùng: backend Chroma không cần faiss
+        import faiss
+
+        self._faiss = faiss
+        self._embeddings = embeddings
+        self.directory = directory
+        self.index_type = index_type or os.getenv("FAISS_INDEX_TYPE", "flat")
+        if self.index_type not in self.INDEX_TYPES:
+            raise ValueError(f"Unknown FAISS index type: {self.index_type}")
+        self.delta_max_rows = delta_max_rows or int(os.getenv("FAISS_DELTA_MAX_ROWS", "20000"))
+        # 0 = tự chọn theo số vector (4 * sqrt(n))
+        self.ivf_nlist = ivf_nlist or int(os.getenv("FAISS_IVF_NLIST", "0"))
+        self.ivf_nprobe = ivf_nprobe or int(os.getenv("FAISS_IVF_NPROBE", "16"))
+        self.hnsw_m = hnsw_m or int(os.getenv("FAISS_HNSW_M", "32"))
+        self.hnsw_ef_construction = hnsw_ef_construction or int(os.getenv("FAISS_HNSW_EF_CONSTRUCTION", "80"))
+        self.hnsw_ef_search = hnsw_ef_search or int(os.getenv("FAISS_HNSW_EF_SEARCH", "128"))
+        # filter khớp ít hơn ngần này entry thì tính chính xác trên đúng các vector đó thay vì ANN rồi lọc
+        self.filter_exact_max = filter_exact_max or int(os.getenv("FAISS_FILTER_EXACT_MAX", "10000"))
+
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.RLock()
+        self._compact_lock = threading.Lock()
+        # isolation_level=None: tự quản lý transaction (BEGIN khi đọc, BEGIN IMMEDIATE khi ghi)
+        self._conn = sqlite3.connect(
+            os.path.join(directory, "store.sqlite3"),
+            check_same_thread=False,
+            isolation_level=None,
+            timeout=60
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(ROWS_SCHEMA)
+
+        # trạng thái trong RAM của process này: generation đang mở, row lớn nhất đã nạp vào main / delta
+        self.meta: Dict[str, Any] = {}
+        self._generation: Optional[int] = None
+        self._synced_row = -1
+        self._vectors_mmap: Optional[np.memmap] = None
+        self._main = None
+        self._delta = None
+        with self._lock:
+            self._migrate()
+
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        return self._embeddings
+
+    # ---- lưu trữ ----
+
+    @contextmanager
+    def _transaction(self, immediate: bool = False) -> Iterator[None]:
+        """
+        Gọi khi đang giữ _lock. Đọc: snapshot nhất quán giữa các bảng SQLite và file vector / index của
+        generation tương ứng; ghi: BEGIN IMMEDIATE giữ lock ghi, process khác chờ tới khi commit
+        """
+        self._conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def _migrate(self) -> None:
+        """Store tạo bởi phiên bản cũ: thêm cột vec (= row) và chuyển meta.json vào SQLite"""
+        with self._transaction(immediate=True):
+            columns = {column[1] for column in self._conn.execute("PRAGMA table_info(rows)")}
+            if "vec" not in columns:
+                self._conn.execute("ALTER TABLE rows ADD COLUMN vec INTEGER")
+                self._conn.execute("UPDATE rows SET vec = row")
+            if self._conn.execute("SELECT 1 FROM state WHERE key = 'meta'").fetchone() is not None:
+                return
+
+            meta: Dict[str, Any] = {
+                "dim": None,
+                "generation": 0,
+                "main_max_row": -1,
+                "main_index_type": None,
+                "next_row": 0
+            }
+            legacy_path = os.path.join(self.directory, "meta.json")
+            if os.path.exists(legacy_path):
+                with open(legacy_path) as f:
+                    legacy = json.load(f)
+                meta.update(
+                    dim=legacy.get("dim"),
+                    main_max_row=legacy.get("main_rows", 0) - 1,
+                    main_index_type=legacy.get("main_index_type")
+                )
+            max_row = self._conn.execute("SELECT MAX(row) FROM rows").fetchone()[0]
+            meta["next_row"] = max_row + 1 if max_row is not None else 0
+            if meta["dim"] and os.path.exists(self._vectors_path(0)):
+                # phiên bản cũ: row = vị trí vector trong file
+                meta["next_row"] = max(meta["next_row"], os.path.getsize(self._vectors_path(0)) // (meta["dim"] * 4))
+            self._save_meta(meta)
+
+    def _load_meta(self) -> Dict[str, Any]:
+        return json.loads(self._conn.execute("SELECT value FROM state WHERE key = 'meta'").fetchone()[0])
+
+    def _save_meta(self, meta: Dict[str, Any]) -> None:
+        self._conn.execute("INSERT OR REPLACE INTO state (key, value) VALUES ('meta', ?)", (json.dumps(meta),))
+
+    def _vectors_path(self, generation: int) -> str:
+        return os.path.join(self.directory, "vectors.f32" if generation == 0 else f"vectors.{generation}.f32")
+
+    def _main_path(self, generation: int) -> str:
+        return os.path.join(self.directory, "main.faiss" if generation == 0 else f"main.{generation}.faiss")
+
+    def _open(self, meta: Dict[str, Any]) -> None:
+        """Mở index chính và file vector của generation trong meta, delta trống (row sau main_max_row nạp ở _sync)"""
+        self._generation = meta["generation"]
+        self._vectors_mmap = None
+        self._main = None
+        main_path = self._main_path(self._generation)
+        if meta["main_index_type"] and os.path.exists(main_path):
+            flags = getattr(self._faiss, "IO_FLAG_MMAP_IFC", self._faiss.IO_FLAG_MMAP) | self._faiss.IO_FLAG_READ_ONLY
+            self._main = self._faiss.read_index(main_path, flags)
+            self._set_search_params(self._main)
+        self._delta = self._new_flat_index(meta["dim"])
+        self._synced_row = meta["main_max_row"]
+
+    def _sync(self) -> Dict[str, Any]:
+        """
+        Gọi trong _transaction: đưa index trong RAM về đúng trạng thái trên đĩa; row mới (của process này hoặc
+        process khác) được nạp vào delta, generation đổi thì mở lại từ đầu
+        """
+        meta = self._load_meta()
+        self.meta = meta
+        if not meta["dim"]:
+            return meta
+        if meta["generation"] != self._generation or self._delta is None:
+            self._open(meta)
+
+        new = self._conn.execute(
+            "SELECT row, vec, deleted FROM rows WHERE row > ? ORDER BY row", (self._synced_row,)
+        ).fetchall()
+        if new:
+            self._synced_row = new[-1][0]
+            live = [(row, vec) for row, vec, deleted in new if not deleted]
+            if live:
+                rows = np.fromiter((row for row, _ in live), dtype=np.int64, count=len(live))
+                vecs = np.fromiter((vec for _, vec in live), dtype=np.int64, count=len(live))
+                self._delta.add_with_ids(np.ascontiguousarray(self._read_vectors(vecs)), rows)
+        return meta
+
+    def _read_vectors(self, vecs: np.ndarray) -> np.ndarray:
+        """Vector ở các vị trí vecs trong file của generation đang mở (đọc qua mmap)"""
+        dim = self.meta["dim"]
+        if not len(vecs):
+            return np.empty((0, dim), dtype=np.float32)
+        needed = int(vecs.max()) + 1
+        if self._vectors_mmap is None or self._vectors_mmap.shape[0] < needed:
+            path = self._vectors_path(self._generation)
+            self._vectors_mmap = np.memmap(
+                path, dtype=np.float32, mode="r", shape=(os.path.getsize(path) // (dim * 4), dim)
+            )
+        return self._vectors_mmap[vecs]
+
+    # ---- index ----
+
+    def _new_flat_index(self, dim: int):
+        return self._faiss.IndexIDMap2(self._faiss.IndexFlatIP(dim))
+
+    def _new_index(self, dim: int, num_vectors: int) -> Tuple[Any, str]:
+        faiss = self._faiss
+        if self.index_type == "ivf":
+            nlist = self.ivf_nlist or int(4 * math.sqrt(num_vectors))
+            # mỗi cluster cần đủ điểm để train (faiss khuyến nghị >= 39); ít vector quá thì flat là đủ nhanh
+            nlist = min(nlist, num_vectors // 39)
+            if nlist >= 8:
+                return faiss.IndexIVFFlat(faiss.IndexFlatIP(dim), dim, nlist, faiss.METRIC_INNER_PRODUCT), "ivf"
+        if self.index_type == "hnsw":
+            hnsw = faiss.IndexHNSWFlat(dim, self.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            hnsw.hnsw.efConstruction = self.hnsw_ef_construction
+            return faiss.IndexIDMap2(hnsw), "hnsw"
+        return self._new_flat_index(dim), "flat"
+
+    def _set_search_params(self, index) -> None:
+        faiss = self._faiss
+        inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap2) else index
+        if isinstance(inner, faiss.IndexIVF):
+            inner.nprobe = self.ivf_nprobe
+        elif isinstance(inner, faiss.IndexHNSW):
+            inner.hnsw.efSearch = self.hnsw_ef_search
+
+    def compact(self) -> None:
+        """
+        Build lại main index từ mọi vector còn dùng và ghi file vector mới chỉ gồm các vector đó (generation mới),
+        entry đã xoá bị bỏ hẳn. Build chạy ngoài lock ghi: chỉ chụp danh sách row lúc đầu và cài đặt lúc cuối
+        trong BEGIN IMMEDIATE; row thêm trong lúc build được chép sang file mới và nằm trong delta
+        """
+        with self._compact_lock:
+            with self._lock, self._transaction():
+                meta = self._sync()
+                if not meta["dim"]:
+                    return
+                live = self._conn.execute("SELECT row, vec FROM rows WHERE deleted = 0 ORDER BY row").fetchall()
+                rows = np.fromiter((row for row, _ in live), dtype=np.int64, count=len(live))
+                vectors = np.ascontiguousarray(
+                    self._read_vectors(np.fromiter((vec for _, vec in live), dtype=np.int64, count=len(live)))
+                )
+            dim, generation, max_row = meta["dim"], meta["generation"], meta["next_row"] - 1
+            new_generation = generation + 1
+
+            index, actual_type = self._new_index(dim, len(rows))
+            if len(rows):
+                if not index.is_trained:
+                    sample = vectors[np.random.default_rng(0).permutation(len(vectors))[:256 * index.nlist]]
+                    index.train(sample)
+                index.add_with_ids(vectors, rows)
+            vectors_tmp = self._vectors_path(new_generation) + ".tmp"
+            main_tmp = self._main_path(new_generation) + ".tmp"
+            vectors.tofile(vectors_tmp)
+            self._faiss.write_index(index, main_tmp)
+            del index, vectors
+
+            with self._lock, self._transaction(immediate=True):
+                current = self._load_meta()
+                if current["generation"] != generation:
+                    # process khác đã compact trong lúc build
+                    os.remove(vectors_tmp)
+                    os.remove(main_tmp)
+                    return
+                self._sync()
+                later = self._conn.execute(
+                    "SELECT row, vec FROM rows WHERE row > ? AND deleted = 0 ORDER BY row", (max_row,)
+                ).fetchall()
+                if later:
+                    later_vecs = np.fromiter((vec for _, vec in later), dtype=np.int64, count=len(later))
+                    with open(vectors_tmp, "ab") as f:
+                        f.write(np.ascontiguousarray(self._read_vectors(later_vecs)).tobytes())
+                self._conn.execute("DELETE FROM rows WHERE deleted = 1")
+                # vị trí mới trong file = thứ tự row; row bị xoá trong lúc build đã bị DELETE ở trên
+                self._conn.executemany(
+                    "UPDATE rows SET vec = ? WHERE row = ?",
+                    [(vec, int(row)) for vec, row in enumerate([*rows.tolist(), *(row for row, _ in later)])]
+                )
+                os.replace(vectors_tmp, self._vectors_path(new_generation))
+                os.replace(main_tmp, self._main_path(new_generation))
+                current.update({"generation": new_generation, "main_max_row": max_row, "main_index_type": actual_type})
+                self._save_meta(current)
+
+            # giữ file của generation vừa thay cho process đang đọc dở, bỏ file cũ hơn
+            for path in (self._vectors_path(generation - 1), self._main_path(generation - 1)):
+                if generation > 0 and os.path.exists(path):
+                    os.remove(path)
+            with self._lock, self._transaction():
+                self._sync()
+
+    # ---- ghi ----
+
+    def _normalize(self, vectors: Sequence[Sequence[float]]) -> np.ndarray:
+        array = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(array, axis=1, keepdims=True)
+        return array / np.maximum(norms, 1e-12)
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs) -> List[str]:
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [os.urandom(16).hex() for _ in texts]
+        # embed ngoài lock
+        vectors = self._normalize(self._embeddings.embed_documents(texts))
+
+        with self._lock, self._transaction(immediate=True):
+            meta = self._load_meta()
+            if not meta["dim"]:
+                meta["dim"] = int(vectors.shape[1])
+            row_bytes = meta["dim"] * 4
+            path = self._vectors_path(meta["generation"])
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            if size % row_bytes:
+                # ghi dở lúc crash: bỏ phần lẻ cuối file (đang giữ lock ghi nên không process nào đang ghi nối)
+                size -= size % row_bytes
+                with open(path, "r+b") as f:
+                    f.truncate(size)
+            start_vec = size // row_bytes
+            start_row = meta["next_row"]
+            # vector ghi trước, SQLite commit sau: entry trong SQLite luôn có vector;
+            # rollback thì vector thừa ở cuối file không được row nào trỏ tới
+            with open(path, "ab") as f:
+                f.write(vectors.tobytes())
+
+            # id đã có thì thay thế (như upsert): bản cũ đánh dấu deleted
+            self._mark_deleted(ids=ids)
+            self._conn.executemany(
+                "INSERT INTO rows (row, vec, id, text, metadata) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (start_row + i, start_vec + i, id_, text, json.dumps(metadata or {}, ensure_ascii=False))
+                    for i, (id_, text, metadata) in enumerate(zip(ids, texts, metadatas))
+                ]
+            )
+            meta["next_row"] = start_row + len(texts)
+            self._save_meta(meta)
+            self._sync()
+            due = self._delta.ntotal > self.delta_max_rows
+
+        if due:
+            self.compact()
+        return list(ids)
+
+    def update_metadatas(self, ids, metadatas) -> None:
+        with self._lock, self._transaction(immediate=True):
+            self._conn.executemany(
+                "UPDATE rows SET metadata = ? WHERE id = ? AND deleted = 0",
+                [(json.dumps(metadata, ensure_ascii=False), id_) for id_, metadata in zip(ids, metadatas)]
+            )
+
+    def _mark_deleted(self, ids: Optional[Sequence[str]] = None, where: Optional[Filter] = None) -> int:
+        clause, params = self._where_sql(where)
+        updated = 0
+        if ids is None:
+            updated = self._conn.execute(f"UPDATE rows SET deleted = 1 WHERE deleted = 0{clause}", params).rowcount
+        else:
+            for batch in _batches(list(ids)):
+                updated += self._conn.execute(
+                    f"UPDATE rows SET deleted = 1 WHERE deleted = 0 AND id IN ({','.join('?' * len(batch))}){clause}",
+                    [*batch, *params]
+                ).rowcount
+        return updated
+
+    def delete(self, ids=None, where=None, **kwargs) -> None:
+        if ids is None and where is None:
+            return
+        with self._lock, self._transaction(immediate=True):
+            self._mark_deleted(ids=ids, where=where)
+
+    # ---- đọc ----
+
+    def _where_sql(self, where: Optional[Filter]) -> Tuple[str, List]:
+        if not where:
+            return "", []
+        clauses: List[str] = []
+        params: List = []
+        for key, condition in where.items():
+            if not FILTER_KEY.match(key):
+                raise ValueError(f"Unsupported filter key: {key}")
+            column = f"json_extract(metadata, '$.{key}')"
+            if isinstance(condition, dict):
+                if "$in" in condition:
+                    values = list(condition["$in"])
+                    if not values:
+                        clauses.append("0")
+                        continue
+                    clauses.append(f"{column} IN ({','.join('?' * len(values))})")
+                    params.extend(values)
+                elif "$eq" in condition:
+                    clauses.append(f"{column} = ?")
+                    params.append(condition["$eq"])
+                else:
+                    raise ValueError(f"Unsupported filter: {condition}")
+            else:
+                clauses.append(f"{column} = ?")
+                params.append(condition)
+        return "".join(f" AND {clause}" for clause in clauses), params
+
+    def get(self, ids=None, include=("documents", "metadatas")) -> Dict[str, List]:
+        with self._lock, self._transaction():
+            if ids is None:
+                rows = self._conn.execute("SELECT id, text, metadata FROM rows WHERE deleted = 0 ORDER BY row").fetchall()
+            else:
+                rows = []
+                for batch in _batches(list(ids)):
+                    rows.extend(self._conn.execute(
+                        f"SELECT id, text, metadata FROM rows WHERE deleted = 0 AND id IN ({','.join('?' * len(batch))}) ORDER BY row",
+                        batch
+                    ).fetchall())
+        return {
+            "ids": [id_ for id_, _, _ in rows],
+            "documents": [text for _, text, _ in rows] if "documents" in include else None,
+            "metadatas": [json.loads(metadata) for _, _, metadata in rows] if "metadatas" in include else None
+        }
+
+    def _lookup(self, rows: Sequence[int], where: Optional[Filter]) -> Dict[int, Tuple[str, str, Dict]]:
+        """row -> (id, text, metadata) của các row còn dùng và khớp filter"""
+        clause, params = self._where_sql(where)
+        found: Dict[int, Tuple[str, str, Dict]] = {}
+        for batch in _batches([int(row) for row in rows]):
+            for row, id_, text, metadata in self._conn.execute(
+                f"SELECT row, id, text, metadata FROM rows WHERE deleted = 0 AND row IN ({','.join('?' * len(batch))}){clause}",
+                [*batch, *params]
+            ):
+                found[row] = (id_, text, json.loads(metadata))
+        return found
+
+    def _ann_search(self, query_vector: np.ndarray, fetch: int) -> List[Tuple[int, float]]:
+        hits: List[Tuple[int, float]] = []
+        for index in (self._main, self._delta):
+            if index is not None and index.ntotal:
+                scores, rows = index.search(query_vector, min(fetch, index.ntotal))
+                hits.extend((int(row), float(score)) for row, score in zip(rows[0], scores[0]) if row >= 0)
+        hits.sort(key=lambda hit: hit[1], reverse=True)
+        return hits
+
+    def _exact_search(self, query_vector: np.ndarray, rows: np.ndarray, vecs: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        scores = self._read_vectors(vecs) @ query_vector[0]
+        top = np.argsort(-scores)[:k]
+        return [(int(rows[i]), float(scores[i])) for i in top]
+
+    def similarity_search_with_score(self, query, k=4, filter=None, **kwargs) -> List[Tuple[Document, float]]:
+        query_vector = self._normalize([self._embeddings.embed_query(query)])
+        with self._lock, self._transaction():
+            if not self._sync()["dim"]:
+                return []
+            if filter:
+                clause, params = self._where_sql(filter)
+                candidates = self._conn.execute(
+                    f"SELECT row, vec FROM rows WHERE deleted = 0{clause} ORDER BY row LIMIT ?",
+                    [*params, self.filter_exact_max + 1]
+                ).fetchall()
+                # filter chọn ít entry: tính chính xác trên đúng các vector đó (đọc qua mmap)
+                if len(candidates) <= self.filter_exact_max:
+                    rows = np.array([row for row, _ in candidates], dtype=np.int64)
+                    vecs = np.array([vec for _, vec in candidates], dtype=np.int64)
+                    hits = self._exact_search(query_vector, rows, vecs, k)
+                    return self._documents(hits, self._lookup([row for row, _ in hits], None))
+
+            # ANN rồi bỏ entry đã xoá / không khớp filter; thiếu thì lấy rộng hơn
+            total = (self._main.ntotal if self._main is not None else 0) + self._delta.ntotal
+            if not total:
+                return []
+            fetch = k * (8 if filter else 2)
+            while True:
+                hits = self._ann_search(query_vector, fetch)
+                found = self._lookup([row for row, _ in hits], filter)
+                hits = [hit for hit in hits if hit[0] in found]
+                if len(hits) >= k or fetch >= total:
+                    return self._documents(hits[:k], found)
+                fetch *= 4
+
+    def _documents(self, hits: List[Tuple[int, float]], found: Dict[int, Tuple[str, str, Dict]]) -> List[Tuple[Document, float]]:
+        # distance = 1 - cosine, cùng chiều với distance của Chroma (nhỏ = giống)
+        return [
+            (Document(page_content=found[row][1], metadata=found[row][2], id=found[row][0]), 1.0 - score)
+            for row, score in hits
+            if row in found
+        ]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM rows WHERE deleted = 0").fetchone()[0]
+
+    def stats(self) -> Dict:
+        with self._lock, self._transaction():
+            meta = self._sync()
+            return {
+                "index_type": meta["main_index_type"],
+                "generation": meta["generation"],
+                "live": self.count(),
+                "main_rows": self._main.ntotal if self._main is not None else 0,
+                "delta_rows": self._delta.ntotal if self._delta is not None else 0
+            }
+
+
+def _batches(values: List, size: int = 500) -> Iterable[List]:
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def create_vector_store(
+    embeddings: Optional[Embeddings],
+    persist_dir: str,
+    collection_name: str,
+    backend: Optional[str] = None,
+    **kwargs: Any
+) -> VectorStoreBackend:
+    """VECTOR_STORE_BACKEND=chroma (mặc định) | faiss; FAISS lưu ở persist_dir/faiss/collection_name"""
+    backend = backend or os.getenv("VECTOR_STORE_BACKEND", "chroma")
+    if backend == "chroma":
+        return ChromaVectorStore(embeddings, persist_dir=persist_dir, collection_name=collection_name)
+    if backend == "faiss":
+        return FaissVectorStore(embeddings, directory=os.path.join(persist_dir, "faiss", collection_name), **kwargs)
+    raise ValueError(f"Unknown vector store backend: {backend}")
+
+
+__all__ = ["VectorStoreBackend", "ChromaVectorStore", "FaissVectorStore", "create_vector_store", "Filter"]
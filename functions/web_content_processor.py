@@ -1,11 +1,11 @@
 # Text splitter để chia nhỏ nội dung thành các chunk
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
-# vector database để lưu trữ và tìm kiếm các vector
-from langchain_chroma import Chroma
+# vector database dùng chung để lưu trữ và tìm kiếm các vector
+from functions.article_index import ArticleIndex, get_article_index
 
-# embedding model để vector hoá text
-from langchain_huggingface import HuggingFaceEmbeddings
+# embedding model để vector hoá text, có cache trên đĩa theo nội dung
+from functions.embedding_cache import CachedEmbeddings, get_cached_huggingface_embeddings
 
 # document để lưu trữ nội dung của mỗi chunk
 from langchain_core.documents.base import Document
@@ -13,20 +13,26 @@ from langchain_core.documents.base import Document
 # LLM để xử lý nội dung
 from langchain_ollama import OllamaLLM
 
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
+import asyncio
 import os
-from datetime import datetime
+import time
 
 from tools.web_scraper_tool import WebContentResponse
 from types_api.types_api import ProcessWebContentsResponse
 
-from numpy import dot
-from numpy.linalg import norm
+import numpy as np
+
+from functions.similarity import QuantizedVectors, cosine_similarities, select_indices
+from functions.sse import EventCallback
+from functions.worker_pools import WorkerPool, get_pool
+from functions.pipeline import PipelineItem, Stage, run_pipeline
 
 class WebContentProcessor:
     def __init__(self):
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-mpnet-base-v2"
+        # text đã embed (bài báo lặp lại, chạy lại query) lấy từ cache, không chạy lại model
+        self.embeddings: CachedEmbeddings = get_cached_huggingface_embeddings(
+            "sentence-transformers/all-mpnet-base-v2"
         )
         
         self.text_splitter = RecursiveCharacterTextSplitter(
@@ -38,48 +44,117 @@ class WebContentProcessor:
             verbose=True
         )
         
+        # số chunk gửi lên Ollama cùng lúc và số lần thử lại khi một chunk lỗi
+        self.llm_concurrency = int(os.getenv("LLM_EXTRACT_CONCURRENCY", "4"))
+        self.llm_max_retries = int(os.getenv("LLM_EXTRACT_MAX_RETRIES", "1"))
+        
+        # xử lý nhiều bài viết theo pipeline: số bài ở mỗi stage cùng lúc, số bài chờ giữa 2 stage,
+        # thời gian tối đa LLM xử lý một bài
+        self.filter_concurrency = int(os.getenv("ARTICLE_FILTER_CONCURRENCY", "1"))
+        self.article_llm_concurrency = int(os.getenv("ARTICLE_LLM_CONCURRENCY", "2"))
+        self.pipeline_queue_size = int(os.getenv("ARTICLE_PIPELINE_QUEUE_SIZE", "2"))
+        self.article_llm_timeout = float(os.getenv("ARTICLE_LLM_TIMEOUT", "300"))
+        
         self.similarity_threshold = 0.5
+        # giới hạn số chunk giữ lại sau khi filter (None = giữ tất cả chunk vượt threshold)
+        self.similarity_top_k: Optional[int] = None
+        
+        # một collection lâu dài cho mọi request, thay vì tạo thư mục Chroma mới mỗi lần
+        self.article_index: ArticleIndex = get_article_index(self.embeddings)
+        self.persist_dir = self.article_index.persist_dir
         
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        self.persist_dir = f"./db/chroma_{timestamp}"
+        # tìm lại chunk liên quan sau khi xử lý: dense | sparse (BM25) | hybrid (gộp cả hai bằng RRF)
+        self.retrieval_mode = os.getenv("ARTICLE_RETRIEVAL_MODE", "hybrid")
+        self.retrieval_k = int(os.getenv("ARTICLE_RETRIEVAL_K", "5"))
+        self.hybrid_fetch_k = int(os.getenv("HYBRID_FETCH_K", "20"))
+        self.hybrid_dense_weight = float(os.getenv("HYBRID_DENSE_WEIGHT", "1.0"))
+        self.hybrid_sparse_weight = float(os.getenv("HYBRID_SPARSE_WEIGHT", "1.0"))
+        self.hybrid_rrf_k = int(os.getenv("HYBRID_RRF_K", "60"))
+        
+        # embedding (sentence-transformers) và ghi / tìm trong Chroma chạy trên pool riêng, không block event loop
+        self.embedding_pool: WorkerPool = get_pool("embedding")
         
     def calculate_similarity(self, text1: str, text2: str) -> float:
         """Tính cosine similarity giữa 2 đoạn text"""
-        # Vector hóa cả 2 text
-        embedding1: List[float] = self.embeddings.embed_query(text1)
-        embedding2: List[float] = self.embeddings.embed_query(text2)
+        # Vector hóa cả 2 text (mảng numpy, không qua list float)
+        embedding1: np.ndarray = self.embeddings.embed_query_array(text1)
+        embedding2: np.ndarray = self.embeddings.embed_query_array(text2)
         
         # Tính cosine similarity
-        cos_sim = dot(embedding1, embedding2)/(norm(embedding1)*norm(embedding2))
+        cos_sim = cosine_similarities(embedding1, embedding2[None, :])[0]
         return float(cos_sim)
         
     async def filter_chunks_by_similarity(
         self, 
         chunks: list[str], 
-        query: str
+        query: str,
+        threshold: Optional[float] = None,
+        top_k: Optional[int] = None,
+        admit: bool = True
     ) -> list[str]:
         """Filter chunks dựa trên similarity với query"""
-        relevant_chunks = []
+        if not chunks:
+            return []
         
-        # Vector hóa query một lần
-        query_embedding = self.embeddings.embed_query(query)
+        # Vector hóa query một lần (pool đầy thì từ chối ngay ở đây, trước khi tốn công embed chunk)
+        query_embedding: np.ndarray = await self.embedding_pool.run(self.embeddings.embed_query_array, query, admit=admit)
         
-        # Vector hóa tất cả chunks
-        chunk_embeddings = [
-            self.embeddings.embed_query(chunk) 
-            for chunk in chunks
-        ]
+        # Vector hóa tất cả chunks trong một lần gọi (model tự chia batch), giữ nguyên dtype của cache
+        # (EMBEDDING_CACHE_DTYPE=int8: 1 byte / chiều + 1 scale / vector)
+        chunk_embeddings: QuantizedVectors = await self.embedding_pool.run(
+            self.embeddings.embed_documents_quantized, chunks, admit=False
+        )
         
-        # Tính similarity và filter
-        for i, chunk_embedding in enumerate(chunk_embeddings):
-            similarity = dot(query_embedding, chunk_embedding)/(
-                norm(query_embedding)*norm(chunk_embedding)
-            )
-            
-            if similarity > self.similarity_threshold:
-                relevant_chunks.append(chunks[i])
+        # Tính similarity của tất cả chunk bằng một phép nhân ma trận-vector rồi filter
+        similarities = cosine_similarities(query_embedding, chunk_embeddings)
+        selected = select_indices(
+            similarities,
+            threshold=self.similarity_threshold if threshold is None else threshold,
+            top_k=self.similarity_top_k if top_k is None else top_k
+        )
                 
-        return relevant_chunks
+        return [chunks[i] for i in selected]
+    
+    async def _extract_chunk(
+        self,
+        index: int,
+        prompt: str,
+        semaphore: asyncio.Semaphore,
+        on_event: Optional[EventCallback] = None
+    ) -> Tuple[str, Dict]:
+        """
+        Gọi LLM cho một chunk, thử lại khi lỗi; lỗi hết số lần thì bỏ qua chunk (trả về rỗng).
+        on_event: stream token của chunk này (event "token" kèm số thứ tự chunk)
+        """
+        timing: Dict = {"chunk": index, "status": "ok", "attempts": 0, "seconds": 0.0}
+        filtered = ""
+        
+        async with semaphore:
+            start = time.perf_counter()
+            for attempt in range(self.llm_max_retries + 1):
+                timing["attempts"] = attempt + 1
+                try:
+                    if on_event is None:
+                        filtered = await self.llm.ainvoke(prompt)
+                    else:
+                        tokens: List[str] = []
+                        async for token in self.llm.astream(prompt):
+                            tokens.append(token)
+                            on_event("token", {"chunk": index, "attempt": attempt + 1, "text": token})
+                        filtered = "".join(tokens)
+                    break
+                except Exception as e:
+                    print(f"LLM extraction failed for chunk {index} (attempt {attempt + 1}): {str(e)}")
+                    timing["error"] = str(e)
+                    if attempt < self.llm_max_retries:
+                        await asyncio.sleep(0.5 * 2 ** attempt)
+                    else:
+                        timing["status"] = "failed"
+            timing["seconds"] = round(time.perf_counter() - start, 3)
+        
+        if timing["status"] == "ok" and not filtered.strip():
+            timing["status"] = "empty"
+        return filtered, timing
     
     # nhận vào content đã được cào về từ một url cụ thể,
     # trích xuất ra được nội dung website và hàm 
@@ -89,15 +164,50 @@ class WebContentProcessor:
         url: str,
         title: str,
         query: str,
-        persist_dir: str = "./db",
+        on_event: Optional[EventCallback] = None
     ) -> ProcessWebContentsResponse:
         """
         Process scraped content:
         1. Filter relevant content using LLM
         2. Chunk filtered content
         3. Store in Chroma
+        on_event (SSE): event "progress" sau chunk / filter / index, "token" khi LLM trích xuất từng chunk
         """
+        relevant_chunks = await self.select_relevant_chunks(content, query, on_event=on_event)
+        return await self.extract_relevant_content(relevant_chunks, url, title, query, on_event=on_event)
+    
+    async def select_relevant_chunks(
+        self,
+        content: str,
+        query: str,
+        on_event: Optional[EventCallback] = None,
+        admit: bool = True
+    ) -> List[str]:
+        """Bước 1 của process_web_content: chunk nội dung và giữ các chunk gần với query (embedding)"""
+        # chia nhỏ nội dung đã lọc thành các chunk vì câu trả lời có thể rất dài và LLM không xử lý hết context được vì máy mình yếu
+        chunks = self.text_splitter.split_text(content)
+        if on_event is not None:
+            on_event("progress", {"stage": "chunked", "chunks": len(chunks)})
         
+        # filter chunks bằng similarity với query
+        relevant_chunks = await self.filter_chunks_by_similarity(chunks, query, admit=admit)
+        if on_event is not None:
+            on_event("progress", {"stage": "filtered", "relevant": len(relevant_chunks), "total": len(chunks)})
+        return relevant_chunks
+    
+    async def extract_relevant_content(
+        self,
+        relevant_chunks: List[str],
+        url: str,
+        title: str,
+        query: str,
+        on_event: Optional[EventCallback] = None,
+        semaphore: Optional[asyncio.Semaphore] = None
+    ) -> ProcessWebContentsResponse:
+        """
+        Bước 2 của process_web_content: LLM trích xuất từng chunk rồi lưu vào Chroma.
+        semaphore: dùng chung giữa nhiều bài viết để giới hạn tổng số request tới Ollama
+        """
         system_prompt = """
         You are a precise content extractor. Your job is to:
         1. NEVER generate new content
@@ -106,83 +216,113 @@ class WebContentProcessor:
         4. Keep important quotes with attribution
         """
         
-        # chia nhỏ nội dung đã lọc thành các chunk vì câu trả lời có thể rất dài và LLM không xử lý hết context được vì máy mình yếu
-        chunks = self.text_splitter.split_text(content)
-        
-        # filter chunks bằng similarity với query
-        relevant_chunks = await self.filter_chunks_by_similarity(chunks, query)
-        
-        # Dùng LLM để filter từng chunk còn lại
-        filtered_chunks: List[str] = []
-        for chunk in relevant_chunks:
-            filter_prompt = f"""
+        # Dùng LLM để filter các chunk còn lại, chạy song song (giới hạn bởi llm_concurrency)
+        semaphore = semaphore or asyncio.Semaphore(self.llm_concurrency)
+        prompts: List[str] = [
+            f"""
             {system_prompt}
             Content chunk: {chunk}
             Query: {query}
             Extract only information relevant to the query.
-            """
-            filtered = self.llm.invoke(filter_prompt)
+            """ for chunk in relevant_chunks
+        ]
+        # gather giữ nguyên thứ tự chunk trong bài viết
+        extracted: List[Tuple[str, Dict]] = await asyncio.gather(*[
+            self._extract_chunk(i, prompt, semaphore, on_event) for i, prompt in enumerate(prompts)
+        ])
+        
+        filtered_chunks: List[str] = []
+        original_chunks: List[str] = []
+        chunk_timings: List[Dict] = []
+        for chunk, (filtered, timing) in zip(relevant_chunks, extracted):
+            chunk_timings.append(timing)
             if filtered.strip():
                 filtered_chunks.append(filtered)
+                original_chunks.append(chunk)
         
-        # Tạo ID riêng biệt cho mỗi chunk
-        ids = [f"{url}-{i}" for i in range(len(filtered_chunks))]
-        # Lưu vào vector database
-        vectordb: Chroma = Chroma.from_texts(
-            texts=filtered_chunks,
-            embedding=self.embeddings,
-            persist_directory=persist_dir,
-            collection_name="articles",
-            ids=ids,
-            metadatas=[
-                {
-                    "url": url,
-                    "query": query,
-                    "chunk_id": i,
-                    "total_chunks": len(filtered_chunks),
-                    "original_chunk": chunks[i] # Lưu luôn text gốc
-                } for i in range(len(filtered_chunks))
-            ] # metadata cho mỗi chunk
+        # Lưu vào vector database dùng chung, chunk đã có (cùng url + nội dung) không embed lại
+        # admit=False: đã tốn công gọi LLM, không từ chối ở bước cuối
+        indexed = await self.embedding_pool.run(
+            self.article_index.upsert_chunks,
+            admit=False,
+            url=url,
+            query=query,
+            chunks=filtered_chunks,
+            original_chunks=original_chunks
         )
+        print(f"Indexed {url}: {indexed['added']} new chunks, {indexed['skipped']} unchanged")
+        if on_event is not None:
+            on_event("progress", {"stage": "indexed", **indexed})
         
         return ProcessWebContentsResponse(
             title=title,
-            filter_prompt=filter_prompt,
+            filter_prompt=prompts[-1] if prompts else "",
             filtered_content="\n\n".join(filtered_chunks),
             num_chunks=len(filtered_chunks),
             url=url,
-            persist_dir=self.persist_dir
+            persist_dir=self.persist_dir,
+            chunk_timings=chunk_timings
         )
     
+    def article_stages(self, query: str) -> List[Stage]:
+        """
+        Các stage xử lý một bài viết (WebContentResponse -> ProcessWebContentsResponse) cho run_pipeline:
+        filter (chunk + embedding) của bài sau chạy chồng lên LLM extraction của bài trước.
+        Các bài dùng chung một semaphore nên tổng số request tới Ollama vẫn <= llm_concurrency
+        """
+        semaphore = asyncio.Semaphore(self.llm_concurrency)
+        
+        async def select(content: WebContentResponse) -> Tuple[WebContentResponse, List[str]]:
+            # pool embedding đã được kiểm tra một lần khi nhận request
+            return content, await self.select_relevant_chunks(content.content, query, admit=False)
+        
+        async def extract(selected: Tuple[WebContentResponse, List[str]]) -> ProcessWebContentsResponse:
+            content, relevant_chunks = selected
+            return await self.extract_relevant_content(
+                relevant_chunks,
+                url=content.metadata["url"] if content.metadata else "",
+                title=content.title if content.title else "",
+                query=query,
+                semaphore=semaphore
+            )
+        
+        return [
+            Stage("filter", select, concurrency=self.filter_concurrency),
+            Stage("llm", extract, concurrency=self.article_llm_concurrency, timeout=self.article_llm_timeout)
+        ]
+    
     async def process_multiple_contents(
         self,
         contents: List[WebContentResponse],
         query: str
     ) -> Dict:
         """ Xử lý nhiều chunks đề phòng LLM không xử lý hết context vì giới hạn context """
-        processed_contents = []
-        
-        for content in contents:
-            processed = await self.process_web_content(
-                content=content.content,
-                url=content.metadata["url"] if content.metadata else "",
-                title=content.title if content.title else "",
-                query=query
-            )
-            
-            processed_contents.append(processed)
-            
-        # lấy content từ vector DB, tìm kiếm những đoạn văn bản liên quan đến query
-        combined_db: Chroma = Chroma(
-            persist_directory=self.persist_dir,
-            embedding_function=self.embeddings,
-            collection_name="articles"
+        self.embedding_pool.admit()
+        # các bài viết chạy theo pipeline, một bài lỗi / chậm không chặn các bài khác
+        items: List[PipelineItem] = await run_pipeline(
+            contents,
+            self.article_stages(query),
+            queue_size=self.pipeline_queue_size
         )
-        
-        # Tìm 5 đoạn văn bản liên quan nhất đến query
-        results: List[Tuple[Document, float]] = combined_db.similarity_search_with_score(
+        processed_contents: List[ProcessWebContentsResponse] = [item.value for item in items if item.ok]
+        failed_articles: List[Dict] = []
+        for item in items:
+            if not item.ok:
+                print(f"Article {item.index} failed at {item.failed_stage}: {item.error}")
+                failed_articles.append({"index": item.index, "stage": item.failed_stage, "error": item.error})
+            
+        # lấy content từ vector DB dùng chung (mọi bài viết đã tích luỹ), tìm kiếm những đoạn văn bản liên quan đến query
+        # hybrid: embedding tìm theo nghĩa, BM25 bắt đúng tên riêng / con số, gộp hạng của hai bên
+        results: List[Tuple[Document, float]] = await self.embedding_pool.run(
+            self.article_index.retrieve,
+            admit=False,
             query=query,
-            k=5 # Trả về 5 kết quả tốt nhất
+            k=self.retrieval_k,
+            mode=self.retrieval_mode,
+            dense_weight=self.hybrid_dense_weight,
+            sparse_weight=self.hybrid_sparse_weight,
+            fetch_k=self.hybrid_fetch_k,
+            rrf_k=self.hybrid_rrf_k
         )
         
         # trích xuất nội dung từ kết quả tìm kiếm
@@ -190,6 +330,7 @@ class WebContentProcessor:
         
         return {
             "processed_articles": processed_contents,
+            "failed_articles": failed_articles,
             "relevant_chunks": relevant_contents,
             "persist_dir": self.persist_dir
         }
\ No newline at end of file
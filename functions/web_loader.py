@@ -0,0 +1,35 @@
+# Thay cho WebBaseLoader của langchain: tải trang qua HTTP client dùng chung (có cache) thay vì requests
+from bs4 import BeautifulSoup
+from langchain_core.documents.base import Document
+
+from typing import Dict, List, Optional
+
+from functions.http_client import FetchResponse, HttpClient, http_client
+from functions.worker_pools import get_pool
+
+
+def build_metadata(soup: BeautifulSoup, url: str) -> Dict[str, str]:
+    """Cùng metadata với WebBaseLoader: source, title, description, language"""
+    metadata = {"source": url}
+    if title := soup.find("title"):
+        metadata["title"] = title.get_text()
+    if description := soup.find("meta", attrs={"name": "description"}):
+        metadata["description"] = description.get("content", "No description found.")
+    if html := soup.find("html"):
+        metadata["language"] = html.get("lang", "No language found.")
+    return metadata
+
+
+def parse_document(html: str, url: str) -> Document:
+    soup = BeautifulSoup(html, "html.parser")
+    return Document(page_content=soup.get_text(), metadata=build_metadata(soup, url))
+
+
+async def load_web_documents(url: str, client: Optional[HttpClient] = None) -> List[Document]:
+    """Tải url và trả về Document giống WebBaseLoader(url).load()"""
+    response: FetchResponse = await (client or http_client).fetch_cached(url)
+    # html.parser chậm với trang lớn, parse trên pool scraping
+    return [await get_pool("scraping").run(parse_document, response.text, url)]
+
+
+__all__ = ["load_web_documents"]
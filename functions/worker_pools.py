@@ -0,0 +1,148 @@
+# Thread pool riêng cho từng loại công việc blocking (agent, dịch, scrape, embedding), có giới hạn hàng đợi
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, TypeVar
+import asyncio
+import functools
+import math
+import os
+import threading
+import time
+
+T = TypeVar("T")
+
+
+class PoolSaturated(Exception):
+    """Hàng đợi của pool đã đầy, API trả 429 kèm Retry-After"""
+
+    def __init__(self, pool: str, retry_after: int):
+        super().__init__(f"Worker pool '{pool}' is saturated, retry after {retry_after}s")
+        self.pool = pool
+        self.retry_after = retry_after
+
+
+class WorkerPool:
+    """
+    Chạy hàm blocking ngoài event loop trên ThreadPoolExecutor riêng của pool:
+    - tối đa max_workers việc chạy cùng lúc, tối đa max_queue việc chờ
+    - hàng đợi đầy thì từ chối ngay (PoolSaturated) thay vì để request treo
+    - đếm queued / in_flight / completed / rejected và thời gian chạy trung bình để ước lượng Retry-After
+    Một pool bị nghẽn (vd: agent chạy lâu) không ảnh hưởng pool khác và event loop
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-pool")
+
+        self.queued = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        # trung bình trượt (EWMA) thời gian chạy một việc
+        self.avg_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def retry_after(self, waiting: Optional[int] = None) -> int:
+        """Ước lượng số giây tới khi hàng đợi hiện tại chạy xong"""
+        waiting = self.queued if waiting is None else waiting
+        return max(1, math.ceil(self.avg_seconds * (waiting + 1) / self.max_workers))
+
+    def admit(self, waiting: Optional[int] = None) -> None:
+        """
+        Raise PoolSaturated nếu hàng đợi đầy.
+        waiting: số việc đang chờ do caller tự quản lý (vd: câu đang chờ trong TranslationBatcher)
+        """
+        with self._lock:
+            waiting = self.queued if waiting is None else waiting
+            if waiting >= self.max_queue:
+                self.rejected += 1
+                raise PoolSaturated(self.name, self.retry_after(waiting))
+
+    def _call(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        with self._lock:
+            self.queued -= 1
+            self.in_flight += 1
+        start = time.perf_counter()
+        ok = False
+        try:
+            result = fn(*args, **kwargs)
+            ok = True
+            return result
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.in_flight -= 1
+                if ok:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+                self.avg_seconds = elapsed if self.avg_seconds == 0 else 0.8 * self.avg_seconds + 0.2 * elapsed
+
+    async def run(self, fn: Callable[..., T], *args: Any, admit: bool = True, **kwargs: Any) -> T:
+        """
+        Chạy fn(*args, **kwargs) trong pool.
+        admit=False: bỏ qua kiểm tra hàng đợi (caller đã kiểm tra trước, vd: batcher đã nhận request)
+        """
+        if admit:
+            self.admit()
+        with self._lock:
+            self.queued += 1
+        future = self.executor.submit(functools.partial(self._call, fn, *args, **kwargs))
+        # caller bị huỷ (client ngắt SSE, wait_for hết giờ) khi việc còn chờ trong executor: việc bị bỏ,
+        # _call không bao giờ chạy nên phải trả lại chỗ trong hàng đợi ở đây.
+        # việc đã bắt đầu chạy thì không huỷ được, chạy tiếp tới xong và _call tự cập nhật bộ đếm
+        future.add_done_callback(self._release_if_cancelled)
+        return await asyncio.wrap_future(future)
+
+    def _release_if_cancelled(self, future) -> None:
+        if future.cancelled():
+            with self._lock:
+                self.queued -= 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "queued": self.queued,
+                "in_flight": self.in_flight,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "avg_seconds": round(self.avg_seconds, 3)
+            }
+
+
+def _pool_from_env(name: str, workers: int, queue: int) -> WorkerPool:
+    prefix = f"{name.upper()}_POOL"
+    return WorkerPool(
+        name=name,
+        max_workers=int(os.getenv(f"{prefix}_WORKERS", str(workers))),
+        max_queue=int(os.getenv(f"{prefix}_MAX_QUEUE", str(queue)))
+    )
+
+
+# pool dùng chung cho cả process, cấu hình qua <NAME>_POOL_WORKERS / <NAME>_POOL_MAX_QUEUE
+worker_pools: Dict[str, WorkerPool] = {
+    # agent.run của smolagents: mỗi task giữ một thread tới khi xong (có thể vài phút)
+    "agent": _pool_from_env("agent", workers=2, queue=8),
+    # inference MarianMT, batcher đã gom batch nên một thread là đủ; hàng đợi tính theo số câu
+    "translation": _pool_from_env("translation", workers=1, queue=256),
+    # parse HTML (lxml / BeautifulSoup)
+    "scraping": _pool_from_env("scraping", workers=4, queue=64),
+    # sentence-transformers và ghi vào vector DB
+    "embedding": _pool_from_env("embedding", workers=1, queue=32)
+}
+
+
+def get_pool(name: str) -> WorkerPool:
+    return worker_pools[name]
+
+
+def pool_stats() -> Dict[str, Dict]:
+    return {name: pool.stats() for name, pool in worker_pools.items()}
+
+
+__all__ = ["WorkerPool", "PoolSaturated", "worker_pools", "get_pool", "pool_stats"]
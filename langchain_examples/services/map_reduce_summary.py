@@ -0,0 +1,140 @@
+# Map-reduce summarization chạy async: map song song (có giới hạn), reduce phân cấp khi vượt context
+from langchain_core.documents.base import Document
+from langchain_core.language_models import BaseLanguageModel
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from functions.sse import EventCallback
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+import asyncio
+import os
+import time
+
+# cùng prompt mặc định với load_summarize_chain(chain_type="map_reduce")
+SUMMARY_PROMPT = """Write a concise summary of the following:
+
+
+"{text}"
+
+
+CONCISE SUMMARY:"""
+
+# chặn trường hợp bản tóm tắt không ngắn đi, tránh lặp vô hạn
+MAX_COLLAPSE_LEVELS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Ước lượng số token (~4 ký tự / token), đủ để chia ngân sách context mà không cần tokenizer"""
+    return max(1, len(text) // 4)
+
+
+@dataclass
+class MapReduceResult:
+    summary: str
+    # mỗi stage: {"stage": "map" | "collapse_1" | ... | "reduce", "calls": n, "seconds": t}
+    stages: List[Dict] = field(default_factory=list)
+
+
+class MapReduceSummarizer:
+    """
+    - split: chia document theo ngân sách token (token_budget) cho mỗi lần gọi map
+    - map: tóm tắt các phần song song, tối đa max_concurrency request tới Ollama cùng lúc
+    - collapse: nếu tổng các bản tóm tắt vượt token_budget, gộp theo nhóm vừa ngân sách và tóm tắt tiếp
+    - reduce: tóm tắt lần cuối
+    """
+
+    def __init__(
+        self,
+        llm: BaseLanguageModel,
+        token_budget: Optional[int] = None,
+        max_concurrency: Optional[int] = None
+    ):
+        self.llm = llm
+        self.token_budget = token_budget or int(os.getenv("SUMMARY_TOKEN_BUDGET", "2000"))
+        self.max_concurrency = max_concurrency or int(os.getenv("SUMMARY_MAP_CONCURRENCY", "4"))
+        self.text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=self.token_budget,
+            chunk_overlap=self.token_budget // 10,
+            length_function=estimate_tokens
+        )
+
+    async def _summarize(self, text: str, semaphore: asyncio.Semaphore, on_event: Optional[EventCallback] = None) -> str:
+        prompt = SUMMARY_PROMPT.format(text=text)
+        async with semaphore:
+            if on_event is None:
+                result = await self.llm.ainvoke(prompt)
+                # ChatOllama trả về AIMessage, OllamaLLM trả về str
+                return str(getattr(result, "content", result)).strip()
+            
+            # stream: gửi từng token cho client ngay khi model sinh ra
+            tokens: List[str] = []
+            async for chunk in self.llm.astream(prompt):
+                token = str(getattr(chunk, "content", chunk))
+                if token:
+                    tokens.append(token)
+                    on_event("token", {"text": token})
+        return "".join(tokens).strip()
+
+    async def _run_stage(
+        self,
+        name: str,
+        texts: List[str],
+        semaphore: asyncio.Semaphore,
+        stages: List[Dict],
+        on_event: Optional[EventCallback] = None,
+        stream_tokens: bool = False
+    ) -> List[str]:
+        start = time.perf_counter()
+        summaries = await asyncio.gather(*[
+            self._summarize(text, semaphore, on_event if stream_tokens else None) for text in texts
+        ])
+        stages.append({"stage": name, "calls": len(texts), "seconds": round(time.perf_counter() - start, 3)})
+        if on_event is not None:
+            on_event("progress", stages[-1])
+        return list(summaries)
+
+    def _group_by_budget(self, texts: List[str]) -> List[str]:
+        """Gộp các bản tóm tắt liền nhau sao cho mỗi nhóm không vượt token_budget"""
+        groups: List[List[str]] = [[]]
+        used = 0
+        for text in texts:
+            tokens = estimate_tokens(text)
+            if groups[-1] and used + tokens > self.token_budget:
+                groups.append([])
+                used = 0
+            groups[-1].append(text)
+            used += tokens
+        return ["\n\n".join(group) for group in groups]
+
+    async def summarize(self, docs: List[Document], on_event: Optional[EventCallback] = None) -> MapReduceResult:
+        """on_event: nhận event "progress" sau mỗi stage và "token" trong lúc reduce (dùng cho SSE)"""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        stages: List[Dict] = []
+
+        start = time.perf_counter()
+        chunks: List[str] = []
+        for doc in docs:
+            chunks.extend(self.text_splitter.split_text(doc.page_content))
+        stages.append({"stage": "split", "calls": len(chunks), "seconds": round(time.perf_counter() - start, 3)})
+        if on_event is not None:
+            on_event("progress", stages[-1])
+        if not chunks:
+            return MapReduceResult(summary="", stages=stages)
+
+        summaries = await self._run_stage("map", chunks, semaphore, stages, on_event)
+
+        # reduce phân cấp: mỗi vòng gộp giảm số bản tóm tắt cho tới khi vừa một context
+        level = 0
+        while (
+            sum(estimate_tokens(s) for s in summaries) > self.token_budget
+            and len(summaries) > 1
+            and level < MAX_COLLAPSE_LEVELS
+        ):
+            level += 1
+            summaries = await self._run_stage(f"collapse_{level}", self._group_by_budget(summaries), semaphore, stages, on_event)
+
+        final = await self._run_stage("reduce", ["\n\n".join(summaries)], semaphore, stages, on_event, stream_tokens=True)
+        return MapReduceResult(summary=final[0], stages=stages)
+
+
+__all__ = ["MapReduceSummarizer", "MapReduceResult"]
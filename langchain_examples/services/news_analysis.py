@@ -1,48 +1,51 @@
 from langchain_ollama import OllamaLLM
 from tools.web_scraper_tool import WebScraperTool
-from types_api.types_api import NewsParams, NewsRequest, NewsResponse, ProcessWebContentsResponse
+from types_api.types_api import NewsRequest, NewsResponse, ProcessWebContentsResponse
 from fastapi import HTTPException
-from serpapi import GoogleSearch
-import os
+from functions.news_search import news_search
+from functions.sse import EventCallback
+from functions.worker_pools import PoolSaturated
+from langchain_examples.services.news_pipeline import NewsPipeline
+from typing import Optional
 
-async def analyze_news(req: NewsRequest):
+async def analyze_news(req: NewsRequest, on_event: Optional[EventCallback] = None):
     # mục đích để test hàm gọi LLM extract ra content chính từ url để chunk và lưu vào Chroma
     try:
-        # Get API key from environment
-        serpapi_key: str | None = os.getenv("SERPAPI_API_KEY")
-        if not serpapi_key:
-            raise ValueError("SERPAPI_API_KEY not found in environment variables")
-
-        # Calculate time range
-        time_mapping = {
-            "day": "d",
-            "week": "w",
-            "month": "m"
-        }
-    
-        # Setup search parameters
-        search_params = NewsParams(
-            api_key=serpapi_key,
-            # engine="google",
-            q=req.query,
-            tbm="nws",  # Specify khu vực tìm kiếm là chỉ có news
-            num=req.max_results,
-            tbs=f"qdr:{time_mapping.get(req.time_period, 'd')}",
+        # Tìm kiếm news (mặc định Google News qua SerpAPI, đổi bằng NEWS_SEARCH_PROVIDER),
+        # query giống nhau trong cùng khoảng thời gian dùng lại kết quả / gộp vào lần tìm đang chạy
+        news_results, search_cache = await news_search.search(
+            req.query,
+            time_period=req.time_period,
+            max_results=req.max_results
         )
-
-        # Tìm kiếm news trên google
-        search = GoogleSearch(search_params.model_dump())
-        results = search.get_dict()
+        if not news_results:
+            raise ValueError(f"No news found for '{req.query}'")
+        
+        if req.multi_article:
+            # xử lý tất cả bài tìm được, các stage chạy chồng lấp giữa các bài
+            if on_event is not None:
+                on_event("progress", {"stage": "searched", "results": len(news_results), "cache_status": search_cache})
+            return await NewsPipeline().run(req.query, news_results, on_event=on_event)
         
         # lấy link của bài viết đầu tiên
-        first_article = results["news_results"][0].get("link")
+        first_article = news_results[0]["link"]
+        if on_event is not None:
+            on_event("progress", {
+                "stage": "searched",
+                "results": len(news_results),
+                "url": first_article,
+                "cache_status": search_cache
+            })
         # đưa link, lọc content từ link, lọc tiếp nội dung chính xác, chunk, lưu vào Chroma,
         webScraper = WebScraperTool()
         content: ProcessWebContentsResponse = await webScraper.check_content(
             url=first_article,
-            query=req.query
+            query=req.query,
+            on_event=on_event
         )
         
         return content
+    except PoolSaturated:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
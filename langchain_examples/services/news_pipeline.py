@@ -0,0 +1,157 @@
+# Phân tích nhiều bài báo cùng lúc theo pipeline: fetch -> extract HTML -> filter (embedding) -> LLM extraction
+from langchain_core.language_models import BaseLanguageModel
+from tools.web_scraper_tool import WebScraperTool
+from tools.html_extractors import ExtractedPage
+from types_api.types_api import NewsResponse, ProcessWebContentsResponse, WebContentResponse
+from functions.http_client import FetchResponse
+from functions.pipeline import PipelineItem, Stage, run_pipeline
+from functions.sse import EventCallback
+from functions.web_content_processor import WebContentProcessor
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import os
+import re
+
+SUMMARY_PROMPT = """You are a news analyst. Using ONLY the article extracts below, write a concise summary
+of what the news says about: {query}
+
+{articles}
+
+SUMMARY:"""
+
+INSIGHTS_PROMPT = """You are a news analyst. Using ONLY the article extracts below, list the 3 to 5 most
+important insights about: {query}
+Write one insight per line, each line starting with "- ".
+
+{articles}
+
+KEY INSIGHTS:"""
+
+# dòng dạng "- ...", "* ...", "1. ...", "2) ..."
+INSIGHT_LINE = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+(.+)$")
+
+
+def parse_insights(text: str) -> List[str]:
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    insights = [match.group(1).strip() for line in lines if (match := INSIGHT_LINE.match(line))]
+    # model không theo format thì lấy từng dòng
+    return insights or lines
+
+
+class NewsPipeline:
+    """
+    Mỗi bài báo đi qua các stage nối nhau bằng queue có giới hạn (xem functions.pipeline):
+    - fetch: tải trang qua HTTP client dùng chung (có cache), NEWS_FETCH_CONCURRENCY bài cùng lúc
+    - extract: parse HTML trên pool scraping, NEWS_EXTRACT_CONCURRENCY bài cùng lúc
+    - filter, llm: các stage của WebContentProcessor.article_stages
+    Bài lỗi / quá thời gian được ghi lại trong articles, các bài khác vẫn chạy tiếp.
+    Cuối cùng tóm tắt và rút ra key insights từ các bài thành công.
+    """
+
+    def __init__(
+        self,
+        scraper: Optional[WebScraperTool] = None,
+        processor: Optional[WebContentProcessor] = None
+    ):
+        self.scraper = scraper or WebScraperTool()
+        self.processor = processor or WebContentProcessor()
+        self.fetch_concurrency = int(os.getenv("NEWS_FETCH_CONCURRENCY", "4"))
+        self.extract_concurrency = int(os.getenv("NEWS_EXTRACT_CONCURRENCY", "2"))
+        # giới hạn độ dài nội dung đưa vào prompt tóm tắt
+        self.summary_max_chars = int(os.getenv("NEWS_SUMMARY_MAX_CHARS", "12000"))
+
+    async def _fetch(self, result: Dict) -> Tuple[Dict, FetchResponse]:
+        return result, await self.scraper.client.fetch_cached(result["link"], headers=self.scraper.headers)
+
+    async def _extract(self, fetched: Tuple[Dict, FetchResponse]) -> WebContentResponse:
+        result, response = fetched
+        # pool scraping đã được kiểm tra một lần khi nhận request
+        page: ExtractedPage = await self.scraper.pool.run(
+            self.scraper.extractor.extract, response.text, response.url, admit=False
+        )
+        return WebContentResponse(
+            title=page.title or result.get("title", ""),
+            content=page.content,
+            metadata={
+                "url": result["link"],
+                "length": len(page.content)
+            }
+        )
+
+    def stages(self, query: str) -> List[Stage]:
+        return [
+            Stage("fetch", self._fetch, concurrency=self.fetch_concurrency),
+            Stage("extract", self._extract, concurrency=self.extract_concurrency),
+            *self.processor.article_stages(query)
+        ]
+
+    async def _summarize(self, llm: BaseLanguageModel, query: str, processed: List[ProcessWebContentsResponse]) -> Tuple[str, List[str]]:
+        if not processed:
+            return "", []
+        # chia đều ngân sách ký tự cho các bài
+        per_article = self.summary_max_chars // len(processed)
+        articles = "\n\n".join(
+            f"[{i + 1}] {article.title}\n{article.filtered_content[:per_article]}"
+            for i, article in enumerate(processed)
+        )
+        summary, insights = await asyncio.gather(
+            llm.ainvoke(SUMMARY_PROMPT.format(query=query, articles=articles)),
+            llm.ainvoke(INSIGHTS_PROMPT.format(query=query, articles=articles))
+        )
+        # OllamaLLM trả về str, chat model trả về AIMessage
+        summary = str(getattr(summary, "content", summary)).strip()
+        insights = str(getattr(insights, "content", insights))
+        return summary, parse_insights(insights)
+
+    async def run(self, query: str, news_results: List[Dict], on_event: Optional[EventCallback] = None) -> NewsResponse:
+        news_results = [result for result in news_results if result.get("link")]
+        # kiểm tra pool một lần cho cả request, các bài sau không bị từ chối giữa chừng
+        self.scraper.pool.admit()
+        self.processor.embedding_pool.admit()
+
+        items: List[PipelineItem] = await run_pipeline(
+            news_results,
+            self.stages(query),
+            queue_size=self.processor.pipeline_queue_size,
+            on_event=on_event
+        )
+
+        articles: List[Dict] = []
+        processed: List[ProcessWebContentsResponse] = []
+        for item in items:
+            result = news_results[item.index]
+            article: Dict = {
+                "title": result.get("title", ""),
+                "url": result["link"],
+                "source": result.get("source"),
+                "date": result.get("date"),
+                "snippet": result.get("snippet"),
+                "status": "ok" if item.ok else "failed",
+                "timings": item.timings
+            }
+            if item.ok:
+                content: ProcessWebContentsResponse = item.value
+                processed.append(content)
+                article.update(
+                    title=content.title or article["title"],
+                    num_chunks=content.num_chunks,
+                    filtered_content=content.filtered_content
+                )
+            else:
+                print(f"News article {result['link']} failed at {item.failed_stage}: {item.error}")
+                article.update(stage=item.failed_stage, error=item.error)
+            articles.append(article)
+
+        summary, key_insights = await self._summarize(self.processor.llm, query, processed)
+        if on_event is not None:
+            on_event("progress", {"stage": "summarized", "articles": len(processed), "failed": len(items) - len(processed)})
+
+        return NewsResponse(
+            success=bool(processed),
+            articles=articles,
+            summary=summary,
+            key_insights=key_insights
+        )
+
+
+__all__ = ["NewsPipeline", "parse_insights"]
@@ -4,38 +4,122 @@ from langchain.chains.combine_documents.base import BaseCombineDocumentsChain
 from langchain_core.documents.base import Document
 from langchain_ollama import ChatOllama, OllamaLLM
 from types_api.types_api import SummarizeRequest, SummarizeResponse
-from langchain_community.document_loaders import WebBaseLoader
+from functions.web_loader import load_web_documents
+from functions.result_cache import CACHE_HIT, CACHE_MISS, AsyncResultCache
+from functions.sse import EventCallback
+from functions.worker_pools import PoolSaturated
+from langchain_examples.services.map_reduce_summary import SUMMARY_PROMPT, MapReduceResult, MapReduceSummarizer
 from langchain.chains.summarize import load_summarize_chain
+from typing import Dict, List, Optional
+import hashlib
+import os
+import time
 
-async def web_summary(req: SummarizeRequest) -> SummarizeResponse:
+# cache tóm tắt theo (nội dung trang, model, chain_type)
+summary_cache: AsyncResultCache[Dict] = AsyncResultCache(
+    ttl_seconds=float(os.getenv("SUMMARY_CACHE_TTL", "3600")),
+    max_entries=int(os.getenv("SUMMARY_CACHE_MAX_ENTRIES", "256"))
+)
+
+def summary_cache_key(docs: list[Document], model: str, chain_type: str) -> tuple[str, str, str]:
+    content_hash = hashlib.sha256("\x1e".join(doc.page_content for doc in docs).encode("utf-8")).hexdigest()
+    return (content_hash, model, chain_type)
+
+async def web_summary(req: SummarizeRequest, on_event: Optional[EventCallback] = None) -> SummarizeResponse:
+    """
+    on_event (dùng cho SSE): nhận event "progress" theo từng bước và "token" khi LLM sinh bản tóm tắt cuối
+    (refine / map_rerank chạy qua chain của langchain: một event "token" chứa cả bản tóm tắt khi chain xong).
+    Khi stream, request không gộp vào lần chạy giống hệt đang chạy (token chỉ đến được một client),
+    nhưng vẫn đọc / ghi summary_cache.
+    """
     try:
-        loader = WebBaseLoader(req.url)
-        docs: list[Document] = loader.load()
+        # tải trang qua HTTP cache dùng chung với scraper, trang mới tải gần đây không gọi mạng lại
+        docs: list[Document] = await load_web_documents(req.url)
         
         if not docs:
             raise HTTPException(status_code=404, detail="No content found")
+        if on_event is not None:
+            on_event("progress", {
+                "stage": "fetched",
+                "documents": len(docs),
+                "characters": sum(len(doc.page_content) for doc in docs)
+            })
         
-        # init LLM
-        # llm = OllamaLLM(model=req.model or "llama2-uncensored")
-        llm = ChatOllama(model=req.model or "llama2-uncensored")
-        # chain từ langchain để summarize
-        chain: BaseCombineDocumentsChain = load_summarize_chain(
-            llm=llm, 
-            chain_type=req.chain_type or "stuff", 
-            verbose=True
-        )
+        model = req.model or "llama2-uncensored"
+        chain_type = req.chain_type or "stuff"
+        
+        async def summarize() -> Dict:
+            # init LLM
+            # llm = OllamaLLM(model=req.model or "llama2-uncensored")
+            llm = ChatOllama(model=model)
+            
+            if chain_type == "map_reduce":
+                # map song song theo ngân sách token, reduce phân cấp khi vượt context
+                map_reduce: MapReduceResult = await MapReduceSummarizer(llm).summarize(docs, on_event=on_event)
+                return {"summary": map_reduce.summary, "stages": map_reduce.stages}
+            
+            if chain_type == "stuff" and on_event is not None:
+                # stuff = một lần gọi LLM với cả trang (cùng prompt mặc định của chain), stream token trực tiếp
+                start = time.perf_counter()
+                tokens: List[str] = []
+                async for chunk in llm.astream(SUMMARY_PROMPT.format(text="\n\n".join(doc.page_content for doc in docs))):
+                    token = str(getattr(chunk, "content", chunk))
+                    if token:
+                        tokens.append(token)
+                        on_event("token", {"text": token})
+                return {
+                    "summary": "".join(tokens).strip(),
+                    "stages": [{"stage": chain_type, "calls": 1, "seconds": round(time.perf_counter() - start, 3)}]
+                }
+            
+            # chain từ langchain để summarize
+            chain: BaseCombineDocumentsChain = load_summarize_chain(
+                llm=llm, 
+                chain_type=chain_type, 
+                verbose=True
+            )
+            
+            # thực hiện tóm tắt với các bước:
+            # 1. Lấy nội dung từ 'docs'
+            # 2. Tạo prompt lên model LLM yêu cầu tóm tắt
+            # 3. Lưu vào 'result'
+            # ainvoke để không block event loop, các request giống hệt tới sau mới gộp được vào lần chạy này
+            start = time.perf_counter()
+            result = await chain.ainvoke(docs)
+            # ainvoke trả về dict (input_documents, output_text): chỉ lưu bản tóm tắt, cùng dạng với nhánh stuff stream
+            summary = result["output_text"].strip()
+            if on_event is not None:
+                # refine / map_rerank không stream được token: gửi cả bản tóm tắt thành một event "token"
+                on_event("token", {"text": summary})
+            return {
+                "summary": summary,
+                "stages": [{"stage": chain_type, "calls": 1, "seconds": round(time.perf_counter() - start, 3)}]
+            }
         
-        # thực hiện tóm tắt với các bước:
-        # 1. Lấy nội dung từ 'docs'
-        # 2. Tạo prompt lên model LLM yêu cầu tóm tắt
-        # 3. Lưu vào 'result'
-        result = chain.invoke(docs)
+        cache_key = summary_cache_key(docs, model, chain_type)
+        if on_event is None:
+            # trang không đổi + cùng model, chain_type thì dùng lại kết quả;
+            # nhiều request giống nhau cùng lúc chỉ chạy LLM một lần
+            result, cache_status = await summary_cache.get_or_compute(cache_key, summarize)
+        else:
+            cached: Optional[Dict] = summary_cache.get(cache_key)
+            if cached is not None:
+                summary_cache.hits += 1
+                result, cache_status = cached, CACHE_HIT
+            else:
+                summary_cache.misses += 1
+                result, cache_status = await summarize(), CACHE_MISS
+                summary_cache.put(cache_key, result)
         
         return SummarizeResponse(
             success=True,
-            summary=str(result),
-            metadata=req
+            summary=result["summary"],
+            metadata=req,
+            cache_status=cache_status,
+            stages=result["stages"]
         )
+    except PoolSaturated:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
@@ -3,12 +3,26 @@ from langchain_core.documents.base import Document
 from langchain_ollama import OllamaLLM
 from langgraph.graph import StateGraph, END
 
-from langchain_community.vectorstores import Chroma
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_ollama import OllamaEmbeddings
 from langgraph.graph.state import CompiledStateGraph
 from enum import Enum
 from dataclasses import dataclass, field
+from collections import OrderedDict
+import os
+import time
+
+from functions.document_index import DocumentIndex
+from functions.document_store import DocumentStore, StoredDocument
+
+LLM_MODEL = "deepseek-r1:1.5b-qwen-distill-q8_0"
+# một client dùng chung cho mọi node thay vì tạo OllamaLLM mới trong từng node
+llm = OllamaLLM(model=LLM_MODEL)
+# đếm số lần gọi LLM để báo cáo từng node tốn bao nhiêu round-trip
+LLM_STATS: Dict[str, int] = {"calls": 0}
+
+def invoke_llm(prompt: str) -> str:
+    LLM_STATS["calls"] += 1
+    return llm.invoke(prompt)
 
 # Định nghĩa các loại yêu cầu có thể có
 class QueryType(Enum):
@@ -22,12 +36,38 @@ class UserQuery:
     query_type: QueryType
     extracted_keywords: List[str] = field(default_factory=list)
     
+# câu hỏi đã phân loại (theo câu hỏi đã chuẩn hoá), hỏi lại không gọi LLM
+CLASSIFICATION_CACHE_SIZE = 256
+_classification_cache: "OrderedDict[str, UserQuery]" = OrderedDict()
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
 def classify_user_query(query: str) -> UserQuery:
     """
-    Sử dụng LLM để phân loại yêu cầu của user một cách thông minh hơn
+    Phân loại câu hỏi và trích xuất từ khoá, dùng lại kết quả nếu câu hỏi đã được phân loại trước đó
     """
-    llm = OllamaLLM(model="deepseek-r1:1.5b-qwen-distill-q8_0")
+    key = normalize_query(query)
+    cached = _classification_cache.get(key)
+    if cached is not None:
+        _classification_cache.move_to_end(key)
+        print(f"Classification cache hit: {cached.query_type.value}")
+        return UserQuery(
+            raw_text=query,
+            query_type=cached.query_type,
+            extracted_keywords=list(cached.extracted_keywords)
+        )
     
+    user_query = classify_user_query_with_llm(query)
+    _classification_cache[key] = user_query
+    if len(_classification_cache) > CLASSIFICATION_CACHE_SIZE:
+        _classification_cache.popitem(last=False)
+    return user_query
+
+def classify_user_query_with_llm(query: str) -> UserQuery:
+    """
+    Sử dụng LLM để phân loại yêu cầu của user một cách thông minh hơn
+    """
     classification_prompt: str = f"""
     Hãy phân loại câu hỏi sau vào một trong hai loại:
     1. DATABASE_SEARCH: Nếu người dùng có ý định tìm kiếm thông tin từ database/báo cáo/dữ liệu có sẵn
@@ -45,7 +85,7 @@ def classify_user_query(query: str) -> UserQuery:
     """
 
     # Lấy kết quả phân loại từ LLM và xử lý để lấy chỉ kết quả cuối cùng
-    raw_response: str = llm.invoke(classification_prompt).strip()
+    raw_response: str = invoke_llm(classification_prompt).strip()
     
     # Xử lý response để lấy kết quả cuối cùng
     if "<think>" in raw_response:
@@ -79,8 +119,8 @@ def classify_user_query(query: str) -> UserQuery:
         """
         
         # Lấy từ khóa từ LLM và chuyển thành list
-        keywords_str: str = llm.invoke(keywords_prompt).strip()
-        extracted_keywords: List[str] = [k.strip() for k in keywords_str.split(',')]
+        keywords_str: str = invoke_llm(keywords_prompt).strip()
+        extracted_keywords: List[str] = [k.strip() for k in keywords_str.split(',') if k.strip()]
         
         return UserQuery(
             raw_text=query,
@@ -97,96 +137,113 @@ def classify_user_query(query: str) -> UserQuery:
 class ResearchState(TypedDict):
     query: str                     # Câu hỏi nghiên cứu
     query_type: QueryType         # Thêm trường này
+    user_query: Optional[UserQuery]  # kết quả phân loại + từ khoá, tính một lần ở collect_documents
     documents: List[str]          
+    document_ids: List[str]       # id trong research database của từng tài liệu (rỗng nếu không lấy từ database)
     relevant_chunks: List[str]    
     analysis: Dict[str, str]      
     final_summary: str            
     current_step: str             
     errors: List[str]             
+    node_timings: List[Dict[str, Any]]  # [{"node", "seconds", "llm_calls"}] cho báo cáo thời gian
 
-# Thêm vào đầu file, sau phần import
-def mock_database_query(query: str) -> Any:
-    """
-    Giả lập database chứa các bài báo và báo cáo về AI
-    """
-    mock_documents = {
-        "ai_impact": [
-            """
-            Theo báo cáo của World Economic Forum 2024, AI sẽ tự động hóa khoảng 85 triệu việc làm 
-            và tạo ra 97 triệu việc làm mới vào năm 2025. Các ngành chịu tác động mạnh nhất bao gồm:
-            kế toán, dịch vụ khách hàng, và công việc hành chính. Tuy nhiên, nhu cầu về các vị trí
-            như kỹ sư AI, chuyên gia phân tích dữ liệu, và quản lý quy trình tự động hóa sẽ tăng mạnh.
-            """,
-            
-            """
-            Khảo sát từ McKinsey 2023 cho thấy 56% công ty đang thử nghiệm hoặc triển khai AI 
-            trong hoạt động kinh doanh. Điều này dẫn đến nhu cầu đào tạo lại kỹ năng cho 40% 
-            lực lượng lao động hiện tại. Các kỹ năng được ưu tiên bao gồm: tư duy phản biện,
-            khả năng làm việc với AI, và kỹ năng giải quyết vấn đề phức tạp.
-            """,
-            
-            """
-            Theo dự báo của LinkedIn, đến năm 2028, 75% công việc sẽ yêu cầu ít nhất kiến thức
-            cơ bản về AI. Các ngành như y tế, giáo dục, và luật sẽ tích hợp AI như một công cụ
-            hỗ trợ, không phải thay thế hoàn toàn con người. Xu hướng này tạo ra mô hình làm việc
-            "AI-human collaboration" thay vì "AI replacement".
-            """
-        ],
+# Tài liệu mẫu (các bài báo và báo cáo về AI), dùng khi không cấu hình RESEARCH_DB_PATH
+SAMPLE_DOCUMENTS: Dict[str, List[str]] = {
+    "ai_impact": [
+        """
+        Theo báo cáo của World Economic Forum 2024, AI sẽ tự động hóa khoảng 85 triệu việc làm 
+        và tạo ra 97 triệu việc làm mới vào năm 2025. Các ngành chịu tác động mạnh nhất bao gồm:
+        kế toán, dịch vụ khách hàng, và công việc hành chính. Tuy nhiên, nhu cầu về các vị trí
+        như kỹ sư AI, chuyên gia phân tích dữ liệu, và quản lý quy trình tự động hóa sẽ tăng mạnh.
+        """,
         
-        "job_market": [
-            """
-            Báo cáo từ Bureau of Labor Statistics dự báo tăng trưởng 13% cho các vị trí liên quan
-            đến AI và máy học trong giai đoạn 2023-2028. Mức lương trung bình cho các vị trí này
-            cao hơn 45% so với mức lương trung bình của ngành công nghệ thông tin.
-            """,
-            
-            """
-            Các startup AI đã tạo ra hơn 250,000 việc làm mới trong năm 2023, tập trung vào các
-            lĩnh vực: phát triển mô hình AI, xử lý dữ liệu, và tích hợp AI vào các giải pháp
-            doanh nghiệp. Dự kiến con số này sẽ tăng gấp đôi vào năm 2025.
-            """
-        ],
+        """
+        Khảo sát từ McKinsey 2023 cho thấy 56% công ty đang thử nghiệm hoặc triển khai AI 
+        trong hoạt động kinh doanh. Điều này dẫn đến nhu cầu đào tạo lại kỹ năng cho 40% 
+        lực lượng lao động hiện tại. Các kỹ năng được ưu tiên bao gồm: tư duy phản biện,
+        khả năng làm việc với AI, và kỹ năng giải quyết vấn đề phức tạp.
+        """,
         
-        "skills_development": [
-            """
-            Google và Microsoft đã công bố các chương trình đào tạo AI miễn phí, dự kiến đào tạo
-            2 triệu người trong 3 năm tới. Các kỹ năng được đào tạo bao gồm: lập trình Python,
-            xử lý ngôn ngữ tự nhiên, và đạo đức AI.
-            """
-        ]
-    }
-    
-    # Phân loại query và lấy keywords
-    user_query: UserQuery = classify_user_query(query)
-    
-    # Nếu không phải DATABASE_SEARCH, return empty list
-    if user_query.query_type != QueryType.DATABASE_SEARCH:
-        return []
+        """
+        Theo dự báo của LinkedIn, đến năm 2028, 75% công việc sẽ yêu cầu ít nhất kiến thức
+        cơ bản về AI. Các ngành như y tế, giáo dục, và luật sẽ tích hợp AI như một công cụ
+        hỗ trợ, không phải thay thế hoàn toàn con người. Xu hướng này tạo ra mô hình làm việc
+        "AI-human collaboration" thay vì "AI replacement".
+        """
+    ],
     
-    relevant_docs: List[str] = []
+    "job_market": [
+        """
+        Báo cáo từ Bureau of Labor Statistics dự báo tăng trưởng 13% cho các vị trí liên quan
+        đến AI và máy học trong giai đoạn 2023-2028. Mức lương trung bình cho các vị trí này
+        cao hơn 45% so với mức lương trung bình của ngành công nghệ thông tin.
+        """,
+        
+        """
+        Các startup AI đã tạo ra hơn 250,000 việc làm mới trong năm 2023, tập trung vào các
+        lĩnh vực: phát triển mô hình AI, xử lý dữ liệu, và tích hợp AI vào các giải pháp
+        doanh nghiệp. Dự kiến con số này sẽ tăng gấp đôi vào năm 2025.
+        """
+    ],
     
-    # Sử dụng extracted_keywords thay vì split query
-    for category, documents in mock_documents.items():
-        for doc in documents:
-            # Kiểm tra nếu document chứa bất kỳ keyword nào
-            if any(keyword.lower() in doc.lower() for keyword in user_query.extracted_keywords):
-                relevant_docs.append(doc)
+    "skills_development": [
+        """
+        Google và Microsoft đã công bố các chương trình đào tạo AI miễn phí, dự kiến đào tạo
+        2 triệu người trong 3 năm tới. Các kỹ năng được đào tạo bao gồm: lập trình Python,
+        xử lý ngôn ngữ tự nhiên, và đạo đức AI.
+        """
+    ]
+}
+
+def load_research_database() -> DocumentStore:
+    """
+    RESEARCH_DB_PATH: thư mục (mỗi file .txt / .md một tài liệu) hoặc file .jsonl ({"id", "text", ...})
+    """
+    path = os.getenv("RESEARCH_DB_PATH")
+    if path:
+        return DocumentStore.load(path)
     
-    return relevant_docs
+    store = DocumentStore()
+    for category, documents in SAMPLE_DOCUMENTS.items():
+        for i, doc in enumerate(documents):
+            store.add(doc.strip(), id=f"{category}/{i}", metadata={"category": category})
+    return store
+
+# index được build một lần khi load, mỗi query chỉ tra posting list của các từ khoá
+research_db: DocumentStore = load_research_database()
+RESEARCH_DB_TOP_K = int(os.getenv("RESEARCH_DB_TOP_K", "5"))
+
+def query_research_database(keywords: List[str], k: int = RESEARCH_DB_TOP_K) -> List[StoredDocument]:
+    """
+    Top-k tài liệu khớp với các từ khoá đã trích xuất ở collect_documents, xếp hạng theo BM25.
+    Gõ không dấu vẫn khớp tài liệu có dấu
+    """
+    return [doc for doc, _ in research_db.search(keywords, k=k)]
+
+# vector index của các tài liệu đã xử lý, giữ suốt vòng đời process (và trên đĩa):
+# tài liệu chỉ được embed lần đầu gặp hoặc khi nội dung đổi, mỗi query chỉ embed câu hỏi
+document_index = DocumentIndex(
+    embeddings=OllamaEmbeddings(model="nomic-embed-text"),
+    persist_dir=os.getenv("RESEARCH_INDEX_DIR", "./db/research"),
+    collection_name="research"
+)
 
 def collect_documents(state: ResearchState) -> ResearchState:
     """Thu thập tài liệu dựa vào loại query"""
     
-    # Phân tích yêu cầu của user
+    # Phân tích yêu cầu của user (một lần cho cả workflow, lưu vào state)
     user_query: UserQuery = classify_user_query(state["query"])
+    state["user_query"] = user_query
     state["query_type"] = user_query.query_type
     
     if user_query.query_type == QueryType.DATABASE_SEARCH:
         # Nếu user yêu cầu tìm trong database
-        documents = mock_database_query(state["query"])
+        found = query_research_database(user_query.extracted_keywords)
+        documents = [doc.text for doc in found]
         print("Documents giả lập tìm được: ", documents)
         if documents:
             state["documents"] = documents
+            state["document_ids"] = [doc.id for doc in found]
         else:
             state["errors"].append(f"Không tìm thấy tài liệu phù hợp trong database cho query: {state['query']}")
             state["documents"] = ["Không có dữ liệu phù hợp trong database."]
@@ -201,29 +258,20 @@ def collect_documents(state: ResearchState) -> ResearchState:
 
 def process_documents(state: ResearchState) -> ResearchState:
     """Xử lý và chia nhỏ tài liệu"""
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200
-    )
-    chunks = []
-    for doc in state["documents"]:
-        chunks.extend(text_splitter.split_text(doc))
-    
-    # Tạo vector store
-    vectorstore: Chroma = Chroma.from_texts(
-        chunks,
-        embedding=OllamaEmbeddings(model="nomic-embed-text")
-    )
+    # chỉ chia chunk + embed tài liệu chưa có trong index hoặc đã đổi nội dung
+    if state["document_ids"]:
+        doc_ids = state["document_ids"]
+        document_index.sync(dict(zip(doc_ids, state["documents"])))
+    else:
+        doc_ids = document_index.sync_texts(state["documents"])
     
-    # Tìm các đoạn liên quan nhất
-    relevant_docs: List[Document] = vectorstore.similarity_search(state["query"], k=5)
+    # Tìm các đoạn liên quan nhất trong các tài liệu của query này
+    relevant_docs: List[Document] = document_index.search(state["query"], k=5, doc_ids=doc_ids)
     state["relevant_chunks"] = [doc.page_content for doc in relevant_docs]
     return state
 
 def analyze_information(state: ResearchState) -> ResearchState:
     """Phân tích thông tin từ các đoạn văn bản"""
-    llm = OllamaLLM(model="deepseek-r1:1.5b-qwen-distill-q8_0")
-    
     analyses = {}
     for chunk in state["relevant_chunks"]:
         # Điều chỉnh prompt dựa vào loại query
@@ -244,7 +292,7 @@ def analyze_information(state: ResearchState) -> ResearchState:
             Hãy đưa ra nhận định tổng quan.
             """
         
-        analysis = llm.invoke(prompt)
+        analysis = invoke_llm(prompt)
         analyses[chunk[:100]] = analysis
     
     state["analysis"] = analyses
@@ -252,8 +300,6 @@ def analyze_information(state: ResearchState) -> ResearchState:
 
 def generate_summary(state: ResearchState) -> ResearchState:
     """Tạo bản tổng hợp cuối cùng"""
-    llm = OllamaLLM(model="deepseek-r1:1.5b-qwen-distill-q8_0")
-    
     all_analyses: str = "\n\n".join(state["analysis"].values())
     summary_prompt: str = f"""
     Tổng hợp các phân tích sau để trả lời câu hỏi: {state['query']}
@@ -264,18 +310,42 @@ def generate_summary(state: ResearchState) -> ResearchState:
     Hãy tạo một bản tổng hợp ngắn gọn, súc tích và có cấu trúc rõ ràng.
     """
     
-    state["final_summary"] = llm.invoke(summary_prompt)
+    state["final_summary"] = invoke_llm(summary_prompt)
     return state
 
+def timed_node(name: str, node):
+    """Ghi lại thời gian chạy và số lần gọi LLM của node vào state["node_timings"]"""
+    def run(state: ResearchState) -> ResearchState:
+        calls_before = LLM_STATS["calls"]
+        start = time.perf_counter()
+        state = node(state)
+        state["node_timings"].append({
+            "node": name,
+            "seconds": round(time.perf_counter() - start, 3),
+            "llm_calls": LLM_STATS["calls"] - calls_before
+        })
+        return state
+    return run
+
+def format_timing_report(node_timings: List[Dict[str, Any]]) -> str:
+    lines = [f"{'node':<22}{'seconds':>10}{'llm calls':>12}"]
+    for timing in node_timings:
+        lines.append(f"{timing['node']:<22}{timing['seconds']:>10.3f}{timing['llm_calls']:>12}")
+    lines.append(
+        f"{'total':<22}{sum(t['seconds'] for t in node_timings):>10.3f}"
+        f"{sum(t['llm_calls'] for t in node_timings):>12}"
+    )
+    return "\n".join(lines)
+
 # Tạo workflow
 def create_research_workflow() -> CompiledStateGraph:
     workflow = StateGraph(ResearchState)
     
     # Thêm các node
-    workflow.add_node("collect_documents", collect_documents)
-    workflow.add_node("process_documents", process_documents)
-    workflow.add_node("analyze_information", analyze_information)
-    workflow.add_node("generate_summary", generate_summary)
+    workflow.add_node("collect_documents", timed_node("collect_documents", collect_documents))
+    workflow.add_node("process_documents", timed_node("process_documents", process_documents))
+    workflow.add_node("analyze_information", timed_node("analyze_information", analyze_information))
+    workflow.add_node("generate_summary", timed_node("generate_summary", generate_summary))
     
     # Định nghĩa luồng
     workflow.set_entry_point("collect_documents")
@@ -322,12 +392,15 @@ def main() -> None:
             initial_state = ResearchState(
                 query=query,
                 query_type=QueryType.UNKNOWN,  # Sẽ được xác định trong collect_documents
+                user_query=None,
                 documents=[],
+                document_ids=[],
                 relevant_chunks=[],
                 analysis={},
                 final_summary="",
                 current_step="",
-                errors=[]
+                errors=[],
+                node_timings=[]
             )
             
             # Chạy workflow
@@ -344,6 +417,9 @@ def main() -> None:
             print("\nKết quả:")
             print(final_state["final_summary"])
             
+            print("\nThời gian từng bước:")
+            print(format_timing_report(final_state["node_timings"]))
+            
         except KeyboardInterrupt:
             print("\n\nĐã nhận lệnh thoát. Tạm biệt!")
             break
@@ -5,10 +5,22 @@ import uvicorn
 
 # import smolagents services
 from smolagents_examples.services.run_task_smolagents import run_task_smolagents
-from smolagents_examples.services.run_task_translate import run_task_translate
-from types_api.types_api import RunTaskRequest, SummarizeResponse, TranslateRequest, SummarizeRequest, NewsRequest, NewsResponse, ScrapeRequest, WebContentResponse
+from smolagents_examples.services.run_task_translate import run_task_translate, translation_batcher
+from types_api.types_api import JobResponse, RunTaskRequest, SummarizeResponse, TranslateRequest, SummarizeRequest, NewsRequest, NewsResponse, ScrapeRequest, WebContentResponse
 from langchain_examples.services.web_summary import web_summary
 from tools.web_scraper_tool import WebScraperTool
+from tools.site_crawler import SiteCrawler
+from tools.translation_registry import translation_registry
+from tools.translation_memory import translation_memory
+from functions.http_client import http_client
+from functions.sse import SSE_HEADERS, SSE_MEDIA_TYPE, sse_event, stream_events
+from functions.worker_pools import PoolSaturated, get_pool, pool_stats
+from functions.job_store import Job, job_store
+from functions.job_worker import start_workers, stop_workers
+from functions.news_search import news_search
+import asyncio
+from fastapi import Request
+from fastapi.responses import JSONResponse, StreamingResponse
 
 # news analysis
 from langchain_examples.services.news_analysis import analyze_news
@@ -29,13 +41,59 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(PoolSaturated)
+async def pool_saturated_handler(request: Request, exc: PoolSaturated):
+    # hàng đợi của pool đầy: từ chối ngay, client thử lại sau Retry-After giây
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc), "pool": exc.pool},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+# worker process chạy job nền (async_mode=true), JOB_WORKERS=0 nếu chạy worker riêng bằng python -m functions.job_worker
+job_workers = []
+
+@app.on_event("startup")
+def start_job_workers():
+    job_workers.extend(start_workers(int(os.getenv("JOB_WORKERS", "2"))))
+
+@app.on_event("shutdown")
+async def close_http_client():
+    # đóng connection pool dùng chung
+    await http_client.close()
+    stop_workers(job_workers)
+
+def job_response(job: Job) -> JobResponse:
+    return JobResponse(
+        job_id=job.id,
+        kind=job.kind,
+        status=job.status,
+        progress=job.progress,
+        result=job.result,
+        error=job.error,
+        attempts=job.attempts,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at
+    )
+
+def enqueue_job(kind: str, req) -> JSONResponse:
+    # lưu job vào SQLite rồi trả về ngay, worker process chạy service và lưu kết quả
+    job = job_store.enqueue(kind, req.model_dump(mode="json"))
+    return JSONResponse(
+        status_code=202,
+        content=job_response(job).model_dump(),
+        headers={"Location": f"/api/jobs/{job.id}"}
+    )
+
 @app.post("/api/run-task-smolagents")
-async def handle_run_task_smolagents(req: RunTaskRequest):
+async def handle_run_task_smolagents(req: RunTaskRequest, async_mode: bool = False):
     """
     Run task with smolagents
 
     Args:
         req (RunTaskRequest): Task to run
+        async_mode (bool): chạy nền, trả về job ngay (202)
 
     Returns:
         {result: str}: Result of the task
@@ -43,8 +101,28 @@ async def handle_run_task_smolagents(req: RunTaskRequest):
     #  curl -X POST "http://localhost:8000/api/run-task-smolagents" \
     #      -H "Content-Type: application/json" \
     #      -d '{"task": "What is the 1st number in the Fibonacci sequence?"}'
+    # Chạy nền: thêm ?async_mode=true rồi poll GET /api/jobs/{job_id}
+    if async_mode:
+        return enqueue_job("run-task-smolagents", req)
     return await run_task_smolagents(req)
 
+@app.post("/api/run-task-smolagents/stream")
+async def handle_run_task_smolagents_stream(req: RunTaskRequest):
+    """
+    Như /api/run-task-smolagents nhưng stream qua SSE: event "step" cho mỗi bước của agent,
+    "done" chứa {result}, "error" khi lỗi
+    """
+    #  curl -N -X POST "http://localhost:8000/api/run-task-smolagents/stream" \
+    #      -H "Content-Type: application/json" \
+    #      -d '{"task": "What is the 1st number in the Fibonacci sequence?"}'
+    # pool đầy thì trả 429 + Retry-After ngay, không mở stream rồi mới báo lỗi qua SSE
+    get_pool("agent").admit()
+    return StreamingResponse(
+        stream_events(lambda emit: run_task_smolagents(req, on_event=emit)),
+        media_type=SSE_MEDIA_TYPE,
+        headers=SSE_HEADERS
+    )
+
 @app.post("/api/run-task-translate")
 async def handle_run_task_translate(req: TranslateRequest):
     """
@@ -53,48 +131,197 @@ async def handle_run_task_translate(req: TranslateRequest):
     #  curl -X POST "http://localhost:8000/api/run-task-translate" \
     #      -H "Content-Type: application/json" \
     #      -d '{"text": "Hello, how are you?", "source_lang": "en", "target_lang": "vi"}'
+    # Văn bản dài, stream từng câu đã dịch về qua SSE:
+    #  curl -N -X POST "http://localhost:8000/api/run-task-translate" \
+    #      -H "Content-Type: application/json" \
+    #      -d '{"text": "First paragraph. Second sentence.\n\nNext paragraph.", "source_lang": "en", "target_lang": "vi", "long_text": true}'
     return await run_task_translate(req)
 
+@app.get("/api/translate/stats")
+def translate_stats():
+    """
+    Trạng thái model dịch đang load và hit/miss của translation memory
+    """
+    return {
+        "models": translation_registry.stats(),
+        "memory": translation_memory.stats()
+    }
+
+@app.get("/api/http-cache/stats")
+def http_cache_stats():
+    """
+    Hit / revalidate / miss của HTTP cache dùng chung cho scraper và web summary
+    """
+    return http_client.cache.stats()
+
+@app.get("/api/pools/stats")
+def worker_pool_stats():
+    """
+    Số việc đang chờ / đang chạy / bị từ chối của từng worker pool (agent, translation, scraping, embedding)
+    """
+    return {
+        "pools": pool_stats(),
+        "translation_backlog": translation_batcher.backlog
+    }
+
 @app.post("/api/web-summary")
-async def handle_web_summary(req: SummarizeRequest) -> SummarizeResponse:
+async def handle_web_summary(req: SummarizeRequest, async_mode: bool = False):
     """
-    Give url of a website, return summary of the website content
+    Give url of a website, return summary of the website content.
+    async_mode=true: chạy nền, trả về job ngay (202)
     """
     # curl -X POST "http://localhost:8000/api/web-summary" \
     #      -H "Content-Type: application/json" \
     #      -d '{"url": "https://www.google.com", "model": "llama2-uncensored"}'
+    if async_mode:
+        return enqueue_job("web-summary", req)
     return await web_summary(req)
 
+@app.post("/api/web-summary/stream")
+async def handle_web_summary_stream(req: SummarizeRequest):
+    """
+    Như /api/web-summary nhưng stream qua SSE: event "progress" (fetched, split, map, ...),
+    "token" khi LLM sinh bản tóm tắt, "done" chứa SummarizeResponse
+    """
+    # curl -N -X POST "http://localhost:8000/api/web-summary/stream" \
+    #      -H "Content-Type: application/json" \
+    #      -d '{"url": "https://www.google.com", "model": "llama2-uncensored"}'
+    get_pool("scraping").admit()
+    return StreamingResponse(
+        stream_events(lambda emit: web_summary(req, on_event=emit)),
+        media_type=SSE_MEDIA_TYPE,
+        headers=SSE_HEADERS
+    )
+
 @app.post("/api/news-analysis")
-async def handle_news_analysis(req: NewsRequest): # -> NewsResponse:
+async def handle_news_analysis(req: NewsRequest, async_mode: bool = False): # -> NewsResponse:
     """
-    Fetch and analyze latest news articles based on query
+    Fetch and analyze latest news articles based on query.
+    async_mode=true: chạy nền, trả về job ngay (202)
     """
     # curl -X POST "http://localhost:8000/api/news-analysis" \
     #      -H "Content-Type: application/json" \
     #      -d '{"query": "AI news/trends/new technologies", "max_results": 5, "time_period": "week"}'
     # return await analyze_news(req)
+    if async_mode:
+        return enqueue_job("news-analysis", req)
     return await analyze_news(req)
 
+@app.post("/api/news-analysis/stream")
+async def handle_news_analysis_stream(req: NewsRequest):
+    """
+    Như /api/news-analysis nhưng stream qua SSE: event "progress" (searched, fetched, chunked, filtered n/m, indexed),
+    "token" khi LLM trích xuất từng chunk, "done" chứa ProcessWebContentsResponse
+    """
+    # curl -N -X POST "http://localhost:8000/api/news-analysis/stream" \
+    #      -H "Content-Type: application/json" \
+    #      -d '{"query": "AI news/trends/new technologies", "max_results": 5, "time_period": "week"}'
+    get_pool("scraping").admit()
+    get_pool("embedding").admit()
+    return StreamingResponse(
+        stream_events(lambda emit: analyze_news(req, on_event=emit)),
+        media_type=SSE_MEDIA_TYPE,
+        headers=SSE_HEADERS
+    )
+
+@app.get("/api/news-search/stats")
+def news_search_stats():
+    """
+    Hit / coalesced / miss của cache kết quả tìm kiếm tin tức theo từng khoảng thời gian
+    """
+    return news_search.stats()
+
 @app.post("/api/scrape")
-async def scrape_website(req: ScrapeRequest) -> WebContentResponse:
+async def scrape_website(req: ScrapeRequest):
     """
-    Scrape website and return content
+    Scrape website and return content.
+    crawl_entire_site=true: crawl các trang cùng site (tối đa max_pages), stream từng trang về qua SSE
     """
     # curl -X POST "http://localhost:8000/api/scrape" \
     #      -H "Content-Type: application/json" \
     #      -d '{"url": "https://www.google.com", "crawl_entire_site": false, "max_pages": 10}'
+    if req.crawl_entire_site:
+        # kiểm tra pool scraping một lần trước khi crawl, các trang sau không bị từ chối giữa chừng
+        get_pool("scraping").admit()
+        return StreamingResponse(
+            stream_crawl(str(req.url), req.max_pages),
+            media_type=SSE_MEDIA_TYPE,
+            headers=SSE_HEADERS
+        )
+    
     try:
         # init web scraper
         scraper = WebScraperTool()
         
         # scrape page
-        result: WebContentResponse = scraper.scrape_url(str(req.url))
+        result: WebContentResponse = await scraper.scrape_url(str(req.url))
         
         return result
+    except PoolSaturated:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def stream_crawl(url: str, max_pages: int):
+    crawler = SiteCrawler()
+    num_pages = 0
+    try:
+        async for page in crawler.crawl(url, max_pages=max_pages):
+            num_pages += 1
+            yield sse_event("page", page.model_dump())
+        yield sse_event("done", {"num_pages": num_pages})
+    except Exception as e:
+        yield sse_event("error", {"detail": str(e)})
+
+@app.get("/api/jobs/stats")
+def jobs_stats():
+    """
+    Số job theo trạng thái (queued, running, succeeded, failed)
+    """
+    return job_store.stats()
+
+@app.get("/api/jobs/{job_id}")
+def get_job(job_id: str) -> JobResponse:
+    """
+    Trạng thái, progress và kết quả của job chạy nền
+    """
+    # curl "http://localhost:8000/api/jobs/<job_id>"
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_response(job)
+
+@app.get("/api/jobs/{job_id}/events")
+async def stream_job(job_id: str):
+    """
+    Subscribe trạng thái job qua SSE: event "status" mỗi khi trạng thái / progress đổi, "done" khi xong
+    """
+    # curl -N "http://localhost:8000/api/jobs/<job_id>/events"
+    if job_store.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return StreamingResponse(
+        watch_job(job_id, float(os.getenv("JOB_POLL_INTERVAL", "1.0"))),
+        media_type=SSE_MEDIA_TYPE,
+        headers=SSE_HEADERS
+    )
+
+async def watch_job(job_id: str, poll_interval: float):
+    # worker chạy ở process khác, đọc lại SQLite theo chu kỳ
+    last = None
+    while True:
+        job = job_store.get(job_id)
+        if job is None:
+            yield sse_event("error", {"detail": "Job not found"})
+            return
+        state = (job.status, job.progress, job.attempts)
+        if job.finished:
+            yield sse_event("done", job_response(job).model_dump())
+            return
+        if state != last:
+            last = state
+            yield sse_event("status", job_response(job).model_dump())
+        await asyncio.sleep(poll_interval)
+
 @app.get("/health")
 def health_check():
     return {"status": "healthy"}
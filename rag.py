@@ -1,4 +1,3 @@
-from langchain_community.vectorstores import Chroma
 from langchain_community.embeddings import ollama
 from langchain_core.vectorstores.base import VectorStoreRetriever
 from langchain_core.prompts import ChatPromptTemplate
@@ -7,12 +6,25 @@ from langchain_core.output_parsers import StrOutputParser
 from langchain_core.documents import Document
 from rich import print
 
+from functions.article_index import chunk_id
+from functions.vector_store import create_vector_store
+
 def rag(chunks, collection_name):
-    vectorstore = Chroma.from_documents(
-        documents=documents,
-        collection_name=collection_name,
-        embedding=ollama.OllamaEmbeddings(model="nomic-embed-text")
+    # Chroma hoặc FAISS theo VECTOR_STORE_BACKEND
+    vectorstore = create_vector_store(
+        ollama.OllamaEmbeddings(model="nomic-embed-text"),
+        persist_dir="./db/rag",
+        collection_name=collection_name
     )
+    # ./db/rag lưu lâu dài: ID theo nội dung, chunk đã có (lần gọi trước) thì không thêm lại
+    by_id = {
+        chunk_id(chunk.metadata.get("source", chunk.metadata.get("url", "")), chunk.page_content): chunk
+        for chunk in chunks
+    }
+    stored = set(vectorstore.get(ids=list(by_id), include=())["ids"])
+    new_ids = [id_ for id_ in by_id if id_ not in stored]
+    if new_ids:
+        vectorstore.add_documents([by_id[id_] for id_ in new_ids], ids=new_ids)
     retriever: VectorStoreRetriever = vectorstore.as_retriever()
     
     prompt_template = """
@@ -1,5 +1,8 @@
 from fastapi import HTTPException
 from types_api.types_api import RunTaskRequest
+from functions.sse import EventCallback
+from functions.worker_pools import PoolSaturated, WorkerPool, get_pool
+from typing import Any, Optional
 
 # smolagents
 from smolagents import CodeAgent, HfApiModel
@@ -21,13 +24,39 @@ model_id = "Qwen/Qwen2.5-Coder-32B-Instruct"
 model = HfApiModel(model_id=model_id, token=hf_token)
 # init agent
 agent = CodeAgent(tools=[], model=model, add_base_tools=True)
+# agent.run blocking (gọi model + chạy code), chạy trên pool riêng để event loop vẫn phục vụ request khác
+agent_pool: WorkerPool = get_pool("agent")
 
 
-async def run_task_smolagents(req: RunTaskRequest):
+def run_agent_streaming(task: str, on_event: EventCallback) -> Any:
+    """
+    Chạy agent.run(stream=True) (blocking, gọi trong thread), gửi mỗi bước của agent qua on_event.
+    HfApiModel không stream token nên đơn vị stream là từng bước (suy nghĩ + code + kết quả)
+    """
+    result: Any = None
+    for step in agent.run(task, stream=True):
+        result = step
+        if hasattr(step, "step_number"):
+            on_event("step", {
+                "step": step.step_number,
+                "model_output": getattr(step, "model_output", None),
+                "observations": getattr(step, "observations", None),
+                "error": str(step.error) if getattr(step, "error", None) else None
+            })
+    # bước cuối là câu trả lời (bản mới của smolagents bọc trong FinalAnswerStep)
+    return getattr(result, "final_answer", result)
+
+
+async def run_task_smolagents(req: RunTaskRequest, on_event: Optional[EventCallback] = None):
     try:
-        result = agent.run(req.task)
+        if on_event is not None:
+            result = await agent_pool.run(run_agent_streaming, req.task, on_event)
+        else:
+            result = await agent_pool.run(agent.run, req.task)
         
         return {"result": result}
+    except PoolSaturated:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
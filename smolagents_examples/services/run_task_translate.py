@@ -1,16 +1,81 @@
 from tools.translation_tool import TranslationTool
+from tools.translation_batcher import TranslationBatcher
 from multiprocessing import freeze_support
 from types_api.types_api import TranslateRequest
+from functions.text_segmenter import TextSegment, join_segments, segment_document
+from functions.sse import SSE_HEADERS, SSE_MEDIA_TYPE, sse_event
+from fastapi.responses import StreamingResponse
+from collections import deque
+from typing import AsyncIterator, Deque, List
+import asyncio
+
+# Khởi tạo TranslationTool một lần, model được load khi cặp ngôn ngữ được dùng lần đầu
+translator_tool = TranslationTool()
+# Gom các request đồng thời thành batch trước khi chạy model
+translation_batcher = TranslationBatcher(translator_tool)
+
+async def stream_translate_document(req: TranslateRequest) -> AsyncIterator[str]:
+    """
+    Dịch văn bản dài theo từng câu, trả về từng câu ngay khi dịch xong (SSE).
+    Chỉ đẩy một cửa sổ câu vào batcher tại một thời điểm nên câu đầu tiên
+    luôn nằm trong batch đầu tiên, không phụ thuộc độ dài văn bản.
+    """
+    segments: List[TextSegment] = segment_document(req.text)
+    window = translation_batcher.max_batch_size * 2
+    # chữ Trung không dùng khoảng trắng giữa các câu
+    separator = "" if req.target_lang == "zh" else " "
+
+    yield sse_event("start", {"num_segments": len(segments)})
+
+    in_flight: Deque[asyncio.Task] = deque()
+    translations: List[str] = []
+    next_idx = 0
+    try:
+        while len(translations) < len(segments):
+            while next_idx < len(segments) and len(in_flight) < window:
+                in_flight.append(asyncio.ensure_future(translation_batcher.translate(
+                    text=segments[next_idx].text,
+                    source_lang=req.source_lang,
+                    target_lang=req.target_lang,
+                    admit=False
+                )))
+                next_idx += 1
+
+            translation: str = await in_flight.popleft()
+            segment = segments[len(translations)]
+            translations.append(translation)
+
+            yield sse_event("segment", {
+                "paragraph": segment.paragraph,
+                "index": segment.index,
+                "source": segment.text,
+                "translation": translation
+            })
+
+        yield sse_event("done", {"result": join_segments(segments, translations, separator)})
+    except Exception as e:
+        print(f"Lỗi khi dịch: {str(e)}")
+        yield sse_event("error", {"detail": str(e)})
+    finally:
+        # client ngắt kết nối thì huỷ các câu chưa dịch
+        for task in in_flight:
+            task.cancel()
 
 async def run_task_translate(req: TranslateRequest):
     freeze_support()  # Cần thiết cho multiprocessing
-    
-    # 1. Khởi tạo TranslationTool
-    translator_tool = TranslationTool()
 
-    # 2. Sử dụng tool trực tiếp
+    if req.long_text:
+        # kiểm tra hàng đợi một lần trước khi stream, các câu sau không bị từ chối giữa chừng
+        translation_batcher.admit()
+        return StreamingResponse(
+            stream_translate_document(req),
+            media_type=SSE_MEDIA_TYPE,
+            headers=SSE_HEADERS
+        )
+
+    # Dịch qua batcher, request được gom chung batch với các request đồng thời khác
     try:
-        result = translator_tool(
+        result = await translation_batcher.translate(
             text=req.text,
             source_lang=req.source_lang,
             target_lang=req.target_lang
@@ -26,4 +91,4 @@ async def run_task_translate(req: TranslateRequest):
         raise e
     
 # export
-__all__: list[str] = ["run_task_translate"]    
\ No newline at end of file
+__all__: list[str] = ["run_task_translate"]
@@ -0,0 +1,30 @@
+import pytest
+
+pytest.importorskip("faiss")
+
+from functions.article_index import ArticleIndex
+from tests.test_vector_store import KeywordEmbeddings
+
+
+def make_index(directory: str, monkeypatch) -> ArticleIndex:
+    monkeypatch.setenv("VECTOR_STORE_BACKEND", "faiss")
+    return ArticleIndex(embeddings=KeywordEmbeddings(), persist_dir=directory)
+
+
+def test_lexical_search_sees_chunks_written_by_another_process(tmp_path, monkeypatch):
+    # server và job worker mở cùng ./db/articles
+    server = make_index(str(tmp_path), monkeypatch)
+    worker = make_index(str(tmp_path), monkeypatch)
+    server.upsert_chunks("https://a", "q", ["1 giá vàng hôm nay"], ["1 giá vàng hôm nay"])
+    assert [doc.page_content for doc, _ in server.lexical_search("vàng")] == ["1 giá vàng hôm nay"]
+
+    worker.upsert_chunks("https://b", "q", ["2 lãi suất ngân hàng"], ["2 lãi suất ngân hàng"])
+    assert [doc.page_content for doc, _ in server.lexical_search("lãi suất")] == ["2 lãi suất ngân hàng"]
+    hybrid = [doc.page_content for doc, _ in server.retrieve("2 ngân hàng", k=1)]
+    assert hybrid == ["2 lãi suất ngân hàng"]
+
+    # lần xử lý mới của cùng (url, query) thay chunk cũ, gc ở worker xoá chunk cũ
+    worker.upsert_chunks("https://a", "q", ["3 giá xăng hôm nay"], ["3 giá xăng hôm nay"])
+    worker.gc()
+    assert server.lexical_search("vàng") == []
+    assert [doc.page_content for doc, _ in server.lexical_search("xăng")] == ["3 giá xăng hôm nay"]
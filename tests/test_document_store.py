@@ -0,0 +1,58 @@
+from functions.document_store import DocumentStore, IndexSnapshot
+
+
+def make_store(n: int = 200, **kwargs) -> DocumentStore:
+    store = DocumentStore(**kwargs)
+    for i in range(n):
+        store.add(f"bài viết số {i} về thị trường chứng khoán", id=str(i))
+    store.build()
+    return store
+
+
+def test_updates_go_to_delta_without_rebuilding_main(monkeypatch):
+    store = make_store(delta_max_docs=1000, delta_max_ratio=1.0)
+    builds = []
+    original_build = IndexSnapshot.build
+    monkeypatch.setattr(IndexSnapshot, "build", lambda snapshot: builds.append(snapshot) or original_build(snapshot))
+    store.add("Việc làm cho kỹ sư phần mềm", id="new")
+    store.add("bài viết số 5 đã sửa, nói về lãi suất", id="5")
+    store.remove(["7"])
+
+    assert store.search("viec lam", k=1)[0][0].id == "new"
+    assert store.search("lãi suất", k=1)[0][0].id == "5"
+    found = {doc.id for doc, _ in store.search("chứng khoán", k=300)}
+    assert "7" not in found and "5" not in found and "0" in found
+    # search không build lại index chính, chỉ delta thay đổi
+    assert builds == []
+    assert not store.needs_compaction()
+
+    # cùng tài liệu khớp như kho build lại từ đầu (điểm lệch chút vì delta có avgdl riêng)
+    rebuilt = DocumentStore()
+    rebuilt.add_many(store.documents)
+    rebuilt.build()
+    for query in ("viec lam", "lãi suất", "chứng khoán"):
+        assert {doc.id for doc, _ in store.search(query, k=300)} == {doc.id for doc, _ in rebuilt.search(query, k=300)}
+
+
+def test_install_keeps_changes_made_during_compaction():
+    store = make_store(auto_compact=False)
+    store.add("tin nhanh về bóng đá", id="early")
+    snapshot = store.compaction()
+    # thay đổi trong lúc snapshot đang build (ngoài lock của caller)
+    store.add("tin muộn về quần vợt", id="late")
+    store.remove(["early", "3"])
+    store.install(snapshot.build())
+
+    assert store.search("quần vợt", k=1)[0][0].id == "late"
+    assert store.search("bóng đá", k=5) == []
+    assert "3" not in {doc.id for doc, _ in store.search("chứng khoán", k=300)}
+    assert len(store) == 200
+
+
+def test_search_matches_full_score_with_delta():
+    store = make_store(delta_max_docs=1000, delta_max_ratio=1.0)
+    for i in range(20):
+        store.add(f"chứng khoán tăng điểm phiên {i}", id=f"delta/{i}")
+    scores = store.score("chứng khoán tăng")
+    expected = sorted(scores[scores > 0], reverse=True)[:10]
+    assert [round(score, 4) for _, score in store.search("chứng khoán tăng", k=10)] == [round(float(s), 4) for s in expected]
@@ -0,0 +1,72 @@
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from langchain_core.embeddings import Embeddings
+
+from functions.embedding_cache import CachedEmbeddings, EmbeddingCache
+
+
+class FixedEmbeddings(Embeddings):
+    def embed_documents(self, texts):
+        return [[float(len(text)), 1.0, -2.0] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+@pytest.mark.parametrize("dtype", ["int8", "float16", "float32"])
+def test_empty_input_returns_empty_vectors(tmp_path, dtype):
+    cache = EmbeddingCache("test-model", cache_dir=str(tmp_path), capacity=8, dtype=dtype)
+    embeddings = CachedEmbeddings("test-model", FixedEmbeddings, cache=cache)
+
+    empty = embeddings.embed_documents_quantized([])
+    assert len(empty) == 0
+    assert empty.dtype == dtype
+    assert (empty.scales is not None) == (dtype == "int8")
+
+    # cache đã có vector rồi cũng vậy
+    embeddings.embed_documents_quantized(["một", "hai"])
+    assert len(embeddings.embed_documents_quantized([])) == 0
+    assert embeddings.embed_documents_array([]).shape == (0, 0)
+    assert np.allclose(embeddings.embed_documents_array(["một"]), [[3.0, 1.0, -2.0]], atol=0.05)
+
+
+@pytest.mark.parametrize("dtype", ["int8", "float32"])
+def test_instances_opened_before_file_exists_share_it(tmp_path, dtype):
+    # như server và job worker khởi động khi cache còn trống
+    first = EmbeddingCache("test-model", cache_dir=str(tmp_path), capacity=8, dtype=dtype)
+    second = EmbeddingCache("test-model", cache_dir=str(tmp_path), capacity=8, dtype=dtype)
+    first.put_many({"k1": [1.0, 2.0, 3.0]})
+    second.put_many({"k2": [4.0, 5.0, 6.0]})
+
+    reader = EmbeddingCache("test-model", cache_dir=str(tmp_path), dtype=dtype)
+    vectors = reader.get_many(["k1", "k2"])
+    assert np.allclose(vectors["k1"], [1.0, 2.0, 3.0], atol=0.05)
+    assert np.allclose(vectors["k2"], [4.0, 5.0, 6.0], atol=0.05)
+    assert np.allclose(first.get_many(["k2"])["k2"], [4.0, 5.0, 6.0], atol=0.05)
+
+
+def write_keys(directory: str, worker: int) -> None:
+    cache = EmbeddingCache("test-model", cache_dir=directory, capacity=1000, dtype="float32")
+    for i in range(50):
+        cache.put_many({f"{worker}/{i}": [float(worker), float(i)]})
+
+
+def test_processes_get_distinct_slots(tmp_path):
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=write_keys, args=(str(tmp_path), worker)) for worker in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    cache = EmbeddingCache("test-model", cache_dir=str(tmp_path))
+    keys = [f"{worker}/{i}" for worker in range(4) for i in range(50)]
+    vectors = cache.get_many(keys)
+    assert len(vectors) == len(keys)
+    for key in keys:
+        worker, i = key.split("/")
+        assert vectors[key].tolist() == [float(worker), float(i)]
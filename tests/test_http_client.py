@@ -0,0 +1,34 @@
+import asyncio
+import threading
+
+from functions.http_client import HttpClient
+
+
+def test_one_session_per_loop_and_close_all():
+    client = HttpClient()
+    # loop nền như của news_search
+    background = asyncio.new_event_loop()
+    threading.Thread(target=background.run_forever, daemon=True).start()
+
+    async def get_session():
+        return client._get_session()
+
+    def on_background():
+        return asyncio.run_coroutine_threadsafe(get_session(), background).result()
+
+    async def scenario():
+        main_session = client._get_session()
+        background_session = on_background()
+        # gọi xen kẽ giữa hai loop không tạo session mới
+        assert client._get_session() is main_session
+        assert on_background() is background_session
+        assert main_session is not background_session
+
+        await client.close()
+        assert main_session.closed
+        assert background_session.closed
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        background.call_soon_threadsafe(background.stop)
@@ -0,0 +1,89 @@
+import multiprocessing
+import os
+
+import pytest
+
+from langchain_core.embeddings import Embeddings
+
+pytest.importorskip("faiss")
+
+from functions.vector_store import FaissVectorStore
+
+
+class KeywordEmbeddings(Embeddings):
+    """Mỗi text là vector one-hot theo số đầu tiên trong text (mod 16)"""
+
+    def embed_documents(self, texts):
+        vectors = []
+        for text in texts:
+            vector = [0.0] * 16
+            vector[int(text.split()[0]) % 16] = 1.0
+            vectors.append(vector)
+        return vectors
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def matching_ids(store, query):
+    return {doc.id for doc, distance in store.similarity_search_with_score(query, k=30) if distance < 0.5}
+
+
+def test_instances_sharing_directory_get_distinct_rows(tmp_path):
+    # như server và job worker cùng mở ./db
+    first = FaissVectorStore(KeywordEmbeddings(), str(tmp_path))
+    second = FaissVectorStore(KeywordEmbeddings(), str(tmp_path))
+    first.add_texts(["1 một"], ids=["a"])
+    second.add_texts(["2 hai"], ids=["b"])
+    first.add_texts(["3 ba"], ids=["c"])
+
+    for store in (first, second):
+        assert store.count() == 3
+        for query, id_ in (("1", "a"), ("2", "b"), ("3", "c")):
+            assert store.similarity_search_with_score(query, k=1)[0][0].id == id_
+
+
+def write_texts(directory: str, worker: int) -> None:
+    store = FaissVectorStore(KeywordEmbeddings(), directory)
+    for i in range(20):
+        store.add_texts([f"{worker} worker {worker} text {i}"], ids=[f"{worker}/{i}"])
+
+
+def test_processes_write_concurrently(tmp_path):
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=write_texts, args=(str(tmp_path), worker)) for worker in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    store = FaissVectorStore(KeywordEmbeddings(), str(tmp_path))
+    assert store.count() == 80
+    for worker in range(4):
+        assert matching_ids(store, str(worker)) == {f"{worker}/{i}" for i in range(20)}
+        assert all(doc.page_content.startswith(f"{worker} ") for doc, _ in store.similarity_search_with_score(str(worker), k=20))
+
+
+def test_compact_rewrites_live_vectors(tmp_path):
+    store = FaissVectorStore(KeywordEmbeddings(), str(tmp_path))
+    other = FaissVectorStore(KeywordEmbeddings(), str(tmp_path))
+    store.add_texts([f"{i} text" for i in range(100)], ids=[str(i) for i in range(100)])
+    store.delete(ids=[str(i) for i in range(50)])
+    store.add_texts(["7 sửa"], ids=["99"])
+
+    store.compact()
+    # file mới chỉ gồm 50 vector còn dùng; file cũ giữ tới lần compact sau cho process đang đọc dở
+    assert os.path.getsize(tmp_path / "vectors.1.f32") == 50 * 16 * 4
+    assert store.count() == 50
+
+    # process / instance khác thấy generation mới và vẫn ghi tiếp được
+    other.add_texts(["3 mới"], ids=["new"])
+    for instance in (store, other):
+        assert matching_ids(instance, "3") == {"51", "67", "83", "new"}
+        assert matching_ids(instance, "7") == {"55", "71", "87", "99"}
+        assert instance.get(ids=["99"])["documents"] == ["7 sửa"]
+    other.compact()
+    assert not os.path.exists(tmp_path / "vectors.f32")
+    store.add_texts(["5 sau"], ids=["after"])
+    assert matching_ids(other, "5") == {"after", "53", "69", "85"}
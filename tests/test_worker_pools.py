@@ -0,0 +1,33 @@
+import asyncio
+import threading
+
+from functions.worker_pools import WorkerPool
+
+
+def test_cancelled_waiting_job_releases_queue_slot():
+    pool = WorkerPool("test", max_workers=1, max_queue=1)
+    release = threading.Event()
+    ran = []
+
+    async def scenario():
+        # giữ worker duy nhất bận để việc thứ hai phải chờ trong executor
+        busy = asyncio.create_task(pool.run(release.wait))
+        await asyncio.sleep(0.05)
+        waiting = asyncio.create_task(pool.run(ran.append, "waiting", admit=False))
+        await asyncio.sleep(0.05)
+        assert pool.stats()["queued"] == 1
+
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        release.set()
+        await busy
+
+    asyncio.run(scenario())
+    pool.executor.shutdown(wait=True)
+
+    stats = pool.stats()
+    assert stats["queued"] == 0
+    assert stats["in_flight"] == 0
+    assert ran == []
+    # hàng đợi trống lại: request mới không bị từ chối
+    pool.admit()
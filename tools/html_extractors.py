@@ -0,0 +1,150 @@
+# Các backend trích xuất title / nội dung chính / link từ HTML
+from bs4 import BeautifulSoup
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from urllib.parse import urljoin
+import os
+
+try:
+    # parser viết bằng C, nhanh hơn nhiều so với html.parser thuần Python
+    import lxml.etree
+    import lxml.html
+except ImportError:
+    lxml = None
+
+# Thường content sẽ nằm trong các thẻ article, main, div với class specific (thứ tự = độ ưu tiên)
+CONTENT_TAGS = ["article", "main"]
+CONTENT_DIV_CLASSES = ["content", "article", "post"]
+SKIPPED_TAGS = {"script", "style"}
+
+
+@dataclass
+class ExtractedPage:
+    title: str
+    content: str
+    links: List[str] = field(default_factory=list)
+
+
+class HtmlExtractor:
+    name = "base"
+
+    def extract(self, html: str, base_url: str) -> ExtractedPage:
+        raise NotImplementedError
+
+
+class BeautifulSoupExtractor(HtmlExtractor):
+    """Cách cũ: BeautifulSoup + html.parser, mỗi selector một lần select_one"""
+    name = "bs4"
+
+    def extract(self, html: str, base_url: str) -> ExtractedPage:
+        soup = BeautifulSoup(html, 'html.parser')
+
+        # Lấy link trước khi cắt nội dung chính
+        links: List[str] = [urljoin(base_url, a['href']) for a in soup.find_all('a', href=True)]
+
+        # Get title
+        title = soup.title.string if soup.title else ""
+
+        # Get main content (customize selectors based on website structure)
+        content = ""
+        content_selectors = CONTENT_TAGS + [f'div[class*="{c}"]' for c in CONTENT_DIV_CLASSES]
+
+        main_content = None
+        for selector in content_selectors:
+            main_content = soup.select_one(selector)
+            if main_content:
+                break
+        if main_content:
+            # Loại bỏ script, style tags
+            for tag in main_content(list(SKIPPED_TAGS)):
+                tag.decompose()
+            content = main_content.get_text(separator='\n', strip=True)
+
+        return ExtractedPage(title=title or "", content=content, links=links)
+
+
+class LxmlExtractor(HtmlExtractor):
+    """
+    lxml (C parser), duyệt cây một lần để lấy title, link và ứng viên nội dung chính
+    theo cùng thứ tự ưu tiên với BeautifulSoupExtractor, rồi lấy text bỏ qua script/style.
+    """
+    name = "lxml"
+
+    def extract(self, html: str, base_url: str) -> ExtractedPage:
+        try:
+            root = lxml.html.document_fromstring(html)
+        except ValueError:
+            # string có khai báo encoding (<?xml ... encoding=...?>) phải parse dạng bytes
+            root = lxml.html.document_fromstring(html.encode("utf-8"))
+        except lxml.etree.ParserError:
+            # document rỗng
+            return ExtractedPage(title="", content="")
+
+        title: Optional[str] = None
+        links: List[str] = []
+        candidates: Dict[str, lxml.html.HtmlElement] = {}
+
+        for el in root.iter():
+            tag = el.tag
+            if not isinstance(tag, str):
+                continue  # comment, processing instruction
+            if tag == "title" and title is None:
+                title = el.text or ""
+            elif tag == "a":
+                href = el.get("href")
+                if href is not None:
+                    links.append(urljoin(base_url, href))
+            elif tag in CONTENT_TAGS:
+                candidates.setdefault(tag, el)
+            elif tag == "div":
+                classes = el.get("class", "")
+                for c in CONTENT_DIV_CLASSES:
+                    if c in classes:
+                        candidates.setdefault(c, el)
+
+        content = ""
+        for key in CONTENT_TAGS + CONTENT_DIV_CLASSES:
+            if key in candidates:
+                content = self._text(candidates[key])
+                break
+
+        return ExtractedPage(title=title or "", content=content, links=links)
+
+    @staticmethod
+    def _text(element) -> str:
+        """Tương đương get_text(separator='\\n', strip=True) của BeautifulSoup, bỏ qua script/style"""
+        parts: List[str] = []
+
+        def walk(el) -> None:
+            tag = el.tag
+            if not isinstance(tag, str) or tag in SKIPPED_TAGS:
+                return  # comment hoặc script/style: bỏ cả nội dung, phần tail do cha xử lý
+            if el.text:
+                parts.append(el.text)
+            for child in el:
+                walk(child)
+                if child.tail:
+                    parts.append(child.tail)
+
+        walk(element)
+        return "\n".join(p.strip() for p in parts if p.strip())
+
+
+EXTRACTORS = {
+    BeautifulSoupExtractor.name: BeautifulSoupExtractor,
+    LxmlExtractor.name: LxmlExtractor
+}
+
+
+def get_extractor(name: Optional[str] = None) -> HtmlExtractor:
+    """Chọn backend theo tên hoặc HTML_EXTRACTOR, mặc định lxml nếu đã cài"""
+    name = name or os.getenv("HTML_EXTRACTOR") or ("lxml" if lxml is not None else "bs4")
+    if name not in EXTRACTORS:
+        raise ValueError(f"Unknown HTML extractor '{name}', available: {', '.join(EXTRACTORS)}")
+    if name == LxmlExtractor.name and lxml is None:
+        raise ValueError("HTML extractor 'lxml' requires the lxml package")
+    return EXTRACTORS[name]()
+
+
+__all__ = ["HtmlExtractor", "BeautifulSoupExtractor", "LxmlExtractor", "ExtractedPage", "get_extractor"]
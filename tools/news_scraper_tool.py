@@ -1,8 +1,8 @@
 from smolagents import Tool
 from typing import List, Dict
 
-# Duckduckgo search
-from duckduckgo_search import DDGS
+# tìm kiếm qua lớp search dùng chung (cache + gộp request trùng), provider DuckDuckGo
+from functions.news_search import NewsSearch, news_search
 
 class NewsScraperTool(Tool):
     name = "news_scraper"
@@ -25,17 +25,19 @@ class NewsScraperTool(Tool):
     }
     output_type = "list"
 
-    def __init__(self):
+    def __init__(self, search: NewsSearch = news_search, provider: str = "duckduckgo"):
         super().__init__()
-        self.ddgs = DDGS()
+        self.search = search
+        self.provider = provider
 
     def forward(self, query: str, max_results: int = 5, time_period: str = "day") -> List[Dict]:
         try:
-            # Search news using DuckDuckGo
-            news_results = self.ddgs.news(
+            # Search news using DuckDuckGo (tool chạy đồng bộ trong thread của agent)
+            news_results, _ = self.search.search_sync(
                 query,
+                time_period=time_period,
                 max_results=max_results,
-                timelimit=time_period
+                provider=self.provider
             )
 
             formatted_results = []
@@ -44,7 +46,7 @@ class NewsScraperTool(Tool):
                     "title": article.get("title"),
                     "link": article.get("link"),
                     "date": article.get("date"),
-                    "excerpt": article.get("excerpt"),
+                    "excerpt": article.get("snippet"),
                     "source": article.get("source")
                 })
 
@@ -0,0 +1,175 @@
+# Crawl cả website: BFS trên các link cùng site, nhiều request song song, tôn trọng robots.txt
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+from urllib.robotparser import RobotFileParser
+import asyncio
+import os
+import time
+
+from functions.http_client import FetchError, HttpClient, http_client
+from tools.web_scraper_tool import WebScraperTool
+from types_api.types_api import WebContentResponse
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+# link tới file không phải trang HTML thì không crawl
+SKIPPED_EXTENSIONS = (
+    ".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp", ".ico", ".pdf", ".zip", ".gz",
+    ".mp3", ".mp4", ".avi", ".mov", ".css", ".js", ".xml", ".json", ".woff", ".woff2"
+)
+
+
+def normalize_url(url: str, base: Optional[str] = None) -> Optional[str]:
+    """
+    Chuẩn hoá url để dedupe: bỏ fragment, host viết thường, bỏ port mặc định,
+    sắp xếp query params. Trả về None nếu không phải http(s).
+    """
+    if base:
+        url = urljoin(base, url)
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS or not parts.hostname:
+        return None
+
+    host = parts.hostname.lower()
+    if parts.port and parts.port != DEFAULT_PORTS[scheme]:
+        host = f"{host}:{parts.port}"
+    path = parts.path or "/"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+def site_of(url: str) -> str:
+    """Host không tính tiền tố www., www.example.com và example.com là cùng site"""
+    host = (urlsplit(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+class SiteCrawler:
+    """
+    Crawl BFS các trang cùng site với url bắt đầu:
+    - tối đa `concurrency` request cùng lúc, các request tới cùng host cách nhau ít nhất `politeness_delay`
+    - bỏ qua url bị robots.txt chặn, dùng Crawl-delay nếu lớn hơn politeness_delay
+    - trả về từng trang ngay khi xong, dừng đúng ở max_pages trang
+    """
+
+    def __init__(
+        self,
+        scraper: Optional[WebScraperTool] = None,
+        client: Optional[HttpClient] = None,
+        concurrency: Optional[int] = None,
+        politeness_delay: Optional[float] = None,
+        respect_robots: bool = True
+    ):
+        self.client: HttpClient = client or http_client
+        self.scraper = scraper or WebScraperTool(client=self.client)
+        self.concurrency = concurrency or int(os.getenv("CRAWL_CONCURRENCY", "5"))
+        self.politeness_delay = politeness_delay if politeness_delay is not None else float(os.getenv("CRAWL_POLITENESS_DELAY", "0.1"))
+        self.respect_robots = respect_robots
+
+        self._robots: Dict[str, Optional[RobotFileParser]] = {}
+        self._next_slot: Dict[str, float] = {}
+
+    async def _get_robots(self, url: str) -> Optional[RobotFileParser]:
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        if origin not in self._robots:
+            parser: Optional[RobotFileParser] = None
+            try:
+                response = await self.client.fetch(f"{origin}/robots.txt", allowed_statuses={401, 403, 404, 410})
+                if response.status < 400:
+                    parser = RobotFileParser()
+                    parser.parse(response.text.splitlines())
+            except FetchError as e:
+                # không lấy được robots.txt thì coi như không giới hạn
+                print(f"Could not fetch robots.txt for {origin}: {str(e)}")
+            self._robots[origin] = parser
+        return self._robots[origin]
+
+    async def _allowed(self, url: str) -> bool:
+        if not self.respect_robots:
+            return True
+        robots = await self._get_robots(url)
+        return robots is None or robots.can_fetch(self.scraper.headers["User-Agent"], url)
+
+    async def _wait_turn(self, url: str) -> None:
+        """Giãn cách thời điểm bắt đầu các request tới cùng một host"""
+        host = urlsplit(url).netloc
+        delay = self.politeness_delay
+        robots = self._robots.get(f"{urlsplit(url).scheme}://{host}")
+        if robots is not None:
+            crawl_delay = robots.crawl_delay(self.scraper.headers["User-Agent"])
+            if crawl_delay:
+                delay = max(delay, float(crawl_delay))
+
+        now = time.monotonic()
+        slot = max(now, self._next_slot.get(host, now))
+        self._next_slot[host] = slot + delay
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def _fetch(self, url: str, depth: int) -> Optional[Tuple[WebContentResponse, List[str], int]]:
+        await self._wait_turn(url)
+        try:
+            # lần crawl đã được nhận vào pool scraping khi bắt đầu, các trang không bị từ chối giữa chừng
+            content, links = await self.scraper.scrape_page(url, admit=False)
+            return content, links, depth
+        except Exception as e:
+            # trang lỗi không làm dừng cả lần crawl
+            print(f"Crawl failed for {url}: {str(e)}")
+            return None
+
+    async def crawl(self, start_url: str, max_pages: int) -> AsyncIterator[WebContentResponse]:
+        start = normalize_url(start_url)
+        if start is None:
+            raise ValueError(f"Invalid url: {start_url}")
+        site = site_of(start)
+
+        frontier: Deque[Tuple[str, int]] = deque([(start, 0)])
+        seen: Set[str] = {start}
+        in_flight: Set[asyncio.Task] = set()
+        yielded = 0
+
+        try:
+            while (frontier or in_flight) and yielded < max_pages:
+                # chỉ mở thêm request khi số trang đã có + đang tải còn dưới max_pages
+                while frontier and len(in_flight) < self.concurrency and yielded + len(in_flight) < max_pages:
+                    url, depth = frontier.popleft()
+                    if not await self._allowed(url):
+                        print(f"Skipping {url}: disallowed by robots.txt")
+                        continue
+                    in_flight.add(asyncio.create_task(self._fetch(url, depth)))
+
+                if not in_flight:
+                    break
+
+                done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    page = task.result()
+                    if page is None or yielded >= max_pages:
+                        continue
+                    content, links, depth = page
+                    if content.metadata is not None:
+                        content.metadata["depth"] = depth
+                    yielded += 1
+                    yield content
+
+                    for link in links:
+                        normalized = normalize_url(link)
+                        if (
+                            normalized is None
+                            or normalized in seen
+                            or site_of(normalized) != site
+                            or urlsplit(normalized).path.lower().endswith(SKIPPED_EXTENSIONS)
+                        ):
+                            continue
+                        seen.add(normalized)
+                        frontier.append((normalized, depth + 1))
+        finally:
+            # client ngắt kết nối hoặc đủ max_pages thì huỷ các request còn lại
+            for task in in_flight:
+                task.cancel()
+
+
+__all__ = ["SiteCrawler", "normalize_url"]
@@ -0,0 +1,131 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import os
+
+from tools.translation_tool import TranslationTool
+from functions.worker_pools import WorkerPool, get_pool
+
+
+@dataclass
+class PendingTranslation:
+    text: str
+    source_lang: str
+    target_lang: str
+    future: asyncio.Future
+
+
+def estimate_tokens(text: str) -> int:
+    """Ước lượng số token mà không cần tokenizer (Marian SentencePiece ~ 4 ký tự / token)"""
+    return max(1, len(text) // 4)
+
+
+def length_bucket(text: str) -> int:
+    """Gom các câu có độ dài cùng bậc luỹ thừa 2 vào một nhóm để giảm padding"""
+    return estimate_tokens(text).bit_length()
+
+
+class TranslationBatcher:
+    """
+    Gom các request dịch tới trong một khoảng thời gian ngắn thành batch:
+    - Nhóm theo cặp ngôn ngữ và độ dài token gần nhau
+    - Mỗi nhóm chạy một lần generate
+    - Trả kết quả riêng về cho từng caller
+    """
+
+    def __init__(
+        self,
+        tool: TranslationTool,
+        max_batch_size: Optional[int] = None,
+        max_wait_ms: Optional[float] = None,
+        pool: Optional[WorkerPool] = None
+    ):
+        self.tool = tool
+        self.max_batch_size = max_batch_size or int(os.getenv("TRANSLATION_MAX_BATCH_SIZE", "16"))
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else float(os.getenv("TRANSLATION_MAX_WAIT_MS", "10"))) / 1000
+        # model inference chạy ngoài event loop, trên pool "translation"
+        self.pool: WorkerPool = pool or get_pool("translation")
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    def _ensure_worker(self) -> asyncio.Queue:
+        # queue và worker được tạo trong event loop đang chạy (của uvicorn)
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+        return self._queue
+
+    @property
+    def backlog(self) -> int:
+        """Số câu đang chờ gom batch"""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def admit(self) -> None:
+        """Raise PoolSaturated nếu số câu đang chờ đã chạm giới hạn hàng đợi của pool"""
+        self.pool.admit(waiting=self.backlog)
+
+    async def translate(self, text: str, source_lang: str, target_lang: str, admit: bool = True) -> str:
+        """admit=False: caller đã gọi admit() trước (vd: văn bản dài gửi nhiều câu)"""
+        if admit:
+            self.admit()
+        queue = self._ensure_worker()
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        await queue.put(PendingTranslation(text, source_lang, target_lang, future))
+        return await future
+
+    async def _collect(self) -> List[PendingTranslation]:
+        """Lấy request đầu tiên rồi chờ thêm tối đa max_wait hoặc tới khi đủ batch"""
+        assert self._queue is not None
+        loop = asyncio.get_running_loop()
+        pending: List[PendingTranslation] = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+
+        while len(pending) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                pending.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        return pending
+
+    @staticmethod
+    def _group(pending: List[PendingTranslation]) -> List[List[PendingTranslation]]:
+        groups: Dict[Tuple[str, str, int], List[PendingTranslation]] = {}
+        for item in pending:
+            key = (item.source_lang, item.target_lang, length_bucket(item.text))
+            groups.setdefault(key, []).append(item)
+        return list(groups.values())
+
+    async def _run_group(self, group: List[PendingTranslation]) -> None:
+        texts = [item.text for item in group]
+        try:
+            # batch đã được nhận lúc vào hàng đợi của batcher
+            results: List[str] = await self.pool.run(
+                self.tool.translate_batch,
+                texts,
+                group[0].source_lang,
+                group[0].target_lang,
+                admit=False
+            )
+            for item, result in zip(group, results):
+                # caller có thể đã huỷ request
+                if not item.future.done():
+                    item.future.set_result(result)
+        except Exception as e:
+            error = Exception(f"Translation failed: {str(e)}")
+            for item in group:
+                if not item.future.done():
+                    item.future.set_exception(error)
+
+    async def _run(self) -> None:
+        while True:
+            pending = await self._collect()
+            for group in self._group(pending):
+                await self._run_group(group)
+
+
+__all__ = ["TranslationBatcher"]
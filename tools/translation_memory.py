@@ -0,0 +1,195 @@
+# Translation memory: lưu bản dịch theo từng câu để không phải chạy lại model cho câu đã dịch
+from typing import Dict, List, Optional, Sequence, Tuple
+import argparse
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS translations (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    source_lang TEXT NOT NULL,
+    target_lang TEXT NOT NULL,
+    source_text TEXT NOT NULL,
+    translation TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_translations_last_access ON translations (last_access);
+"""
+
+
+def normalize_segment(text: str) -> str:
+    """Chuẩn hoá unicode (NFC) và khoảng trắng, giữ nguyên hoa/thường vì ảnh hưởng bản dịch"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def memory_key(model: str, source_lang: str, target_lang: str, text: str) -> str:
+    raw = "\x1f".join([model, source_lang, target_lang, normalize_segment(text)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class TranslationMemory:
+    """
+    Cache bản dịch lưu trong SQLite, key = (model, source_lang, target_lang, câu đã chuẩn hoá).
+    - TTL: bản dịch cũ hơn ttl bị bỏ qua và xoá
+    - LRU: vượt max_entries thì xoá các câu lâu không được dùng nhất
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttl_seconds: Optional[float] = None,
+        max_entries: Optional[int] = None
+    ):
+        self.path = path or os.getenv("TRANSLATION_MEMORY_PATH", "./db/translation_memory.sqlite3")
+        if ttl_seconds is None:
+            ttl_seconds = float(os.getenv("TRANSLATION_MEMORY_TTL_DAYS", "30")) * 24 * 3600
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries or int(os.getenv("TRANSLATION_MEMORY_MAX_ENTRIES", "100000"))
+
+        self.hits = 0
+        self.misses = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        # mở kết nối lần đầu dùng, tránh tạo file db lúc import
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def get_many(self, model: str, source_lang: str, target_lang: str, texts: Sequence[str]) -> List[Optional[str]]:
+        """Trả về bản dịch đã lưu theo đúng thứ tự texts, None nếu chưa có"""
+        keys = [memory_key(model, source_lang, target_lang, text) for text in texts]
+        now = time.time()
+
+        with self._lock:
+            conn = self._connection()
+            found: Dict[str, str] = {}
+            unique_keys = list(set(keys))
+            # SQLite giới hạn số tham số mỗi câu lệnh, chia nhỏ
+            for start in range(0, len(unique_keys), 500):
+                batch = unique_keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT key, translation FROM translations WHERE key IN ({placeholders}) AND created_at >= ?",
+                    (*batch, now - self.ttl_seconds)
+                ).fetchall()
+                found.update(rows)
+
+            if found:
+                conn.executemany(
+                    "UPDATE translations SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                conn.commit()
+
+            results = [found.get(key) for key in keys]
+            hits = sum(1 for r in results if r is not None)
+            self.hits += hits
+            self.misses += len(results) - hits
+            return results
+
+    def put_many(self, model: str, source_lang: str, target_lang: str, pairs: Sequence[Tuple[str, str]]) -> None:
+        """Lưu các cặp (câu gốc, bản dịch)"""
+        if not pairs:
+            return
+        now = time.time()
+        rows = [
+            (memory_key(model, source_lang, target_lang, source), model, source_lang, target_lang,
+             normalize_segment(source), translation, now, now)
+            for source, translation in pairs
+        ]
+        with self._lock:
+            conn = self._connection()
+            conn.executemany(
+                "INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._evict(conn, now)
+            conn.commit()
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute("DELETE FROM translations WHERE created_at < ?", (now - self.ttl_seconds,))
+        count: int = conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+        if count > self.max_entries:
+            conn.execute(
+                "DELETE FROM translations WHERE key IN "
+                "(SELECT key FROM translations ORDER BY last_access ASC LIMIT ?)",
+                (count - self.max_entries,)
+            )
+
+    def import_tsv(self, path: str, model: str, source_lang: str, target_lang: str, batch_size: int = 1000) -> int:
+        """
+        Pre-warm từ file TSV, mỗi dòng: <câu gốc>\\t<bản dịch>.
+        Trả về số dòng đã import.
+        """
+        imported = 0
+        batch: List[Tuple[str, str]] = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                parts = line.rstrip("\n").split("\t")
+                if len(parts) < 2 or not parts[0].strip() or not parts[1].strip():
+                    continue
+                batch.append((parts[0], parts[1].strip()))
+                if len(batch) >= batch_size:
+                    self.put_many(model, source_lang, target_lang, batch)
+                    imported += len(batch)
+                    batch = []
+        if batch:
+            self.put_many(model, source_lang, target_lang, batch)
+            imported += len(batch)
+        return imported
+
+    def stats(self) -> Dict:
+        with self._lock:
+            entries: int = self._connection().execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+            total = self.hits + self.misses
+            return {
+                "entries": entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0
+            }
+
+
+# translation memory dùng chung cho cả process
+translation_memory = TranslationMemory()
+
+__all__ = ["TranslationMemory", "translation_memory"]
+
+
+def main() -> None:
+    # python -m tools.translation_memory import phrases.tsv --source en --target vi
+    parser = argparse.ArgumentParser(description="Quản lý translation memory")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import", help="Import bản dịch từ file TSV")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--source", required=True)
+    import_parser.add_argument("--target", required=True)
+    import_parser.add_argument("--model", help="Mặc định là model dịch trực tiếp Helsinki-NLP/opus-mt-<source>-<target>")
+
+    subparsers.add_parser("stats", help="Thống kê translation memory")
+
+    args = parser.parse_args()
+    if args.command == "import":
+        model = args.model or f"Helsinki-NLP/opus-mt-{args.source}-{args.target}"
+        count = translation_memory.import_tsv(args.path, model, args.source, args.target)
+        print(f"Imported {count} segments into {translation_memory.path}")
+    else:
+        print(translation_memory.stats())
+
+
+if __name__ == "__main__":
+    main()
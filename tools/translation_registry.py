@@ -0,0 +1,209 @@
+from huggingface_hub.utils import RepositoryNotFoundError
+from transformers import MarianMTModel, MarianTokenizer
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+import math
+import os
+import threading
+import time
+
+# Các ngôn ngữ mà TranslationTool quảng cáo là hỗ trợ
+SUPPORTED_LANGS: List[str] = ["en", "vi", "fr", "de", "es", "zh"]
+
+# Ngôn ngữ trung gian khi không có model dịch trực tiếp (vd: vi -> de đi qua vi -> en -> de)
+PIVOT_LANG = "en"
+
+MODEL_PREFIX = "Helsinki-NLP/opus-mt"
+
+
+@dataclass
+class LoadedTranslationModel:
+    name: str
+    tokenizer: MarianTokenizer
+    model: MarianMTModel
+    size_bytes: int
+
+
+def is_missing_repo(error: BaseException) -> bool:
+    """from_pretrained bọc lỗi của hub trong OSError: tìm RepositoryNotFoundError trong chuỗi nguyên nhân"""
+    seen = set()
+    current: Optional[BaseException] = error
+    while current is not None and id(current) not in seen:
+        if isinstance(current, RepositoryNotFoundError):
+            return True
+        seen.add(id(current))
+        current = current.__cause__ or current.__context__
+    return False
+
+
+def estimate_model_size(model: MarianMTModel) -> int:
+    """Ước lượng RAM model chiếm (parameters + buffers), tính bằng byte"""
+    size = sum(p.numel() * p.element_size() for p in model.parameters())
+    size += sum(b.numel() * b.element_size() for b in model.buffers())
+    return size
+
+
+class TranslationModelRegistry:
+    """
+    Registry dùng chung cho cả process, giữ các model MarianMT đã load trong RAM.
+    - Mỗi cặp ngôn ngữ chỉ load một lần khi được dùng lần đầu
+    - Cặp nào không có model trực tiếp thì dịch qua tiếng Anh (pivot)
+    - Khi tổng RAM vượt ngân sách thì loại model ít được dùng gần đây nhất (LRU)
+    """
+
+    def __init__(self, max_memory_mb: Optional[int] = None, retry_seconds: Optional[float] = None):
+        if max_memory_mb is None:
+            max_memory_mb = int(os.getenv("TRANSLATION_MODEL_MAX_MEMORY_MB", "2048"))
+        self.max_memory_bytes = max_memory_mb * 1024 * 1024
+        # load lỗi vì lý do khác (mất mạng, hub lỗi tạm thời, hết đĩa...): thử lại sau ngần này giây
+        if retry_seconds is None:
+            retry_seconds = float(os.getenv("TRANSLATION_MODEL_RETRY_SECONDS", "300"))
+        self.retry_seconds = retry_seconds
+
+        # model_name -> model đã load, thứ tự = thứ tự dùng gần nhất (cuối là mới nhất)
+        self._models: "OrderedDict[str, LoadedTranslationModel]" = OrderedDict()
+        # model load lỗi -> thời điểm được thử lại, nhớ lại để không thử load lại mỗi request;
+        # model không tồn tại trên hub thì không bao giờ thử lại (math.inf)
+        self._unavailable: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        # lock theo từng model để 2 request cùng cặp không load trùng, cặp khác vẫn chạy được
+        self._load_locks: Dict[str, threading.Lock] = {}
+
+    @staticmethod
+    def model_name(source_lang: str, target_lang: str) -> str:
+        return f"{MODEL_PREFIX}-{source_lang}-{target_lang}"
+
+    def _touch(self, name: str) -> Optional[LoadedTranslationModel]:
+        with self._lock:
+            loaded = self._models.get(name)
+            if loaded is not None:
+                self._models.move_to_end(name)
+            return loaded
+
+    def _unavailable_names(self) -> List[str]:
+        """Gọi khi đang giữ _lock: các model chưa tới lúc thử lại"""
+        now = time.time()
+        for name in [name for name, retry_at in self._unavailable.items() if retry_at <= now]:
+            del self._unavailable[name]
+        return sorted(self._unavailable)
+
+    def _evict(self, keep: str) -> None:
+        """Loại các model cũ nhất cho tới khi tổng RAM nằm trong ngân sách"""
+        with self._lock:
+            total = sum(m.size_bytes for m in self._models.values())
+            for name in list(self._models.keys()):
+                if total <= self.max_memory_bytes:
+                    break
+                if name == keep:
+                    continue
+                evicted = self._models.pop(name)
+                total -= evicted.size_bytes
+                print(f"Evicted translation model {name} ({evicted.size_bytes // (1024 * 1024)} MB)")
+
+    def get_model(self, name: str) -> Optional[LoadedTranslationModel]:
+        """Lấy model theo tên, load nếu chưa có. Trả về None nếu model không tồn tại"""
+        loaded = self._touch(name)
+        if loaded is not None:
+            return loaded
+
+        with self._lock:
+            if name in self._unavailable_names():
+                return None
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+
+        with load_lock:
+            # request khác có thể đã load xong trong lúc mình chờ lock
+            loaded = self._touch(name)
+            if loaded is not None:
+                return loaded
+
+            try:
+                print(f"Loading translation model {name}")
+                tokenizer = MarianTokenizer.from_pretrained(name)
+                model: MarianMTModel = MarianMTModel.from_pretrained(name)
+                model.eval()
+            except OSError as e:
+                # model không có trên hub: nhớ luôn; không tải được vì lý do khác: thử lại sau retry_seconds
+                missing = is_missing_repo(e)
+                print(f"Translation model {name} is unavailable{'' if missing else ', will retry later'}: {str(e)}")
+                with self._lock:
+                    self._unavailable[name] = math.inf if missing else time.time() + self.retry_seconds
+                return None
+
+            loaded = LoadedTranslationModel(
+                name=name,
+                tokenizer=tokenizer,
+                model=model,
+                size_bytes=estimate_model_size(model)
+            )
+            with self._lock:
+                self._models[name] = loaded
+            self._evict(keep=name)
+            return loaded
+
+    @staticmethod
+    def _check_langs(source_lang: str, target_lang: str) -> None:
+        for lang in (source_lang, target_lang):
+            if lang not in SUPPORTED_LANGS:
+                raise ValueError(f"Unsupported language '{lang}', supported: {', '.join(SUPPORTED_LANGS)}")
+
+    def route_names(self, source_lang: str, target_lang: str) -> List[str]:
+        """
+        Tên các model get_route sẽ dùng, không load model nào (để tra translation memory trước).
+        Model trực tiếp chưa thử load thì coi như có; get_route có thể khác nếu load lần đầu thất bại
+        """
+        self._check_langs(source_lang, target_lang)
+        if source_lang == target_lang:
+            return []
+
+        direct = self.model_name(source_lang, target_lang)
+        with self._lock:
+            unavailable = set(self._unavailable_names())
+        if direct not in unavailable:
+            return [direct]
+
+        if PIVOT_LANG not in (source_lang, target_lang):
+            names = [self.model_name(source_lang, PIVOT_LANG), self.model_name(PIVOT_LANG, target_lang)]
+            if not unavailable.intersection(names):
+                return names
+
+        raise ValueError(f"No translation model available for {source_lang} -> {target_lang}")
+
+    def get_route(self, source_lang: str, target_lang: str) -> List[LoadedTranslationModel]:
+        """
+        Trả về danh sách model cần chạy lần lượt để dịch source_lang -> target_lang.
+        Rỗng nếu 2 ngôn ngữ giống nhau, 1 model nếu dịch trực tiếp, 2 model nếu đi qua pivot.
+        """
+        self._check_langs(source_lang, target_lang)
+
+        if source_lang == target_lang:
+            return []
+
+        direct = self.get_model(self.model_name(source_lang, target_lang))
+        if direct is not None:
+            return [direct]
+
+        if PIVOT_LANG not in (source_lang, target_lang):
+            first = self.get_model(self.model_name(source_lang, PIVOT_LANG))
+            second = self.get_model(self.model_name(PIVOT_LANG, target_lang))
+            if first is not None and second is not None:
+                return [first, second]
+
+        raise ValueError(f"No translation model available for {source_lang} -> {target_lang}")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "loaded_models": list(self._models.keys()),
+                "memory_bytes": sum(m.size_bytes for m in self._models.values()),
+                "max_memory_bytes": self.max_memory_bytes,
+                "unavailable_models": self._unavailable_names()
+            }
+
+
+# registry dùng chung cho cả process
+translation_registry = TranslationModelRegistry()
+
+__all__ = ["TranslationModelRegistry", "LoadedTranslationModel", "translation_registry", "SUPPORTED_LANGS"]
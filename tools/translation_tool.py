@@ -1,5 +1,8 @@
 from smolagents import Tool
-from transformers import MarianMTModel, MarianTokenizer
+from typing import Dict, List, Optional
+
+from tools.translation_registry import LoadedTranslationModel, TranslationModelRegistry, translation_registry
+from tools.translation_memory import TranslationMemory, translation_memory
 
 class TranslationTool(Tool):
     name = "translator"
@@ -20,25 +23,66 @@ class TranslationTool(Tool):
     }
     output_type = "string"
 
-    def __init__(self):
+    def __init__(
+        self,
+        registry: Optional[TranslationModelRegistry] = None,
+        memory: Optional[TranslationMemory] = None
+    ):
         super().__init__()
-        model_name = "Helsinki-NLP/opus-mt-en-vi"
-        self.tokenizer = MarianTokenizer.from_pretrained(model_name)
-        self.model: MarianMTModel = MarianMTModel.from_pretrained(model_name)
+        # model được load và giữ trong registry dùng chung, không load lại mỗi lần tạo tool
+        self.registry: TranslationModelRegistry = registry or translation_registry
+        # các câu đã dịch được lưu lại, dịch lại câu cũ không cần chạy model
+        self.memory: TranslationMemory = memory or translation_memory
+
+    def _generate(self, route: List[LoadedTranslationModel], texts: List[str]) -> List[str]:
+        results: List[str] = list(texts)
+        for loaded in route:
+            # Tokenize cả batch, pad theo câu dài nhất
+            inputs = loaded.tokenizer(results, return_tensors="pt", padding=True)
+            
+            # Generate translation
+            translated = loaded.model.generate(**inputs)
+            
+            # Decode
+            results = loaded.tokenizer.batch_decode(translated, skip_special_tokens=True)
+        return results
+
+    def translate_batch(self, texts: List[str], source_lang: str, target_lang: str) -> List[str]:
+        """Dịch nhiều đoạn text cùng cặp ngôn ngữ bằng một lần generate cho mỗi model"""
+        # Tên các model cần chạy (trực tiếp hoặc qua pivot tiếng Anh), chưa load model nào
+        route_names: List[str] = self.registry.route_names(source_lang, target_lang)
+        if not route_names:
+            return list(texts)
+        model_key = "+".join(route_names)
+        
+        # Tra translation memory trước, chỉ load model và generate khi có câu chưa dịch
+        cached: List[Optional[str]] = self.memory.get_many(model_key, source_lang, target_lang, texts)
+        if all(hit is not None for hit in cached):
+            return list(cached)
+        
+        route: List[LoadedTranslationModel] = self.registry.get_route(source_lang, target_lang)
+        route_key = "+".join(loaded.name for loaded in route)
+        if route_key != model_key:
+            # model trực tiếp không load được (lần đầu dùng cặp này): dịch qua pivot, tra lại memory theo route thật
+            model_key = route_key
+            cached = self.memory.get_many(model_key, source_lang, target_lang, texts)
+        missing: List[str] = list(dict.fromkeys(
+            text for text, hit in zip(texts, cached) if hit is None
+        ))
+        
+        generated: Dict[str, str] = {}
+        if missing:
+            generated = dict(zip(missing, self._generate(route, missing)))
+            self.memory.put_many(model_key, source_lang, target_lang, list(generated.items()))
+        
+        return [hit if hit is not None else generated[text] for text, hit in zip(texts, cached)]
 
     def forward(self, text: str, source_lang: str, target_lang: str) -> str:
         try:
             print(f"Translating from {source_lang} to {target_lang}")
             print(f"Input text: {text}")
             
-            # Tokenize
-            inputs = self.tokenizer(text, return_tensors="pt", padding=True)
-            
-            # Generate translation
-            translated = self.model.generate(**inputs)
-            
-            # Decode
-            result = self.tokenizer.decode(translated[0], skip_special_tokens=True)
+            result = self.translate_batch([text], source_lang, target_lang)[0]
             
             print(f"Translated text: {result}")
             return result
@@ -1,70 +1,70 @@
-from bs4 import BeautifulSoup
-import requests
 from types_api.types_api import ProcessWebContentsResponse, WebContentResponse
+from functions.http_client import FetchResponse, HttpClient, http_client
 from functions.web_content_processor import WebContentProcessor
+from tools.html_extractors import ExtractedPage, HtmlExtractor, get_extractor
+from functions.sse import EventCallback
+from functions.worker_pools import PoolSaturated, WorkerPool, get_pool
+from typing import List, Optional, Tuple
 class WebScraperTool:
-    def __init__(self):
+    def __init__(self, client: Optional[HttpClient] = None, extractor: Optional[HtmlExtractor] = None):
         self.headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.36"
         }
+        # connection pool dùng chung, không mở kết nối TCP/TLS mới cho mỗi request
+        self.client: HttpClient = client or http_client
+        self.extractor: HtmlExtractor = extractor or get_extractor()
+        # parse HTML là việc CPU, chạy trên pool riêng để không block event loop
+        self.pool: WorkerPool = get_pool("scraping")
     
     # nhận vào url của website, trả về content của website
     async def scrape_url(self, url: str) -> WebContentResponse:
+        content, _ = await self.scrape_page(url)
+        return content
+    
+    # giống scrape_url, trả về thêm các link (tuyệt đối) có trong trang, dùng cho crawler
+    # admit=False: caller đã được nhận vào pool scraping từ trước (vd: crawler đã tự giới hạn concurrency)
+    async def scrape_page(self, url: str, admit: bool = True) -> Tuple[WebContentResponse, List[str]]:
         try:
-            # Fetch webpage
-            response = requests.get(url, headers=self.headers)
-            response.raise_for_status()
-            
-            # Parse HTML
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Get title
-            title = soup.title.string if soup.title else ""
-            
-            # Get main content (customize selectors based on website structure)
-            content = ""
-            # Thường content sẽ nằm trong các thẻ article, main, div với class specific
-            content_selectors = [
-                'article', 'main',
-                'div[class*="content"]',
-                'div[class*="article"]',
-                'div[class*="post"]'
-            ]
+            # Fetch webpage (không block event loop), trang đã tải gần đây lấy từ HTTP cache
+            response: FetchResponse = await self.client.fetch_cached(url, headers=self.headers)
             
-            main_content = None
-            for selector in content_selectors:
-                main_content = soup.select_one(selector)
-                if main_content:
-                    break
-            if main_content:
-                # Loại bỏ script, style tags
-                for tag in main_content(['script', 'style']):
-                    tag.decompose()
-                content = main_content.get_text(separator='\n', strip=True)
+            # Parse HTML, lấy title, nội dung chính và link (backend chọn qua HTML_EXTRACTOR)
+            page: ExtractedPage = await self.pool.run(self.extractor.extract, response.text, response.url, admit=admit)
             
             return WebContentResponse(
-                title=title or "",
-                content=content,
+                title=page.title,
+                content=page.content,
                 metadata={
                     "url": url,
-                    "length": len(content)
+                    "length": len(page.content)
                 }
-            )
+            ), page.links
 
+        except PoolSaturated:
+            raise
         except Exception as e:
             raise Exception(f"Failed to scrape {url}: {str(e)}")
         
     # nhận vào url, trả về content, nhận content, trả về nội dung đã filtered (lưu trong Chroma)
-    async def check_content(self, url: str, query: str) -> ProcessWebContentsResponse:
+    # on_event: báo tiến độ / token cho SSE (xem WebContentProcessor.process_web_content)
+    async def check_content(self, url: str, query: str, on_event: Optional[EventCallback] = None) -> ProcessWebContentsResponse:
         # lấy content từ url
         extracted_content: WebContentResponse = await self.scrape_url(url)
+        if on_event is not None:
+            on_event("progress", {
+                "stage": "fetched",
+                "url": url,
+                "title": extracted_content.title,
+                "characters": len(extracted_content.content)
+            })
         
         processor = WebContentProcessor()
         filtered_content = await processor.process_web_content(
             content=extracted_content.content,
             url=url,
             title=extracted_content.title,
-            query=query
+            query=query,
+            on_event=on_event
         )
         
         return filtered_content
\ No newline at end of file
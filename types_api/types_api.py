@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, HttpUrl
-from typing import Optional, List, Dict, Literal
+from typing import Any, Optional, List, Dict, Literal
 
 # Regular run task with empty tool array
 class RunTaskRequest(BaseModel):
@@ -9,6 +9,8 @@ class TranslateRequest(BaseModel):
     text: str
     source_lang: str
     target_lang: str
+    # Văn bản dài: chia theo câu/paragraph, dịch theo batch và stream từng đoạn về qua SSE
+    long_text: bool = False
 
 # Search request
 class SearchRequest(BaseModel):
@@ -38,11 +40,17 @@ class SummarizeResponse(BaseModel):
     success: bool
     summary: str
     metadata: SummarizeRequest
+    # "hit": lấy từ cache, "coalesced": dùng chung kết quả với request giống hệt đang chạy, "miss": chạy LLM
+    cache_status: Literal["hit", "coalesced", "miss"] = "miss"
+    # thời gian từng bước tóm tắt: [{"stage": "map", "calls": 8, "seconds": 4.2}, ...]
+    stages: List[Dict] = []
 
 class NewsRequest(BaseModel):
     query: str
     max_results: int = 5
     time_period: str = "day"
+    # xử lý tất cả bài tìm được theo pipeline và trả về NewsResponse (mặc định: chỉ bài đầu tiên)
+    multi_article: bool = False
 
 class NewsResponse(BaseModel):
     success: bool
@@ -82,4 +90,22 @@ class ProcessWebContentsResponse(BaseModel):
     num_chunks: int
     url: str
     persist_dir: str
+    # thời gian LLM xử lý từng chunk: {chunk, status: ok/empty/failed, attempts, seconds}
+    chunk_timings: List[Dict] = []
 
+
+
+# Job chạy nền (async_mode=true): trả về ngay, client poll /api/jobs/{job_id} hoặc subscribe /api/jobs/{job_id}/events
+class JobResponse(BaseModel):
+    job_id: str
+    kind: str
+    status: Literal["queued", "running", "succeeded", "failed"]
+    # event "progress" / "step" mới nhất của service đang chạy
+    progress: Optional[Any] = None
+    # payload giống response đồng bộ của endpoint (SummarizeResponse, ProcessWebContentsResponse, {result})
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    attempts: int = 0
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None